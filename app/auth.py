@@ -1,11 +1,43 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.executors import BoundedExecutor, ExecutorBusy
+from app.services.user_cache import is_user_active
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes verify_and_update
+# report any hash made with a different cost factor as needing a rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds
+)
+
+# Dedicated pool for bcrypt work so login/signup bursts can't occupy the
+# event loop
+_password_executor = BoundedExecutor(
+    ThreadPoolExecutor(
+        max_workers=settings.password_hash_workers,
+        thread_name_prefix="password-hash"
+    ),
+    max_pending=settings.password_hash_workers + settings.password_hash_queue_limit
+)
+
+# Verified token claims keyed by token hash, so the same JWT is only
+# decoded and HMAC-verified once while it stays in the cache
+_token_cache = TTLCache(
+    maxsize=settings.token_cache_size,
+    ttl=settings.token_cache_ttl_seconds
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +45,30 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def _submit_password_task(fn, *args) -> Future:
+    """
+    Run fn on the password pool, rejecting immediately when the queue is full.
+    Raises ExecutorBusy, which REST routes answer with 503 and GraphQL
+    resolvers turn into an error message.
+    """
+    try:
+        return _password_executor.submit(fn, *args)
+    except ExecutorBusy:
+        raise ExecutorBusy("Too many password operations in progress, try again later")
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the password pool.
+    Returns (valid, new_hash); new_hash is set when the stored hash was made
+    with a different cost factor and should be replaced.
+    """
+    future = _submit_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password pool"""
+    return await asyncio.wrap_future(_submit_password_task(pwd_context.hash, password))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -24,6 +80,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str) -> dict:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    token_data = _token_cache.get(cache_key)
+    if token_data is not None:
+        return token_data
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         user_id: int = payload.get("sub")
@@ -33,10 +94,47 @@ def verify_token(token: str) -> dict:
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return {"user_id": user_id}
+        token_data = {"user_id": user_id}
+        
+        # Never keep a token cached past its own expiry
+        exp = payload.get("exp")
+        ttl = exp - time.time() if exp is not None else None
+        _token_cache.set(cache_key, token_data, ttl=ttl)
+        
+        return token_data
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+def get_current_user(info) -> int:
+    """
+    Get current user ID for a GraphQL resolver.
+    The token is verified once per request and the user ID is kept in the
+    context for every other resolver of the same request.
+    """
+    context = info.context
+    if "user_id" in context:
+        return context["user_id"]
+    
+    # Extract token from request headers
+    request = context.get("request")
+    if not request:
+        raise Exception("Request not available")
+    
+    # Get token from Authorization header
+    auth_header = request.headers.get("authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise Exception("Authentication required")
+    
+    token = auth_header.split(" ")[1]
+    token_data = verify_token(token)
+    
+    # Served from the user cache, so the database is only hit on a miss
+    if not is_user_active(context.get("db"), token_data["user_id"]):
+        raise Exception("User account is deactivated")
+    
+    context["user_id"] = token_data["user_id"]
+    return context["user_id"]
@@ -10,19 +10,118 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = False
+    # Warn when one SQL statement shape repeats more often within a request
+    sql_repeat_warning_threshold: int = 10
+    
+    # Per-request profiling (see app/utils/profiling.py). Requests are
+    # profiled when they send X-Profile: <profiling_token> or are sampled
+    profiling_enabled: bool = False
+    profiling_token: Optional[str] = None
+    profiling_sample_rate: float = 0.0
+    # sampling (speedscope) profiles only the request itself; cprofile (.prof)
+    # sees the whole loop thread and is skipped while other requests run
+    profiling_mode: str = "sampling"
+    profiling_interval_ms: float = 5.0
+    profiling_dir: str = "profiles"
     
     # JWT
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    token_cache_size: int = 4096
+    token_cache_ttl_seconds: int = 300
+    
+    # Password hashing
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 16
+    
+    # User cache
+    user_cache_size: int = 4096
+    user_cache_ttl_seconds: int = 60
+    
+    # Classification
+    use_ml_model: bool = False
+    # Cascade: keyword rules decide clear-cut emails and only ambiguous ones
+    # (too few hits or conflicting hits) reach the ML model
+    classifier_cascade: bool = False
+    cascade_min_hits: int = 2
+    cascade_min_margin: float = 0.5
+    # TF-IDF + logistic regression tier between the rules and the transformer
+    # (retrain with: python -m app.services.linear_classifier train)
+    linear_model_path: Optional[str] = "models/linear_classifier.joblib"
+    linear_min_confidence: float = 0.85
+    linear_correction_weight: float = 5.0
+    # Versioned model artifacts (see app/services/model_registry.py); when
+    # model_version is set it is loaded at startup instead of the defaults
+    model_registry_dir: str = "models/registry"
+    model_version: Optional[str] = None
+    # How often each worker checks the registry for a version activated elsewhere
+    model_registry_poll_seconds: float = 5.0
+    # Required by the /api/models admin endpoints; unset disables them
+    admin_token: Optional[str] = None
+    # Transformer inference pool. Each worker runs inference_threads_per_worker
+    # torch threads; unset inference_workers fills this process's share of the
+    # cores (cores / web_concurrency, the number of server processes). At most
+    # inference_queue_limit requests wait; one that can't be queued, or isn't
+    # answered within inference_deadline_ms, is classified by the linear tier
+    # (or the rules) instead. Batches (uploads, embeddings) run bucket by
+    # bucket; a bucket not done within inference_bucket_deadline_ms of being
+    # queued is degraded the same way
+    web_concurrency: int = 1
+    inference_workers: Optional[int] = None
+    inference_threads_per_worker: int = 2
+    inference_queue_limit: int = 8
+    inference_deadline_ms: int = 500
+    inference_bucket_deadline_ms: int = 10000
+    # Templated bulk mail: emails within near_duplicate_max_distance bits
+    # (of 64) of an already classified one reuse its classification.
+    # Scope is "off", "user" (one index per user) or "global"
+    near_duplicate_scope: str = "off"
+    near_duplicate_max_distance: int = 6
+    near_duplicate_max_entries: int = 50000
+    near_duplicate_index_path: Optional[str] = "models/near_duplicates.npz"
+    # Per-user sender reputation, updated from every classification and
+    # correction. With sender_prior_enabled, a sender whose weighted history
+    # reaches sender_prior_min_count with at least sender_prior_min_share of
+    # one label gets that label without running the classifier
+    sender_prior_enabled: bool = False
+    sender_prior_min_count: float = 5.0
+    sender_prior_min_share: float = 0.9
+    sender_prior_correction_weight: float = 5.0
+    sender_prior_cache_size: int = 10000
+    sender_prior_cache_ttl_seconds: int = 300
+    # Similar-email search (see app/services/embedding_store.py). The source
+    # is "hashed" (lexical, computed for every email) or "transformer"
+    # (mean-pooled encoder states; costs an extra forward pass per email)
+    embeddings_enabled: bool = False
+    embedding_source: str = "hashed"
+    embedding_dir: str = "embeddings"
+    embedding_hash_dim: int = 256
+    # Users with at least this many vectors get an IVF index on build-ivf
+    embedding_ivf_min_rows: int = 50000
+    embedding_ivf_probes: int = 16
+    # Versioned offline NLP bundle (see app/utils/nlp_bundle.py); when set,
+    # resources are only loaded from it and the network is never used
+    nlp_bundle_path: Optional[str] = None
     
     # File uploads
     max_file_size: int = 10 * 1024 * 1024  # 10MB
     allowed_file_types: list = [".txt", ".pdf"]
     
+    # Avatars
+    avatar_max_bytes: int = 5 * 1024 * 1024  # 5MB
+    avatar_max_pixels: int = 40_000_000
+    avatar_sizes: list = [512, 150, 64]
+    avatar_thumbnail_size: int = 150
+    avatar_workers: int = 2
+    avatar_queue_limit: int = 8
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
+        # Allow the model_* settings
+        protected_namespaces = ("settings_",)
 
 # Railway environment variables
 if os.getenv("DATABASE_URL"):
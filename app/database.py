@@ -2,15 +2,69 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.metrics import DB_REQUESTS_SERVED, DB_SESSIONS_OPENED, instrument_engine
+import threading
 
 engine = create_engine(settings.database_url)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Counters for sessions opened vs. requests served through get_lazy_db. The
+# dict is this worker's view for /health; the Prometheus counters aggregate
+# across workers on /metrics.
+session_stats = {"requests_served": 0, "sessions_opened": 0}
+_stats_counters = {"requests_served": DB_REQUESTS_SERVED, "sessions_opened": DB_SESSIONS_OPENED}
+_stats_lock = threading.Lock()
+
+def _increment(key: str):
+    with _stats_lock:
+        session_stats[key] += 1
+    _stats_counters[key].inc()
+
+def get_session_stats() -> dict:
+    """Return a snapshot of this worker's lazy session counters"""
+    with _stats_lock:
+        return dict(session_stats)
+
+class LazySession:
+    """
+    Session proxy that only creates a real Session (and checks out a pooled
+    connection) the first time it is used.
+    """
+    def __init__(self):
+        self._session = None
+    
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None
+    
+    def _get_session(self):
+        if self._session is None:
+            self._session = SessionLocal()
+            _increment("sessions_opened")
+        return self._session
+    
+    def __getattr__(self, name):
+        return getattr(self._get_session(), name)
+    
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_lazy_db():
+    db = LazySession()
+    _increment("requests_served")
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,215 @@
+"""
+Prometheus metrics.
+
+With several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an
+empty writable directory before starting the server; every worker writes its
+samples there and /metrics aggregates them.
+"""
+import os
+import time
+from contextlib import contextmanager
+from graphql.language import OperationDefinitionNode
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from strawberry.extensions import SchemaExtension
+from app.config import settings
+from app.utils.query_tracking import current_query_stats, record_query, track_queries
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "REST request latency by route",
+    ["method", "route", "status"]
+)
+GRAPHQL_OPERATION_LATENCY = Histogram(
+    "graphql_operation_duration_seconds",
+    "GraphQL operation latency by operation",
+    ["operation"]
+)
+CLASSIFIER_STAGE_LATENCY = Histogram(
+    "classifier_stage_duration_seconds",
+    "Time spent in each email classifier stage",
+    ["stage"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+CLASSIFICATIONS = Counter(
+    "email_classifications_total",
+    "Classified emails by path (ml, rule_based, ml_fallback, degraded_linear, degraded_rules, "
+    "cascade_rules, linear, near_duplicate, sender_prior, empty)",
+    ["path"]
+)
+INFERENCE_SHED = Counter(
+    "classifier_inference_shed_total",
+    "Emails answered without the transformer because inference was overloaded",
+    ["reason"]
+)
+NEAR_DUPLICATE_LOOKUPS = Counter(
+    "near_duplicate_lookups_total",
+    "Near-duplicate index lookups; hits skip classification",
+    ["result"]
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "classifier_model_load_seconds",
+    "Time it took to load the classifier model",
+    multiprocess_mode="max"
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Latency of individual SQL statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements issued per request",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Total SQL time per request"
+)
+EMAILS_PROCESSED = Counter(
+    "emails_processed_total",
+    "Emails classified and stored, by source",
+    ["source"]
+)
+DB_SESSIONS_OPENED = Counter(
+    "db_sessions_opened_total",
+    "Database sessions actually opened by lazily-sessioned requests"
+)
+DB_REQUESTS_SERVED = Counter(
+    "db_lazy_requests_served_total",
+    "Requests served with a lazy database session, opened or not"
+)
+UPLOAD_THROUGHPUT = Histogram(
+    "upload_throughput_emails_per_second",
+    "Emails per second processed by each file upload",
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+def instrument_engine(engine):
+    """Time every statement executed through the engine"""
+    # The start time lives on the statement's execution context, so a statement
+    # that raises leaves nothing behind on the pooled connection. Internal
+    # statements without a context (e.g. sequence pre-execution) use one slot
+    # in conn.info that the next statement simply overwrites.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+        else:
+            conn.info["query_start"] = time.perf_counter()
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            start = context._query_start
+        else:
+            start = conn.info.pop("query_start")
+        duration = time.perf_counter() - start
+        DB_QUERY_LATENCY.observe(duration)
+        record_query(statement, duration)
+
+@contextmanager
+def timed_stage(stage: str):
+    """Observe the duration of a classifier stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CLASSIFIER_STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+def record_upload(source: str, processed_count: int, seconds: float):
+    """Record emails processed by a file upload"""
+    EMAILS_PROCESSED.labels(source=source).inc(processed_count)
+    if processed_count and seconds > 0:
+        UPLOAD_THROUGHPUT.observe(processed_count / seconds)
+
+class MetricsMiddleware:
+    """ASGI middleware recording REST latency and SQL statements per request"""
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        label = f"{scope['method']} {scope['path']}"
+        with track_queries(settings.sql_repeat_warning_threshold, label=label) as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._observe(scope, status_code, time.perf_counter() - start, stats)
+    
+    def _observe(self, scope, status_code: int, duration: float, stats):
+        # Label with the route template to keep cardinality bounded
+        route = scope.get("route")
+        HTTP_REQUEST_LATENCY.labels(
+            method=scope["method"],
+            route=getattr(route, "path", "other"),
+            status=str(status_code)
+        ).observe(duration)
+        DB_QUERIES_PER_REQUEST.observe(stats.count)
+        DB_TIME_PER_REQUEST.observe(stats.duration)
+
+def graphql_operation_label(execution_context) -> str:
+    """Operation type plus name, or its root fields for anonymous operations"""
+    document = execution_context.graphql_document
+    if document is None:
+        return "invalid"
+    
+    operations = [
+        definition for definition in document.definitions
+        if isinstance(definition, OperationDefinitionNode)
+    ]
+    name = execution_context.operation_name
+    operation = next(
+        (op for op in operations if op.name and op.name.value == name),
+        operations[0] if operations else None
+    )
+    if operation is None:
+        return "invalid"
+    
+    if not name:
+        fields = sorted(
+            selection.name.value
+            for selection in operation.selection_set.selections
+            if hasattr(selection, "name")
+        )
+        name = ",".join(fields)
+    return f"{operation.operation.value} {name}"
+
+class GraphQLMetricsExtension(SchemaExtension):
+    """Strawberry extension recording latency per GraphQL operation"""
+    def on_operation(self):
+        start = time.perf_counter()
+        yield
+        GRAPHQL_OPERATION_LATENCY.labels(
+            operation=graphql_operation_label(self.execution_context)
+        ).observe(time.perf_counter() - start)
+
+class SQLDebugExtension(SchemaExtension):
+    """Adds the request's SQL statements to the GraphQL response extensions (debug only)"""
+    def get_results(self):
+        stats = current_query_stats()
+        return {"sql": stats.summary()} if stats is not None else {}
+
+def metrics_payload():
+    """Return (body, content type) for the /metrics endpoint"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -10,7 +10,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from app.database import Base
 from app.config import settings
-from app.models import User, CategorizedEmail, EmailStatistics
+from app.models import User, CategorizedEmail, EmailStatistics, SenderReputation
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
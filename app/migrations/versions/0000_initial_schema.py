@@ -0,0 +1,91 @@
+"""initial schema: users, categorized emails and statistics
+
+Revision ID: 0000
+Revises: 
+Create Date: 2026-10-19 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0000'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+user_status = sa.Enum("ACTIVE", "DEACTIVE", name="userstatus")
+email_classification = sa.Enum("PRODUCTIVE", "UNPRODUCTIVE", name="emailclassification")
+
+
+def upgrade() -> None:
+    # The tables as they were before migrations existed. Databases created by
+    # create_all on startup already have them; later revisions add the rest
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("password", sa.String(255), nullable=False),
+            sa.Column("status", user_status, nullable=False),
+            sa.Column("avatar_url", sa.String(500), nullable=True),
+            sa.Column("avatar_thumbnail_url", sa.String(500), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+            sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_users_id"), "users", ["id"])
+        op.create_index(op.f("ix_users_name"), "users", ["name"])
+        op.create_index(op.f("ix_users_email"), "users", ["email"], unique=True)
+        op.create_index(op.f("ix_users_status"), "users", ["status"])
+    
+    if not inspector.has_table("categorized_emails"):
+        op.create_table(
+            "categorized_emails",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("subject", sa.String(500), nullable=False),
+            sa.Column("response", sa.String(2000), nullable=False),
+            sa.Column("classification", email_classification, nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_categorized_emails_id"), "categorized_emails", ["id"])
+        op.create_index(op.f("ix_categorized_emails_user_id"), "categorized_emails", ["user_id"])
+        op.create_index(op.f("ix_categorized_emails_email"), "categorized_emails", ["email"])
+        op.create_index(op.f("ix_categorized_emails_classification"), "categorized_emails", ["classification"])
+    
+    if not inspector.has_table("emails_statistics"):
+        op.create_table(
+            "emails_statistics",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("total", sa.Integer(), nullable=False),
+            sa.Column("productive", sa.Integer(), nullable=False),
+            sa.Column("unproductive", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id")
+        )
+        op.create_index(op.f("ix_emails_statistics_id"), "emails_statistics", ["id"])
+        op.create_index(op.f("ix_emails_statistics_user_id"), "emails_statistics", ["user_id"])
+        op.create_index(op.f("ix_emails_statistics_total"), "emails_statistics", ["total"])
+        op.create_index(op.f("ix_emails_statistics_productive"), "emails_statistics", ["productive"])
+        op.create_index(op.f("ix_emails_statistics_unproductive"), "emails_statistics", ["unproductive"])
+
+
+def downgrade() -> None:
+    op.drop_table("emails_statistics")
+    op.drop_table("categorized_emails")
+    op.drop_table("users")
+    # Postgres keeps enum types after their tables are dropped
+    email_classification.drop(op.get_bind(), checkfirst=True)
+    user_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,37 @@
+"""store email message and classification corrections
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-19 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = '0000'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table: str) -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    # Databases created by create_all on startup may already have the columns
+    columns = _columns("categorized_emails")
+    if "message" not in columns:
+        op.add_column("categorized_emails", sa.Column("message", sa.Text(), nullable=True))
+    if "classification_corrected" not in columns:
+        op.add_column(
+            "categorized_emails",
+            sa.Column("classification_corrected", sa.Boolean(), nullable=False, server_default="0")
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("categorized_emails", "classification_corrected")
+    op.drop_column("categorized_emails", "message")
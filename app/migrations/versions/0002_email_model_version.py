@@ -0,0 +1,27 @@
+"""record the model version on categorized emails
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all on startup may already have the column
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("categorized_emails")}
+    if "model_version" not in columns:
+        op.add_column("categorized_emails", sa.Column("model_version", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("categorized_emails", "model_version")
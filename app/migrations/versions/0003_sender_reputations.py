@@ -0,0 +1,43 @@
+"""per-user sender reputation table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all on startup may already have the table
+    if sa.inspect(op.get_bind()).has_table("sender_reputations"):
+        return
+    op.create_table(
+        "sender_reputations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("sender", sa.String(255), nullable=False),
+        sa.Column("productive", sa.Float(), nullable=False),
+        sa.Column("unproductive", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "sender", name="uq_sender_reputations_user_sender")
+    )
+    op.create_index(op.f("ix_sender_reputations_id"), "sender_reputations", ["id"])
+    op.create_index(op.f("ix_sender_reputations_user_id"), "sender_reputations", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_sender_reputations_user_id"), table_name="sender_reputations")
+    op.drop_index(op.f("ix_sender_reputations_id"), table_name="sender_reputations")
+    op.drop_table("sender_reputations")
@@ -0,0 +1,27 @@
+"""record the classification path on categorized emails
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by create_all on startup may already have the column
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("categorized_emails")}
+    if "classification_path" not in columns:
+        op.add_column("categorized_emails", sa.Column("classification_path", sa.String(32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("categorized_emails", "classification_path")
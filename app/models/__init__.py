@@ -1,5 +1,6 @@
 from .user import User
 from .categorized_email import CategorizedEmail
 from .email_statistics import EmailStatistics
+from .sender_reputation import SenderReputation
 
-__all__ = ["User", "CategorizedEmail", "EmailStatistics"]
+__all__ = ["User", "CategorizedEmail", "EmailStatistics", "SenderReputation"]
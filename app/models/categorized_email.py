@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -15,8 +15,16 @@ class CategorizedEmail(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     email = Column(String(255), nullable=False, index=True)
     subject = Column(String(500), nullable=False)
+    # Kept so the linear tier can be retrained from stored emails
+    message = Column(Text, nullable=True)
     response = Column(String(2000), nullable=False)
     classification = Column(Enum(EmailClassification), nullable=False, index=True)
+    # Set when a user corrected the classification; weighs more in training
+    classification_corrected = Column(Boolean, nullable=False, default=False, server_default="0")
+    # Model version that classified the email
+    model_version = Column(String(64), nullable=True)
+    # Tier that decided the classification (ml, linear, degraded_rules, ...)
+    classification_path = Column(String(32), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SenderReputation(Base):
+    """How a user's emails from one sender have been classified so far"""
+    __tablename__ = "sender_reputations"
+    __table_args__ = (UniqueConstraint("user_id", "sender", name="uq_sender_reputations_user_sender"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    sender = Column(String(255), nullable=False)
+    # Weighted counts; corrections weigh more than classifications
+    productive = Column(Float, nullable=False, default=0.0)
+    unproductive = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
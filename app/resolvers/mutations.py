@@ -8,39 +8,29 @@ from app.schemas.user import UserType, UserInput, UserUpdateInput
 from app.schemas.email import EmailType, EmailInput, EmailUpdateInput, FileUploadResult, Upload
 from app.services.user_service import UserService
 from app.services.email_service import EmailService
-from app.auth import verify_token, create_access_token
+from app.auth import get_current_user, create_access_token, get_password_hash_async
+from app.utils.executors import ExecutorBusy
 from app.models.user import UserStatus
 from app.schemas.email import EmailClassification
 import os
 import tempfile
 import shutil
 from app.config import settings
-
-def get_current_user(info: Info) -> int:
-    """Get current user ID from token"""
-    # Extract token from request headers
-    request = info.context.get("request")
-    if not request:
-        raise Exception("Request not available")
-    
-    # Get token from Authorization header
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise Exception("Authentication required")
-    
-    token = auth_header.split(" ")[1]
-    token_data = verify_token(token)
-    return token_data["user_id"]
+from app.metrics import EMAILS_PROCESSED, record_upload
+import time
 
 @strawberry.type
 class Mutation:
     @strawberry.field
-    def login(self, info: Info, input: LoginInput) -> LoginResponse:
+    async def login(self, info: Info, input: LoginInput) -> LoginResponse:
         """Login user and return token"""
         db = info.context["db"]
         user_service = UserService(db)
         
-        user = user_service.authenticate_user(input.email, input.password)
+        try:
+            user = await user_service.authenticate_user_async(input.email, input.password)
+        except ExecutorBusy:
+            raise Exception("Server is busy, try logging in again later")
         if not user:
             raise Exception("Invalid email or password")
         
@@ -56,7 +46,7 @@ class Mutation:
         )
     
     @strawberry.field
-    def create_user_account(self, info: Info, input: UserInput) -> UserType:
+    async def create_user_account(self, info: Info, input: UserInput) -> UserType:
         """Create new user account (public endpoint)"""
         db = info.context["db"]
         user_service = UserService(db)
@@ -66,12 +56,16 @@ class Mutation:
         if existing_user:
             raise Exception("Email already registered")
         
-        # Create new user
-        user = user_service.create_user(input.name, input.email, input.password)
+        # Create new user, hashing the password off the event loop
+        try:
+            password_hash = await get_password_hash_async(input.password)
+        except ExecutorBusy:
+            raise Exception("Server is busy, try creating the account again later")
+        user = user_service.create_user(input.name, input.email, password_hash=password_hash)
         return user_service.to_user_type(user)
     
     @strawberry.field
-    def update_user_account(self, info: Info, input: UserUpdateInput) -> UserType:
+    async def update_user_account(self, info: Info, input: UserUpdateInput) -> UserType:
         """Update current user account"""
         user_id = get_current_user(info)
         db = info.context["db"]
@@ -83,11 +77,18 @@ class Mutation:
             if existing_user and existing_user.id != user_id:
                 raise Exception("Email already registered")
         
+        password_hash = None
+        if input.password:
+            try:
+                password_hash = await get_password_hash_async(input.password)
+            except ExecutorBusy:
+                raise Exception("Server is busy, try changing the password again later")
+        
         user = user_service.update_user(
             user_id, 
             name=input.name, 
             email=input.email, 
-            password=input.password
+            password_hash=password_hash
         )
         
         if not user:
@@ -96,19 +97,21 @@ class Mutation:
         return user_service.to_user_type(user)
     
     @strawberry.field
-    def analyse_email(self, info: Info, input: EmailInput) -> EmailType:
+    async def analyse_email(self, info: Info, input: EmailInput) -> EmailType:
         """Analyze and categorize a single email"""
         user_id = get_current_user(info)
         db = info.context["db"]
         email_service = EmailService(db)
         
-        # Create and categorize the email
-        email = email_service.create_email(
+        # Create and categorize the email, awaiting the transformer so the
+        # worker keeps serving other requests meanwhile
+        email = await email_service.create_email_async(
             user_id=user_id,
             email=input.email,
             subject=input.subject,
             message=input.message
         )
+        EMAILS_PROCESSED.labels(source="analyse_email").inc()
         
         return email_service.to_email_type(email)
     
@@ -130,6 +133,24 @@ class Mutation:
         
         return email_service.to_email_type(email)
     
+    @strawberry.field
+    def correct_email_classification(self, info: Info, email_id: int, classification: EmailClassification) -> EmailType:
+        """Correct the classification of an email"""
+        user_id = get_current_user(info)
+        db = info.context["db"]
+        email_service = EmailService(db)
+        
+        email = email_service.correct_classification(
+            user_id=user_id,
+            email_id=email_id,
+            classification=classification.value
+        )
+        
+        if not email:
+            raise Exception("Email not found")
+        
+        return email_service.to_email_type(email)
+    
     @strawberry.field
     def delete_email(self, info: Info, email_id: int) -> bool:
         """Delete an email"""
@@ -145,7 +166,7 @@ class Mutation:
         return True
     
     @strawberry.field
-    def analyse_emails(self, info: Info, file_path: str) -> str:
+    async def analyse_emails(self, info: Info, file_path: str) -> str:
         """Analyze multiple emails from file (legacy method)"""
         user_id = get_current_user(info)
         db = info.context["db"]
@@ -158,16 +179,12 @@ class Mutation:
                 raise Exception("File must be .txt or .pdf")
             
             # Read and process file
+            upload_start = time.perf_counter()
             emails_data = self._process_file(file_path)
             
-            # Process each email
-            for email_data in emails_data:
-                email_service.create_email(
-                    user_id=user_id,
-                    email=email_data['email'],
-                    subject=email_data['subject'],
-                    message=email_data['message']
-                )
+            # Classify and store the emails as one batch
+            await email_service.create_emails_async(user_id, emails_data)
+            record_upload("analyse_emails", len(emails_data), time.perf_counter() - upload_start)
             
             return "Emails processed successfully"
             
@@ -1,28 +1,15 @@
 import strawberry
-from typing import Optional
+from typing import Optional, List
 from strawberry.types import Info
 from app.schemas.user import UserType
-from app.schemas.email import EmailType, EmailListType
+from app.schemas.email import EmailType, EmailListType, SimilarEmailType
 from app.schemas.statistics import StatisticsType
 from app.services.user_service import UserService
 from app.services.email_service import EmailService
-from app.auth import verify_token
-
-def get_current_user(info: Info) -> int:
-    """Get current user ID from token"""
-    # Extract token from request headers
-    request = info.context.get("request")
-    if not request:
-        raise Exception("Request not available")
-    
-    # Get token from Authorization header
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise Exception("Authentication required")
-    
-    token = auth_header.split(" ")[1]
-    token_data = verify_token(token)
-    return token_data["user_id"]
+from app.services.email_classifier import InferenceShed
+from app.auth import get_current_user
+from app.config import settings
+from app.utils.selection import get_selected_fields
 
 @strawberry.type
 class Query:
@@ -33,7 +20,7 @@ class Query:
         db = info.context["db"]
         
         user_service = UserService(db)
-        user = user_service.get_user_by_id(user_id)
+        user = user_service.get_cached_user(user_id)
         
         if not user:
             raise Exception("User not found")
@@ -81,7 +68,9 @@ class Query:
         db = info.context["db"]
         
         email_service = EmailService(db)
-        return email_service.get_emails_list(user_id, page, per_page)
+        # Only load the email columns the client actually asked for
+        fields = get_selected_fields(info, "emails")
+        return email_service.get_emails_list(user_id, page, per_page, fields=fields or ())
     
     @strawberry.field
     def get_email(self, info: Info, email_id: int) -> EmailType:
@@ -90,9 +79,34 @@ class Query:
         db = info.context["db"]
         
         email_service = EmailService(db)
-        email = email_service.get_email_by_id(user_id, email_id)
+        email = email_service.get_email_type_by_id(
+            user_id, email_id, fields=get_selected_fields(info)
+        )
         
         if not email:
             raise Exception("Email not found")
         
-        return email_service.to_email_type(email)
+        return email
+    
+    @strawberry.field
+    async def find_similar_emails(self, info: Info, email_id: int, k: int = 5) -> List[SimilarEmailType]:
+        """Previous emails of the current user most similar to the given one"""
+        user_id = get_current_user(info)
+        db = info.context["db"]
+        
+        if not settings.embeddings_enabled:
+            raise Exception("Similar email search is disabled")
+        if not 1 <= k <= 50:
+            raise Exception("k must be between 1 and 50")
+        
+        email_service = EmailService(db)
+        try:
+            similar = await email_service.find_similar_emails_async(user_id, email_id, k)
+        except InferenceShed:
+            # The email had no stored vector and the transformer is overloaded
+            raise Exception("Similar email search is busy, try again later")
+        
+        if similar is None:
+            raise Exception("Email not found")
+        
+        return [SimilarEmailType(email=email, score=round(score, 4)) for email, score in similar]
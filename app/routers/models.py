@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from typing import Optional
+from app.config import settings
+from app.services.email_classifier import email_classifier
+from app.services.model_registry import (
+    model_registry, start_activation, rollback_version, activation_status, ModelRegistryError
+)
+import hmac
+
+router = APIRouter(prefix="/api/models", tags=["models"])
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow only requests carrying the configured admin token"""
+    if not settings.admin_token or not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
+
+@router.get("", response_model=dict, dependencies=[Depends(require_admin)])
+async def list_model_versions():
+    """Active and previous model versions, activation state and published versions"""
+    previous = email_classifier.previous
+    return {
+        "active": email_classifier.active.version,
+        "recorded": model_registry.active_version(),
+        "previous": previous.version if previous else None,
+        "activation": activation_status,
+        "versions": model_registry.versions()
+    }
+
+@router.post("/{version}/activate", response_model=dict, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_admin)])
+async def activate_model_version(version: str):
+    """
+    Load and warm a version in the background, then swap it in; the other
+    workers follow once this one is serving it
+    """
+    try:
+        started = start_activation(version)
+    except ModelRegistryError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    if not started:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Model version {activation_status['version']} is still loading"
+        )
+    return {"success": True, "message": f"Loading model version {version}"}
+
+@router.post("/rollback", response_model=dict, dependencies=[Depends(require_admin)])
+async def rollback_model_version():
+    """Swap the previous version back in"""
+    try:
+        version = rollback_version()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"success": True, "active": version}
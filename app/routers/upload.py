@@ -3,19 +3,30 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import verify_token
+from app.services.user_cache import is_user_active
 from app.services.email_service import EmailService
+from app.metrics import record_upload
 import os
 import tempfile
 import shutil
+import time
 from typing import List
 
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 security = HTTPBearer()
 
-def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
+def get_current_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> int:
     """Get current user ID from token"""
     token = credentials.credentials
     token_data = verify_token(token)
+    if not is_user_active(db, token_data["user_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is deactivated"
+        )
     return token_data["user_id"]
 
 @router.post("/emails", response_model=dict)
@@ -53,18 +64,12 @@ async def upload_emails_file(
         try:
             # Process the temporary file
             email_service = EmailService(db)
+            upload_start = time.perf_counter()
             emails_data = _process_file(temp_file_path)
             
-            # Process each email
-            processed_count = 0
-            for email_data in emails_data:
-                email_service.create_email(
-                    user_id=user_id,
-                    email=email_data['email'],
-                    subject=email_data['subject'],
-                    message=email_data['message']
-                )
-                processed_count += 1
+            # Classify and store the emails as one batch
+            processed_count = len(await email_service.create_emails_async(user_id, emails_data))
+            record_upload("upload", processed_count, time.perf_counter() - upload_start)
             
             return {
                 "success": True,
@@ -137,18 +142,12 @@ async def upload_multiple_emails_files(
                 
                 try:
                     # Process the temporary file
+                    upload_start = time.perf_counter()
                     emails_data = _process_file(temp_file_path)
                     
-                    # Process each email
-                    processed_count = 0
-                    for email_data in emails_data:
-                        email_service.create_email(
-                            user_id=user_id,
-                            email=email_data['email'],
-                            subject=email_data['subject'],
-                            message=email_data['message']
-                        )
-                        processed_count += 1
+                    # Classify and store the emails as one batch
+                    processed_count = len(await email_service.create_emails_async(user_id, emails_data))
+                    record_upload("upload", processed_count, time.perf_counter() - upload_start)
                     
                     total_processed += processed_count
                     results.append({
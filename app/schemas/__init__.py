@@ -1,11 +1,11 @@
 from .user import UserType, UserInput, UserUpdateInput
-from .email import EmailType, EmailInput, EmailUpdateInput, EmailListType, PaginationType
+from .email import EmailType, EmailInput, EmailUpdateInput, EmailListType, PaginationType, SimilarEmailType
 from .statistics import StatisticsType
 from .auth import LoginInput, LoginResponse
 
 __all__ = [
     "UserType", "UserInput", "UserUpdateInput",
-    "EmailType", "EmailInput", "EmailUpdateInput", "EmailListType", "PaginationType",
+    "EmailType", "EmailInput", "EmailUpdateInput", "EmailListType", "PaginationType", "SimilarEmailType",
     "StatisticsType",
     "LoginInput", "LoginResponse"
 ]
@@ -18,6 +18,8 @@ class EmailType:
     classification: EmailClassification
     created_at: datetime
     updated_at: datetime
+    model_version: Optional[str] = None
+    classification_path: Optional[str] = None
 
 @strawberry.input
 class EmailInput:
@@ -42,6 +44,11 @@ class EmailListType:
     emails: List[EmailType]
     pagination: PaginationType
 
+@strawberry.type
+class SimilarEmailType:
+    email: EmailType
+    score: float
+
 # New types for file upload
 @strawberry.type
 class FileUploadResult:
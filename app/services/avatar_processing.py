@@ -0,0 +1,71 @@
+import io
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable
+from PIL import Image
+from app.config import settings
+from app.utils.executors import BoundedExecutor
+
+# Avatar decoding runs in separate processes so large photos don't inflate
+# the memory of the API workers or hold the GIL during a request
+_avatar_executor = BoundedExecutor(
+    ProcessPoolExecutor(max_workers=settings.avatar_workers),
+    max_pending=settings.avatar_workers + settings.avatar_queue_limit
+)
+
+def render_avatar_variants(file_content: bytes, upload_dir: str, base_name: str,
+                           sizes: Iterable[int], max_pixels: int) -> Dict[int, Dict[str, str]]:
+    """
+    Decode an image once and write a JPEG and a WebP variant per size.
+    Returns {size: {"jpeg": path, "webp": path}}.
+    """
+    variants = {}
+    with Image.open(io.BytesIO(file_content)) as source:
+        # Only the header has been read so far
+        width, height = source.size
+        if width * height > max_pixels:
+            raise ValueError(f"Image has too many pixels ({width}x{height})")
+        
+        largest = max(sizes)
+        # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+        source.draft("RGB", (largest, largest))
+        img = source.convert("RGB")
+    
+    # Shrink progressively from the largest size to reuse the previous result
+    for size in sorted(sizes, reverse=True):
+        img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        
+        jpeg_path = os.path.join(upload_dir, f"{base_name}_{size}.jpg")
+        webp_path = os.path.join(upload_dir, f"{base_name}_{size}.webp")
+        _save_atomic(img, jpeg_path, "JPEG", quality=85, optimize=True)
+        _save_atomic(img, webp_path, "WEBP", quality=80, method=2)
+        variants[size] = {"jpeg": jpeg_path, "webp": webp_path}
+    
+    return variants
+
+def _save_atomic(img: Image.Image, path: str, format: str, **options):
+    """Save through a temporary file, as identical uploads may render concurrently"""
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        img.save(temp_path, format, **options)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def process_avatar_variants(file_content: bytes, upload_dir: str, base_name: str) -> Dict[int, Dict[str, str]]:
+    """Render avatar variants on the avatar process pool and wait for the result"""
+    if len(file_content) > settings.avatar_max_bytes:
+        raise ValueError("Avatar file is too large")
+    
+    future = _avatar_executor.submit(
+        render_avatar_variants,
+        file_content,
+        upload_dir,
+        base_name,
+        settings.avatar_sizes,
+        settings.avatar_max_pixels
+    )
+    return future.result()
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.user import User
+
+AVATAR_DIR = "uploads/avatars"
+
+# Content-addressed files: "<sha256><ext>" for the original and
+# "<sha256>_<size>.<ext>" for the rendered variants
+CONTENT_ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64})(?:_\d+)?\.[a-z0-9]+$")
+
+def content_hash(file_content: bytes) -> str:
+    """Name under which an avatar is stored"""
+    return hashlib.sha256(file_content).hexdigest()
+
+def stored_variants(upload_dir: str, base_name: str) -> Optional[Dict[int, Dict[str, str]]]:
+    """Return the variant paths if every configured size was already rendered"""
+    variants = {}
+    for size in settings.avatar_sizes:
+        paths = {
+            "jpeg": os.path.join(upload_dir, f"{base_name}_{size}.jpg"),
+            "webp": os.path.join(upload_dir, f"{base_name}_{size}.webp")
+        }
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        variants[size] = paths
+    return variants
+
+def write_atomic(path: str, file_content: bytes):
+    """Write a file so readers never see it partially written"""
+    # Unique per call: concurrent uploads of the same content share the path
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(file_content)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def collect_unreferenced_avatars(db: Session, upload_dir: str = AVATAR_DIR,
+                                 grace_seconds: int = 3600) -> List[str]:
+    """
+    Delete content-addressed avatar files no user points to anymore.
+    Files younger than grace_seconds are kept so uploads in progress survive.
+    Returns the removed paths.
+    """
+    referenced = set()
+    for avatar_url, thumbnail_url in db.query(User.avatar_url, User.avatar_thumbnail_url):
+        for url in (avatar_url, thumbnail_url):
+            match = CONTENT_ADDRESSED_NAME.match(os.path.basename(url or ""))
+            if match:
+                referenced.add(match.group(1))
+    
+    removed = []
+    cutoff = time.time() - grace_seconds
+    for entry in os.scandir(upload_dir):
+        match = CONTENT_ADDRESSED_NAME.match(entry.name)
+        if not match or match.group(1) in referenced:
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue
+        os.unlink(entry.path)
+        removed.append(entry.path)
+    
+    return removed
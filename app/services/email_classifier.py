@@ -1,111 +1,773 @@
+import asyncio
+import copy
 import os
-from typing import Tuple
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Generator, List, NamedTuple, Optional, Sequence, Tuple
 from app.config import settings
 from app.utils.preprocessing import email_preprocessor
+from app.utils.nlp_bundle import bundle_model_path
+from app.services.linear_classifier import load_linear_model
+from app.services.near_duplicates import near_duplicate_index, fingerprint, group_near_duplicates
+from app.utils.executors import BoundedExecutor, ExecutorBusy
+from app.metrics import CLASSIFICATIONS, INFERENCE_SHED, MODEL_LOAD_SECONDS, timed_stage
 from app.utils.portuguese_config import (
     PRODUCTIVE_RESPONSES, 
     UNPRODUCTIVE_RESPONSES,
     PORTUGUESE_MODEL_CONFIG
 )
 
+# Version recorded for models loaded from settings rather than the registry
+BUILTIN_VERSION = "builtin"
+
+# Run through a model before it takes traffic
+WARM_UP_SAMPLES = [
+    ("Reunião de projeto", "Precisamos revisar o cronograma da entrega amanhã."),
+    ("Feliz aniversário", "Parabéns pelo seu dia, muitas felicidades!"),
+    ("Erro no sistema", "Não consigo acessar a plataforma, podem ajudar com urgência?")
+]
+
+class RuleSignals(NamedTuple):
+    productive: int
+    unproductive: int
+    
+    @property
+    def hits(self) -> int:
+        return max(self.productive, self.unproductive)
+    
+    @property
+    def margin(self) -> float:
+        """0 when hits conflict evenly, 1 when they all agree"""
+        total = self.productive + self.unproductive
+        return abs(self.productive - self.unproductive) / total if total else 0.0
+    
+    @property
+    def label(self) -> str:
+        return "PRODUCTIVE" if self.productive >= self.unproductive else "UNPRODUCTIVE"
+
+class ModelHandle(NamedTuple):
+    """A loaded set of models; replaced as a whole, never mutated"""
+    version: str
+    classifier: Any = None  # transformers text-classification pipeline
+    linear_model: Any = None
+    
+    @property
+    def model(self):
+        return self.classifier.model if self.classifier is not None else None
+
+# State private to each inference worker thread
+_worker_state = threading.local()
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def inference_pool_size(workers: Optional[int] = None, threads: Optional[int] = None) -> Tuple[int, int]:
+    """
+    (inference workers, torch threads per worker) for this process, so that
+    workers x threads x server processes doesn't exceed the CPU cores
+    """
+    cores = max(1, available_cores() // max(1, settings.web_concurrency))
+    threads = min(threads or settings.inference_threads_per_worker, cores)
+    workers = workers or settings.inference_workers or max(1, cores // threads)
+    return workers, threads
+
+def _init_inference_thread(torch_threads: int):
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+class InferenceShed(Exception):
+    """Raised when the transformer can't take a request: queue full or deadline passed"""
+    def __init__(self, reason: str):
+        super().__init__(f"Inference shed: {reason}")
+        self.reason = reason
+
+class _InferenceStep(NamedTuple):
+    """
+    Work a classification hands to the inference pool. Classifications are
+    generators yielding these, so one implementation serves both the blocking
+    entry points and the ones awaited on the event loop.
+    """
+    fn: Any
+    args: tuple
+    # time.monotonic() by which the result is needed; None waits as long as it takes
+    deadline: Optional[float]
+
+class ClassificationResult(NamedTuple):
+    classification: str
+    response: str
+    model_version: str
+    path: str
+
+def truncate_ids(ids: List[int], budget: int, head_tokens: int) -> List[int]:
+    """Keep the first head_tokens and the last tokens of an over-long sequence"""
+    if len(ids) <= budget:
+        return ids
+    head_tokens = min(head_tokens, budget)
+    return ids[:head_tokens] + ids[len(ids) - (budget - head_tokens):]
+
+def encode_texts(tokenizer, texts: Sequence[str], max_length: int, head_tokens: int) -> List[List[int]]:
+    """Tokenize once and fit each text into max_length, special tokens included"""
+    budget = max_length - tokenizer.num_special_tokens_to_add(pair=False)
+    encoded = tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+    return [
+        tokenizer.build_inputs_with_special_tokens(truncate_ids(ids, budget, head_tokens))
+        for ids in encoded
+    ]
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[List[int]]:
+    """Indices grouped into batches of similar length, so little is padded"""
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+def load_pipeline(model_source: str, local_only: bool):
+    """Build a text-classification pipeline from a model name or directory"""
+    # Imported here so importing this module doesn't pull in torch
+    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+    import torch
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_source, local_files_only=local_only)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_source, 
+        num_labels=2,
+        local_files_only=local_only
+    )
+    return pipeline(
+        "text-classification",
+        model=model,
+        tokenizer=tokenizer,
+        device=0 if torch.cuda.is_available() else -1
+    )
+
 class EmailClassifier:
     def __init__(self):
-        self.model = None
-        self.tokenizer = None
-        self.classifier = None
         self.use_ml_model = settings.use_ml_model
-        if self.use_ml_model:
-            self._load_model()
+        self.cascade = settings.classifier_cascade
+        self.cascade_min_hits = settings.cascade_min_hits
+        self.cascade_min_margin = settings.cascade_min_margin
+        self.linear_min_confidence = settings.linear_min_confidence
+        self.inference_deadline = settings.inference_deadline_ms / 1000
+        self.bucket_deadline = settings.inference_bucket_deadline_ms / 1000
+        self._inference: Optional[BoundedExecutor] = None
+        self.configure_inference()
+        # Each classification reads the active handle once, so a swap never
+        # changes the models under a request that is already running
+        self._active = ModelHandle(BUILTIN_VERSION)
+        self._previous: Optional[ModelHandle] = None
+        self._swap_lock = threading.Lock()
+        # The model is loaded by warm_up() at startup, not at import time;
+        # until then classify_email uses the rule-based path
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+    
+    def configure_inference(self, workers: Optional[int] = None, threads: Optional[int] = None):
+        """
+        (Re)create the transformer inference pool. Every tokenization and
+        forward pass runs on it, each worker with its own tokenizer and a fixed
+        number of torch threads, sharing the weights of the active handle.
+        It is also the admission control: a request that can't be queued, or
+        whose deadline passes while waiting, is degraded to the linear tier or
+        the rules instead of adding to the backlog.
+        """
+        self.inference_workers, self.inference_threads = inference_pool_size(workers, threads)
+        previous = self._inference
+        self._inference = BoundedExecutor(
+            ThreadPoolExecutor(
+                max_workers=self.inference_workers,
+                thread_name_prefix="inference",
+                initializer=_init_inference_thread,
+                initargs=(self.inference_threads,)
+            ),
+            max_pending=self.inference_workers + settings.inference_queue_limit
+        )
+        if previous is not None:
+            previous.shutdown(wait=False)
+    
+    @property
+    def is_ready(self) -> bool:
+        """True once warm_up() has finished"""
+        return self._ready.is_set()
+    
+    @property
+    def active(self) -> ModelHandle:
+        return self._active
+    
+    @property
+    def previous(self) -> Optional[ModelHandle]:
+        return self._previous
+    
+    @property
+    def classifier(self):
+        return self._active.classifier
+    
+    @property
+    def model(self):
+        return self._active.model
+    
+    @property
+    def linear_model(self):
+        return self._active.linear_model
+    
+    def preload(self):
+        """
+        Load the model without running inference, for a pre-fork master.
+        Inference is left to the workers, as torch thread pools don't survive fork.
+        """
+        with self._load_lock:
+            self._install_initial_handle()
+            self._freeze(self._active)
+    
+    def warm_up(self):
+        """Load the model (if enabled) and run the sample inputs to warm it"""
+        with self._load_lock:
+            self._install_initial_handle()
+            try:
+                self.warm(self._active)
+            except Exception as e:
+                print(f"Model warm-up failed: {e}")
+        self._ready.set()
+    
+    def _install_initial_handle(self):
+        if self._loaded:
+            return
+        handle = self._initial_handle()
+        with self._swap_lock:
+            # An activation that finished meanwhile takes precedence
+            if not self._loaded:
+                self._active = handle
+                self._loaded = True
+    
+    def _initial_handle(self) -> ModelHandle:
+        """
+        The version recorded as active in the registry, else the one named in
+        settings, else the configured models
+        """
+        # Imported here, the registry builds on this module
+        from app.services.model_registry import model_registry
+        version = model_registry.active_version() or settings.model_version
+        if version and version != BUILTIN_VERSION:
+            return model_registry.load(version, load_transformer=self.use_ml_model)
+        return self.builtin_handle()
+    
+    def builtin_handle(self) -> ModelHandle:
+        """Load the models configured in settings, outside the registry"""
+        return ModelHandle(
+            BUILTIN_VERSION,
+            classifier=self._load_model() if self.use_ml_model else None,
+            linear_model=load_linear_model() if self.cascade else None
+        )
+    
+    def _freeze(self, handle: ModelHandle):
+        if handle.model is not None:
+            # Read-only weights keep the shared pages from being copied
+            handle.model.eval()
+            for parameter in handle.model.parameters():
+                parameter.requires_grad_(False)
+    
+    def warm(self, handle: ModelHandle):
+        """Run the sample inputs through a handle's models"""
+        for subject, message in WARM_UP_SAMPLES:
+            if handle.linear_model is not None:
+                handle.linear_model.predict(subject, message)
+            if handle.classifier is not None:
+                # On the inference pool (past its admission limit, so a busy
+                # server can't shed the warm-up), warming the worker tokenizers
+                self._inference.executor.submit(self._predict, f"{subject} {message}", handle).result()
+    
+    def activate(self, handle: ModelHandle):
+        """Warm a loaded handle, then swap it in; the current one is kept for rollback"""
+        self._freeze(handle)
+        self.warm(handle)
+        with self._swap_lock:
+            self._previous, self._active = self._active, handle
+            self._loaded = True
+        print(f"Activated model version {handle.version}")
+    
+    def rollback(self) -> str:
+        """Swap the previous handle back in and return its version"""
+        with self._swap_lock:
+            if self._previous is None:
+                raise Exception("No previous model version to roll back to")
+            self._active, self._previous = self._previous, self._active
+        print(f"Rolled back to model version {self._active.version}")
+        return self._active.version
     
     def _load_model(self):
         """Load the pre-trained model for email classification"""
+        # With an offline bundle configured, never try the Hugging Face hub
+        local_only = bool(settings.nlp_bundle_path)
+        load_start = time.perf_counter()
+        classifier = None
+        
         try:
             # Use Portuguese model configuration
             model_name = PORTUGUESE_MODEL_CONFIG["primary_model"]
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(
-                model_name, 
-                num_labels=2
-            )
-            
-            # Create a pipeline for text classification
-            self.classifier = pipeline(
-                "text-classification",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=0 if torch.cuda.is_available() else -1
-            )
+            classifier = load_pipeline(bundle_model_path(model_name) or model_name, local_only)
         except Exception as e:
             print(f"Error loading Portuguese model: {e}")
             try:
                 # Fallback to multilingual model
                 model_name = PORTUGUESE_MODEL_CONFIG["fallback_model"]
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.model = AutoModelForSequenceClassification.from_pretrained(
-                    model_name, 
-                    num_labels=2
-                )
-                
-                self.classifier = pipeline(
-                    "text-classification",
-                    model=self.model,
-                    tokenizer=self.tokenizer,
-                    device=0 if torch.cuda.is_available() else -1
-                )
+                classifier = load_pipeline(bundle_model_path(model_name) or model_name, local_only)
             except Exception as e2:
                 print(f"Error loading multilingual model: {e2}")
                 # Fallback to rule-based classification
-                self.classifier = None
+                classifier = None
+        
+        if classifier:
+            MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start)
+        return classifier
     
     def toggle_ml_model(self, enable: bool):
         """Toggle between ML model and rule-based classification"""
         self.use_ml_model = enable
         if enable and not self.classifier:
-            self._load_model()
+            classifier = self._load_model()
+            with self._swap_lock:
+                self._active = self._active._replace(classifier=classifier)
         elif not enable:
-            # Optionally unload model to free memory
-            self.classifier = None
-            self.model = None
-            self.tokenizer = None
+            # Unload the model to free memory
+            with self._swap_lock:
+                self._active = self._active._replace(classifier=None)
     
     def classify_email(self, subject: str, message: str) -> Tuple[str, str]:
         """
         Classify email as productive or unproductive
         Returns: (classification, response)
         """
+        result = self.classify(subject, message)
+        return result.classification, result.response
+    
+    def classify(self, subject: str, message: str, user_id: Optional[int] = None,
+                 prior: Optional[str] = None) -> ClassificationResult:
+        """
+        Classify an email, reporting the model version and path that decided it.
+        A sender prior (see sender_reputation) decides without any model.
+        Blocks the calling thread while the transformer runs; on the event
+        loop use classify_async.
+        """
+        return self._run(self._classify_steps(subject, message, user_id, prior))
+    
+    async def classify_async(self, subject: str, message: str, user_id: Optional[int] = None,
+                             prior: Optional[str] = None) -> ClassificationResult:
+        """classify() awaiting the transformer, so the event loop keeps serving meanwhile"""
+        return await self._run_async(self._classify_steps(subject, message, user_id, prior))
+    
+    def _classify_steps(self, subject: str, message: str, user_id: Optional[int],
+                        prior: Optional[str]) -> Generator[_InferenceStep, Any, ClassificationResult]:
+        handle = self._active
+        deadline = time.monotonic() + self.inference_deadline
+        if prior:
+            return self._result(handle, "sender_prior", prior, subject, message)
+        key, value = self._fingerprint(subject, message, user_id)
+        result = self._near_duplicate_result(handle, key, value, subject, message)
+        if result is None:
+            result = yield from self._classify_with(handle, subject, message, deadline)
+            self._remember(key, value, result)
+        return result
+    
+    def _classify_with(self, handle: ModelHandle, subject: str, message: str,
+                       deadline: float) -> Generator[_InferenceStep, Any, ClassificationResult]:
+        result, processed_text = self._classify_without_transformer(handle, subject, message)
+        if result:
+            return result
+        
+        try:
+            classification = yield _InferenceStep(self._ml_classification, (processed_text, handle), deadline)
+        except InferenceShed as e:
+            INFERENCE_SHED.labels(reason=e.reason).inc()
+            return self._degraded_result(handle, subject, message)
+        except Exception as e:
+            print(f"ML classification failed: {e}")
+            # Fallback to rule-based
+            return self._rules_result(handle, "ml_fallback", subject, message)
+        with timed_stage("response"):
+            return self._result(handle, "ml", classification, subject, message)
+    
+    def classify_batch(self, emails: Sequence[Tuple[str, str]], user_id: Optional[int] = None,
+                       priors: Optional[Sequence[Optional[str]]] = None) -> List[ClassificationResult]:
+        """
+        Classify (subject, message) pairs; the ones that need the transformer
+        run through it together in length-bucketed batches. Blocks the calling
+        thread meanwhile; on the event loop use classify_batch_async.
+        """
+        return self._run(self._classify_batch_steps(emails, user_id, priors))
+    
+    async def classify_batch_async(self, emails: Sequence[Tuple[str, str]], user_id: Optional[int] = None,
+                                   priors: Optional[Sequence[Optional[str]]] = None) -> List[ClassificationResult]:
+        """classify_batch() awaiting the transformer, so the event loop keeps serving meanwhile"""
+        return await self._run_async(self._classify_batch_steps(emails, user_id, priors))
+    
+    def _classify_batch_steps(self, emails: Sequence[Tuple[str, str]], user_id: Optional[int],
+                              priors: Optional[Sequence[Optional[str]]]
+                              ) -> Generator[_InferenceStep, Any, List[ClassificationResult]]:
+        handle = self._active
+        results = [None] * len(emails)
+        priors = priors or [None] * len(emails)
+        fingerprints = [
+            (None, None) if prior else self._fingerprint(subject, message, user_id)
+            for (subject, message), prior in zip(emails, priors)
+        ]
+        pending = []
+        for index, (subject, message) in enumerate(emails):
+            if priors[index]:
+                results[index] = self._result(handle, "sender_prior", priors[index], subject, message)
+                continue
+            key, value = fingerprints[index]
+            results[index] = self._near_duplicate_result(handle, key, value, subject, message)
+            if results[index]:
+                continue
+            result, processed_text = self._classify_without_transformer(handle, subject, message)
+            if result:
+                results[index] = result
+            else:
+                pending.append((index, processed_text))
+        
+        if pending:
+            # Copies of one template within the batch run through the model
+            # once; the others reuse that prediction as near-duplicates
+            representatives = group_near_duplicates(
+                [fingerprints[index] for index, _ in pending], near_duplicate_index.max_distance
+            )
+            queued = [position for position, representative in enumerate(representatives)
+                      if representative == position]
+            try:
+                predictions, shed = yield from self._predict_batch(
+                    [pending[position][1] for position in queued], handle
+                )
+            except InferenceShed as e:
+                # Tokenization couldn't be queued, so nothing ran
+                predictions, shed = [None] * len(queued), dict.fromkeys(range(len(queued)), e.reason)
+            except Exception as e:
+                print(f"ML classification failed: {e}")
+                predictions, shed = None, {}
+            slots = {position: slot for slot, position in enumerate(queued)}
+            
+            # Only the buckets that were shed degrade; the others keep their predictions
+            for position, (index, _) in enumerate(pending):
+                slot = slots[representatives[position]]
+                if predictions is None:
+                    results[index] = self._rules_result(handle, "ml_fallback", *emails[index])
+                elif slot in shed:
+                    INFERENCE_SHED.labels(reason=shed[slot]).inc()
+                    results[index] = self._degraded_result(handle, *emails[index])
+                else:
+                    label, confidence = predictions[slot]
+                    classification = self._to_classification(label, confidence)
+                    path = "ml" if representatives[position] == position else "near_duplicate"
+                    results[index] = self._result(handle, path, classification, *emails[index])
+        
+        for (key, value), result in zip(fingerprints, results):
+            if result.path not in ("near_duplicate", "sender_prior"):
+                self._remember(key, value, result)
+        return results
+    
+    def _fingerprint(self, subject: str, message: str, user_id: Optional[int]) -> Tuple[Optional[int], Any]:
+        """Near-duplicate index key and fingerprint, (None, None) when detection is off"""
+        key = near_duplicate_index.scope_key(user_id)
+        if key is None:
+            return None, None
+        with timed_stage("fingerprint"):
+            return key, fingerprint(subject, message)
+    
+    def _near_duplicate_result(self, handle: ModelHandle, key: Optional[int], value,
+                               subject: str, message: str) -> Optional[ClassificationResult]:
+        """Reuse the classification of a near-duplicate the active model already classified"""
+        if value is None:
+            return None
+        with timed_stage("fingerprint"):
+            classification = near_duplicate_index.lookup(key, value, handle.version)
+        if classification is None:
+            return None
+        return self._result(handle, "near_duplicate", classification, subject, message)
+    
+    def _remember(self, key: Optional[int], value, result: ClassificationResult):
+        # Fallbacks and empty emails say nothing about the template
+        if value is not None and result.path not in ("empty", "ml_fallback", "degraded_linear", "degraded_rules"):
+            near_duplicate_index.add(key, value, result.classification, result.model_version)
+    
+    def _classify_without_transformer(self, handle: ModelHandle, subject: str,
+                                      message: str) -> Tuple[Optional[ClassificationResult], str]:
+        """
+        Decide with the rules, the linear tier or the empty-text check when
+        possible; otherwise return the preprocessed text for the transformer.
+        """
+        # In cascade mode, clear-cut emails never reach the transformer: the
+        # keyword rules decide first, then the linear tier if it is confident
+        ml_available = self.use_ml_model and handle.classifier is not None
+        if self.cascade and (ml_available or handle.linear_model is not None):
+            with timed_stage("rules"):
+                classification = self.cascade_label(self.rule_signals(subject, message))
+            if classification:
+                return self._result(handle, "cascade_rules", classification, subject, message), ""
+            
+            if handle.linear_model is not None:
+                with timed_stage("linear"):
+                    classification, confidence = handle.linear_model.predict(subject, message)
+                if confidence >= self.linear_min_confidence or not ml_available:
+                    return self._result(handle, "linear", classification, subject, message), ""
+        
         # Preprocess the text (always active for analysis)
-        processed_text = email_preprocessor.extract_features(subject, message)
+        with timed_stage("preprocess"):
+            processed_text = email_preprocessor.extract_features(subject, message)
         
         if not processed_text.strip():
-            return "UNPRODUCTIVE", "Este email parece estar vazio ou não contém conteúdo significativo."
+            CLASSIFICATIONS.labels(path="empty").inc()
+            return ClassificationResult(
+                "UNPRODUCTIVE",
+                "Este email parece estar vazio ou não contém conteúdo significativo.",
+                handle.version,
+                "empty"
+            ), processed_text
         
         # Choose classification method based on toggle
-        if self.use_ml_model and self.classifier:
-            try:
-                result = self.classifier(processed_text)
-                confidence = result[0]['score']
-                label = result[0]['label']
-                
-                # Convert model output to our classification
-                confidence_threshold = PORTUGUESE_MODEL_CONFIG["confidence_threshold"]
-                if label == 'LABEL_1' or confidence > confidence_threshold:
-                    classification = "PRODUCTIVE"
-                    response = self._generate_productive_response(subject, message)
+        if ml_available:
+            return None, processed_text
+        
+        # Use rule-based classification
+        return self._rules_result(handle, "rule_based", subject, message), processed_text
+    
+    def _run(self, steps: Generator):
+        """Drive a classification, waiting on this thread for each inference step"""
+        try:
+            step = next(steps)
+            while True:
+                try:
+                    value = self._admit(step.fn, *step.args, deadline=step.deadline)
+                except Exception as e:
+                    step = steps.throw(e)
                 else:
-                    classification = "UNPRODUCTIVE"
-                    response = self._generate_unproductive_response(subject, message)
-                    
-            except Exception as e:
-                print(f"ML classification failed: {e}")
-                # Fallback to rule-based
-                classification, response = self._rule_based_classification(subject, message)
-        else:
-            # Use rule-based classification
+                    step = steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+    
+    async def _run_async(self, steps: Generator):
+        """Drive a classification, awaiting each inference step"""
+        try:
+            step = next(steps)
+            while True:
+                try:
+                    value = await self._admit_async(step.fn, *step.args, deadline=step.deadline)
+                except Exception as e:
+                    step = steps.throw(e)
+                else:
+                    step = steps.send(value)
+        except StopIteration as stop:
+            return stop.value
+    
+    def _submit(self, fn, *args, deadline: Optional[float]):
+        """
+        Queue fn on the inference pool. Raises InferenceShed when the queue is
+        full or the deadline (time.monotonic(), None for none) already passed.
+        """
+        if deadline is not None and deadline <= time.monotonic():
+            raise InferenceShed("deadline")
+        try:
+            return self._inference.submit(fn, *args)
+        except ExecutorBusy:
+            raise InferenceShed("queue_full")
+    
+    def _admit(self, fn, *args, deadline: Optional[float]):
+        """Run fn on the inference pool and wait for it until the deadline (InferenceShed after)"""
+        future = self._submit(fn, *args, deadline=deadline)
+        with timed_stage("inference"):
+            try:
+                return future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                # Frees the slot if it never started; a running one finishes unobserved
+                future.cancel()
+                raise InferenceShed("deadline")
+    
+    async def _admit_async(self, fn, *args, deadline: Optional[float]):
+        """_admit() for the event loop: the wait is awaited instead of blocking it"""
+        future = self._submit(fn, *args, deadline=deadline)
+        with timed_stage("inference"):
+            try:
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future),
+                    None if deadline is None else max(0.0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                # wait_for cancels the pool future too: the slot is freed if it
+                # never started; a running one finishes unobserved
+                raise InferenceShed("deadline")
+    
+    def _degraded_result(self, handle: ModelHandle, subject: str, message: str) -> ClassificationResult:
+        """Answer without the transformer when inference is overloaded"""
+        if handle.linear_model is not None:
+            with timed_stage("linear"):
+                classification, _ = handle.linear_model.predict(subject, message)
+            return self._result(handle, "degraded_linear", classification, subject, message)
+        return self._rules_result(handle, "degraded_rules", subject, message)
+    
+    def _rules_result(self, handle: ModelHandle, path: str, subject: str, message: str) -> ClassificationResult:
+        with timed_stage("rules"):
             classification, response = self._rule_based_classification(subject, message)
+        CLASSIFICATIONS.labels(path=path).inc()
+        return ClassificationResult(classification, response, handle.version, path)
+    
+    def _result(self, handle: ModelHandle, path: str, classification: str,
+                subject: str, message: str) -> ClassificationResult:
+        CLASSIFICATIONS.labels(path=path).inc()
+        return ClassificationResult(
+            classification, self._response_for(classification, subject, message), handle.version, path
+        )
+    
+    def _ml_classification(self, processed_text: str, handle: Optional[ModelHandle] = None) -> str:
+        """Run the model and convert its output to our classification"""
+        label, confidence = self._predict(processed_text, handle)
+        return self._to_classification(label, confidence)
+    
+    def _to_classification(self, label: str, confidence: float) -> str:
+        """Convert model output to our classification"""
+        confidence_threshold = PORTUGUESE_MODEL_CONFIG["confidence_threshold"]
+        if label == 'LABEL_1' or confidence > confidence_threshold:
+            return "PRODUCTIVE"
+        return "UNPRODUCTIVE"
+    
+    def _predict(self, processed_text: str, handle: Optional[ModelHandle] = None) -> Tuple[str, float]:
+        """Tokenize and run the model in separately timed stages"""
+        classifier = (handle or self._active).classifier
+        with timed_stage("tokenize"):
+            input_ids = self._encode(classifier, [processed_text])
+        with timed_stage("forward"):
+            return self._forward(classifier, input_ids)[0]
+    
+    def _predict_batch(self, processed_texts: List[str], handle: ModelHandle
+                       ) -> Generator[_InferenceStep, Any, Tuple[List[Optional[Tuple[str, float]]], Dict[int, str]]]:
+        """
+        Predict many texts, batching similar lengths together. Returns the
+        predictions (None for shed texts) and the shed reason by text position;
+        a bucket the inference queue can't take, or that isn't done within
+        bucket_deadline of being queued, is shed on its own and the following
+        buckets still run.
+        """
+        classifier = handle.classifier
+        input_ids = yield _InferenceStep(self._tokenize, (classifier, processed_texts), self._next_bucket_deadline())
+        
+        predictions = [None] * len(processed_texts)
+        shed = {}
+        batch_size = PORTUGUESE_MODEL_CONFIG["batch_size"]
+        for bucket in length_buckets([len(ids) for ids in input_ids], batch_size):
+            # One bucket at a time, so a large upload never holds more than one
+            # queue slot and single-email requests interleave with it
+            try:
+                outputs = yield _InferenceStep(
+                    self._forward_timed, (classifier, [input_ids[index] for index in bucket]),
+                    self._next_bucket_deadline()
+                )
+            except InferenceShed as e:
+                shed.update(dict.fromkeys(bucket, e.reason))
+                continue
+            for index, output in zip(bucket, outputs):
+                predictions[index] = output
+        return predictions, shed
+    
+    def _next_bucket_deadline(self) -> float:
+        """Each batch step gets its own deadline, counted from when it is queued"""
+        return time.monotonic() + self.bucket_deadline
+    
+    def _forward_timed(self, classifier, input_ids: List[List[int]]) -> List[Tuple[str, float]]:
+        with timed_stage("forward"):
+            return self._forward(classifier, input_ids)
+    
+    def embed(self, processed_texts: List[str]) -> Optional[Tuple[str, Any]]:
+        """
+        Mean-pooled last hidden states of the active transformer, with its
+        version; None when no transformer is loaded. Raises InferenceShed when
+        a step can't be queued or misses its bucket_deadline.
+        """
+        return self._run(self._embed_steps(processed_texts))
+    
+    async def embed_async(self, processed_texts: List[str]) -> Optional[Tuple[str, Any]]:
+        """embed() awaiting the transformer, so the event loop keeps serving meanwhile"""
+        return await self._run_async(self._embed_steps(processed_texts))
+    
+    def _embed_steps(self, processed_texts: List[str]) -> Generator[_InferenceStep, Any, Optional[Tuple[str, Any]]]:
+        handle = self._active
+        if not self.use_ml_model or handle.classifier is None:
+            return None
+        classifier = handle.classifier
+        input_ids = yield _InferenceStep(self._tokenize, (classifier, processed_texts), self._next_bucket_deadline())
         
-        return classification, response
+        vectors = [None] * len(processed_texts)
+        batch_size = PORTUGUESE_MODEL_CONFIG["batch_size"]
+        for bucket in length_buckets([len(ids) for ids in input_ids], batch_size):
+            pooled = yield _InferenceStep(
+                self._pool, (classifier, [input_ids[index] for index in bucket]), self._next_bucket_deadline()
+            )
+            for index, vector in zip(bucket, pooled):
+                vectors[index] = vector
+        return handle.version, vectors
+    
+    def _pool(self, classifier, input_ids: List[List[int]]):
+        import torch
+        inputs = self._tokenizer(classifier).pad({"input_ids": input_ids}, return_tensors="pt")
+        inputs = {name: tensor.to(classifier.device) for name, tensor in inputs.items()}
+        with timed_stage("embed"), torch.inference_mode():
+            hidden = classifier.model(**inputs, output_hidden_states=True).hidden_states[-1]
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        return ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).float().cpu().numpy()
+    
+    def _tokenizer(self, classifier):
+        """
+        This thread's copy of the classifier's tokenizer. Fast tokenizers
+        update their truncation state on each call, so one shared across
+        threads fails with "Already borrowed".
+        """
+        cached = getattr(_worker_state, "tokenizer", None)
+        if cached is None or cached[0]() is not classifier:
+            # Weak reference, so a swapped-out model isn't kept alive
+            cached = (weakref.ref(classifier), copy.deepcopy(classifier.tokenizer))
+            _worker_state.tokenizer = cached
+        return cached[1]
+    
+    def _tokenize(self, classifier, texts: Sequence[str]) -> List[List[int]]:
+        with timed_stage("tokenize"):
+            return self._encode(classifier, texts)
+    
+    def _encode(self, classifier, texts: Sequence[str]) -> List[List[int]]:
+        # Long emails keep their opening and closing, where the ask usually is
+        return encode_texts(
+            self._tokenizer(classifier),
+            texts,
+            PORTUGUESE_MODEL_CONFIG["max_length"],
+            PORTUGUESE_MODEL_CONFIG["truncation_head_tokens"]
+        )
+    
+    def _forward(self, classifier, input_ids: List[List[int]]) -> List[Tuple[str, float]]:
+        """One padded forward pass; (label, score) per sequence"""
+        import torch
+        inputs = self._tokenizer(classifier).pad({"input_ids": input_ids}, return_tensors="pt")
+        inputs = {name: tensor.to(classifier.device) for name, tensor in inputs.items()}
+        with torch.inference_mode():
+            probabilities = classifier.model(**inputs).logits.softmax(dim=-1)
+        scores, indices = probabilities.max(dim=-1)
+        id2label = classifier.model.config.id2label
+        return [(id2label[int(index)], float(score)) for score, index in zip(scores, indices)]
+    
+    def rule_signals(self, subject: str, message: str) -> RuleSignals:
+        """Keyword hit counts used to gate the cascade"""
+        return RuleSignals(*email_preprocessor.keyword_scores(f"{subject} {message}"))
+    
+    def cascade_label(self, signals: RuleSignals) -> Optional[str]:
+        """The rule label when the signals clear the cascade thresholds, else None"""
+        if signals.hits >= self.cascade_min_hits and signals.margin >= self.cascade_min_margin:
+            return signals.label
+        return None
+    
+    def _response_for(self, classification: str, subject: str, message: str) -> str:
+        if classification == "PRODUCTIVE":
+            return self._generate_productive_response(subject, message)
+        return self._generate_unproductive_response(subject, message)
     
     def _rule_based_classification(self, subject: str, message: str) -> Tuple[str, str]:
         """Rule-based classification using keyword matching"""
@@ -3,10 +3,32 @@ from sqlalchemy import and_, desc
 from app.models.categorized_email import CategorizedEmail, EmailClassification
 from app.models.email_statistics import EmailStatistics
 from app.schemas.email import EmailType, EmailListType, PaginationType
-from app.services.email_classifier import email_classifier
-from typing import Optional, List, Tuple
+from app.services.email_classifier import email_classifier, ClassificationResult
+from app.services.sender_reputation import (
+    UNRECORDED_PATHS, sender_prior_labels, record_classifications, recorded_weight
+)
+from app.services.embedding_store import (
+    embedding_store, embedding_space, embed_emails, embed_emails_async,
+    store_email_embeddings, store_email_embeddings_async
+)
+from app.config import settings
+from typing import Optional, List, Tuple, Iterable
 import math
 
+# Columns backing each EmailType field, used for projected read-only queries
+EMAIL_TYPE_COLUMNS = {
+    "id": CategorizedEmail.id,
+    "user_id": CategorizedEmail.user_id,
+    "email": CategorizedEmail.email,
+    "subject": CategorizedEmail.subject,
+    "response": CategorizedEmail.response,
+    "classification": CategorizedEmail.classification,
+    "model_version": CategorizedEmail.model_version,
+    "classification_path": CategorizedEmail.classification_path,
+    "created_at": CategorizedEmail.created_at,
+    "updated_at": CategorizedEmail.updated_at
+}
+
 class EmailService:
     def __init__(self, db: Session):
         self.db = db
@@ -14,18 +36,36 @@ class EmailService:
     def create_email(self, user_id: int, email: str, subject: str, message: str) -> CategorizedEmail:
         """Create a new categorized email"""
         # Classify the email
-        classification, response = email_classifier.classify_email(subject, message)
-        
+        prior = sender_prior_labels(self.db, user_id, [email])[0]
+        result = email_classifier.classify(subject, message, user_id, prior)
+        categorized_email = self._store_email(user_id, email, subject, message, result)
+        store_email_embeddings(user_id, [categorized_email.id], [(subject, message)])
+        return categorized_email
+    
+    async def create_email_async(self, user_id: int, email: str, subject: str, message: str) -> CategorizedEmail:
+        """create_email() awaiting the transformer instead of blocking the event loop"""
+        prior = sender_prior_labels(self.db, user_id, [email])[0]
+        result = await email_classifier.classify_async(subject, message, user_id, prior)
+        categorized_email = self._store_email(user_id, email, subject, message, result)
+        await store_email_embeddings_async(user_id, [categorized_email.id], [(subject, message)])
+        return categorized_email
+    
+    def _store_email(self, user_id: int, email: str, subject: str, message: str,
+                     result: ClassificationResult) -> CategorizedEmail:
         # Create the email record
         categorized_email = CategorizedEmail(
             user_id=user_id,
             email=email,
             subject=subject,
-            response=response,
-            classification=EmailClassification(classification)
+            message=message,
+            response=result.response,
+            classification=EmailClassification(result.classification),
+            model_version=result.model_version,
+            classification_path=result.path
         )
         
         self.db.add(categorized_email)
+        self._record_senders(user_id, [(email, result)])
         self.db.commit()
         self.db.refresh(categorized_email)
         
@@ -34,6 +74,58 @@ class EmailService:
         
         return categorized_email
     
+    def create_emails(self, user_id: int, emails: List[dict]) -> List[CategorizedEmail]:
+        """Classify and store a batch of emails (email/subject/message dicts) at once"""
+        priors = sender_prior_labels(self.db, user_id, [email_data['email'] for email_data in emails])
+        results = email_classifier.classify_batch(
+            [(email_data['subject'], email_data['message']) for email_data in emails], user_id, priors
+        )
+        categorized_emails, email_ids = self._store_emails(user_id, emails, results)
+        store_email_embeddings(
+            user_id, email_ids, [(email_data['subject'], email_data['message']) for email_data in emails]
+        )
+        return categorized_emails
+    
+    async def create_emails_async(self, user_id: int, emails: List[dict]) -> List[CategorizedEmail]:
+        """create_emails() awaiting the transformer instead of blocking the event loop"""
+        priors = sender_prior_labels(self.db, user_id, [email_data['email'] for email_data in emails])
+        results = await email_classifier.classify_batch_async(
+            [(email_data['subject'], email_data['message']) for email_data in emails], user_id, priors
+        )
+        categorized_emails, email_ids = self._store_emails(user_id, emails, results)
+        await store_email_embeddings_async(
+            user_id, email_ids, [(email_data['subject'], email_data['message']) for email_data in emails]
+        )
+        return categorized_emails
+    
+    def _store_emails(self, user_id: int, emails: List[dict],
+                      results: List[ClassificationResult]) -> Tuple[List[CategorizedEmail], List[int]]:
+        categorized_emails = [
+            CategorizedEmail(
+                user_id=user_id,
+                email=email_data['email'],
+                subject=email_data['subject'],
+                message=email_data['message'],
+                response=result.response,
+                classification=EmailClassification(result.classification),
+                model_version=result.model_version,
+                classification_path=result.path
+            )
+            for email_data, result in zip(emails, results)
+        ]
+        
+        self.db.add_all(categorized_emails)
+        self._record_senders(user_id, [(email_data['email'], result) for email_data, result in zip(emails, results)])
+        # Flush first so the ids are read without reloading every row after the commit
+        self.db.flush()
+        email_ids = [categorized_email.id for categorized_email in categorized_emails]
+        self.db.commit()
+        
+        # Update statistics once for the whole batch
+        self._update_statistics(user_id)
+        
+        return categorized_emails, email_ids
+    
     def get_email_by_id(self, user_id: int, email_id: int) -> Optional[CategorizedEmail]:
         """Get email by ID for a specific user"""
         return self.db.query(CategorizedEmail).filter(
@@ -43,8 +135,29 @@ class EmailService:
             )
         ).first()
     
-    def get_emails_list(self, user_id: int, page: int = 1, per_page: int = 10) -> EmailListType:
-        """Get paginated list of emails for a user"""
+    def get_email_type_by_id(self, user_id: int, email_id: int,
+                             fields: Optional[Iterable[str]] = None) -> Optional[EmailType]:
+        """Get email by ID as EmailType, loading only the requested fields"""
+        if fields is None:
+            email = self.get_email_by_id(user_id, email_id)
+            return self.to_email_type(email) if email else None
+        
+        row = self.db.query(*self._projection(fields)).filter(
+            and_(
+                CategorizedEmail.id == email_id,
+                CategorizedEmail.user_id == user_id
+            )
+        ).first()
+        
+        return self.row_to_email_type(row) if row else None
+    
+    def get_emails_list(self, user_id: int, page: int = 1, per_page: int = 10,
+                        fields: Optional[Iterable[str]] = None) -> EmailListType:
+        """
+        Get paginated list of emails for a user.
+        When fields is given, only those columns are selected and rows are
+        read as plain tuples instead of ORM objects.
+        """
         # Calculate offset
         offset = (page - 1) * per_page
         
@@ -54,12 +167,19 @@ class EmailService:
         ).count()
         
         # Get emails with pagination
-        emails = self.db.query(CategorizedEmail).filter(
-            CategorizedEmail.user_id == user_id
-        ).order_by(desc(CategorizedEmail.created_at)).offset(offset).limit(per_page).all()
-        
-        # Convert to EmailType
-        email_types = [self.to_email_type(email) for email in emails]
+        if fields is None:
+            emails = self.db.query(CategorizedEmail).filter(
+                CategorizedEmail.user_id == user_id
+            ).order_by(desc(CategorizedEmail.created_at)).offset(offset).limit(per_page).all()
+            
+            # Convert to EmailType
+            email_types = [self.to_email_type(email) for email in emails]
+        else:
+            rows = self.db.query(*self._projection(fields)).filter(
+                CategorizedEmail.user_id == user_id
+            ).order_by(desc(CategorizedEmail.created_at)).offset(offset).limit(per_page).all()
+            
+            email_types = [self.row_to_email_type(row) for row in rows]
         
         # Calculate pagination info
         total_pages = math.ceil(total / per_page) if total > 0 else 1
@@ -76,6 +196,65 @@ class EmailService:
             pagination=pagination
         )
     
+    def find_similar_emails(self, user_id: int, email_id: int, k: int) -> Optional[List[Tuple[EmailType, float]]]:
+        """
+        The user's k emails most similar to one of theirs, with cosine scores;
+        None if it doesn't exist. Raises InferenceShed when the email has to be
+        embedded and the transformer is overloaded.
+        """
+        email = self.get_email_by_id(user_id, email_id)
+        if not email:
+            return None
+        
+        space, query = self._stored_vector(email)
+        if query is None and email.message is not None:
+            # Emails stored before embeddings were enabled
+            space, query = self._embedded_vector(space, embed_emails([(email.subject, email.message)]))
+        return self._similar_emails(email, space, query, k)
+    
+    async def find_similar_emails_async(self, user_id: int, email_id: int,
+                                        k: int) -> Optional[List[Tuple[EmailType, float]]]:
+        """find_similar_emails() awaiting the transformer when the email has to be embedded"""
+        email = self.get_email_by_id(user_id, email_id)
+        if not email:
+            return None
+        
+        space, query = self._stored_vector(email)
+        if query is None and email.message is not None:
+            space, query = self._embedded_vector(space, await embed_emails_async([(email.subject, email.message)]))
+        return self._similar_emails(email, space, query, k)
+    
+    def _stored_vector(self, email: CategorizedEmail) -> tuple:
+        """(space, stored vector or None) of an email"""
+        # No space for emails stored before model versions were recorded;
+        # they are embedded with the active model and searched in its space
+        space = embedding_space(email.model_version)
+        return space, embedding_store.vector(space, email.user_id, email.id) if space else None
+    
+    def _embedded_vector(self, space: Optional[str], embedded) -> tuple:
+        """(space, vector) from a fresh embedding, if it is comparable with the email's space"""
+        if embedded is not None and space in (None, embedded[0]):
+            return embedded[0], embedded[1][0]
+        return space, None
+    
+    def _similar_emails(self, email: CategorizedEmail, space: Optional[str], query,
+                        k: int) -> List[Tuple[EmailType, float]]:
+        user_id, email_id = email.user_id, email.id
+        if query is None:
+            return []
+        
+        # Ask for a few extra in case some were deleted since they were embedded
+        matches = embedding_store.search(space, user_id, query, k + 10, exclude_id=email_id)
+        emails = {
+            similar.id: similar for similar in self.db.query(CategorizedEmail).filter(
+                CategorizedEmail.user_id == user_id,
+                CategorizedEmail.id.in_([match_id for match_id, _ in matches])
+            ).all()
+        }
+        return [
+            (self.to_email_type(emails[match_id]), score) for match_id, score in matches if match_id in emails
+        ][:k]
+    
     def update_email_response(self, user_id: int, email_id: int, response: str) -> Optional[CategorizedEmail]:
         """Update email response"""
         email = self.get_email_by_id(user_id, email_id)
@@ -88,6 +267,31 @@ class EmailService:
         
         return email
     
+    def correct_classification(self, user_id: int, email_id: int,
+                               classification: str) -> Optional[CategorizedEmail]:
+        """Correct an email's classification; corrections feed the linear tier"""
+        email = self.get_email_by_id(user_id, email_id)
+        if not email:
+            return None
+        
+        # Take back what the current label added to the sender's counts, in
+        # the same row change that adds the correction
+        previous_weight = recorded_weight(email.classification_path, email.classification_corrected)
+        previous_label = email.classification.value
+        email.classification = EmailClassification(classification)
+        email.classification_corrected = True
+        record_classifications(self.db, user_id, [
+            (email.email, previous_label, -previous_weight),
+            (email.email, classification, settings.sender_prior_correction_weight)
+        ])
+        self.db.commit()
+        self.db.refresh(email)
+        
+        # Update statistics
+        self._update_statistics(user_id)
+        
+        return email
+    
     def delete_email(self, user_id: int, email_id: int) -> bool:
         """Delete an email"""
         email = self.get_email_by_id(user_id, email_id)
@@ -102,6 +306,14 @@ class EmailService:
         
         return True
     
+    def _record_senders(self, user_id: int, classified: List[Tuple[str, ClassificationResult]]):
+        """Add new classifications to the sender reputation table"""
+        record_classifications(self.db, user_id, [
+            (sender, result.classification, 1.0)
+            for sender, result in classified
+            if result.path not in UNRECORDED_PATHS
+        ])
+    
     def get_statistics(self, user_id: int) -> Optional[EmailStatistics]:
         """Get email statistics for a user"""
         return self.db.query(EmailStatistics).filter(
@@ -147,6 +359,16 @@ class EmailService:
         self.db.commit()
         self.db.refresh(stats)
     
+    def _projection(self, fields: Iterable[str]) -> list:
+        """Map requested EmailType fields to the columns to select"""
+        fields = set(fields)
+        columns = [column for name, column in EMAIL_TYPE_COLUMNS.items() if name in fields]
+        return columns or [CategorizedEmail.id]
+    
+    def row_to_email_type(self, row) -> EmailType:
+        """Convert a projected row to EmailType, leaving unselected fields empty"""
+        return EmailType(**{name: getattr(row, name, None) for name in EMAIL_TYPE_COLUMNS})
+    
     def to_email_type(self, email: CategorizedEmail) -> EmailType:
         """Convert CategorizedEmail model to EmailType schema"""
         return EmailType(
@@ -156,6 +378,8 @@ class EmailService:
             subject=email.subject,
             response=email.response,
             classification=email.classification,
+            model_version=email.model_version,
+            classification_path=email.classification_path,
             created_at=email.created_at,
             updated_at=email.updated_at
         )
@@ -0,0 +1,332 @@
+"""
+Email embeddings for similar-email search. Each user's vectors are appended
+to one file of fixed-size records (email id + L2-normalized float16 vector),
+memory-mapped for search:
+
+    <EMBEDDING_DIR>/<space>/meta.json          vector dimension
+    <EMBEDDING_DIR>/<space>/<user_id>.vec      records
+    <EMBEDDING_DIR>/<space>/<user_id>.ivf.npz  optional IVF index
+
+The space names the embedding function ("hashed-256", or "transformer-<model
+version>"), so vectors from different models are never compared. Search scans
+all of a user's records; once an IVF index is built only the closest lists are
+scanned, plus the records appended since the build.
+
+Build IVF indexes:  python -m app.services.embedding_store build-ivf
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import uuid
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.metrics import timed_stage
+from app.utils.cache import TTLCache
+from app.utils.preprocessing import email_preprocessor
+
+# Rows converted to float32 at a time during an exact scan
+SCAN_CHUNK = 65536
+
+def hashed_embedding(subject: str, message: str, dim: int) -> np.ndarray:
+    """
+    Lexical embedding: word unigrams and bigrams hashed into dim signed
+    buckets, log-scaled. Cheap enough to compute for every email.
+    """
+    tokens = email_preprocessor.clean_text(f"{subject} {message}").split()
+    features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        vector[digest % dim] += 1.0 if digest >> 63 else -1.0
+    return np.sign(vector) * np.log1p(np.abs(vector))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+class IVFIndex:
+    """Inverted file index: rows grouped by nearest centroid (spherical k-means)"""
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, rows: int):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        # Records covered by the index; later ones are scanned exactly
+        self.rows = rows
+    
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """Rows in the lists whose centroids are closest to the query"""
+        lists = _top_k(self.centroids @ query, probes)
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+    
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Train centroids on a sample, then assign every row"""
+        rng = np.random.default_rng(seed)
+        rows = len(vectors)
+        sample_rows = np.sort(rng.choice(rows, size=min(rows, nlist * 64), replace=False))
+        sample = vectors[sample_rows].astype(np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+        
+        assignment = np.empty(rows, dtype=np.int32)
+        for start in range(0, rows, SCAN_CHUNK):
+            chunk = vectors[start:start + SCAN_CHUNK].astype(np.float32)
+            assignment[start:start + SCAN_CHUNK] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable").astype(np.int32 if rows < 2 ** 31 else np.int64)
+        offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        return cls(centroids, order, offsets, rows)
+    
+    def save(self, path: str):
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(temp_path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 rows=np.array(self.rows))
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["order"], data["offsets"], int(data["rows"]))
+
+class EmbeddingStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._dims = {}
+        self._lock = threading.Lock()
+        # Loaded IVF indexes by path, reloaded when the file changes
+        self._ivf_cache = TTLCache(maxsize=64, ttl=3600)
+    
+    def _space_dir(self, space: str) -> str:
+        return os.path.join(self.root, space)
+    
+    def _records_path(self, space: str, user_id: int) -> str:
+        return os.path.join(self._space_dir(space), f"{int(user_id)}.vec")
+    
+    def _ivf_path(self, space: str, user_id: int) -> str:
+        return os.path.join(self._space_dir(space), f"{int(user_id)}.ivf.npz")
+    
+    def spaces(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if self.dim(name))
+    
+    def dim(self, space: str) -> Optional[int]:
+        if space not in self._dims:
+            path = os.path.join(self._space_dir(space), "meta.json")
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                self._dims[space] = json.load(f)["dim"]
+        return self._dims[space]
+    
+    def _record_dtype(self, dim: int) -> np.dtype:
+        return np.dtype([("id", "<i8"), ("vector", "<f2", (dim,))])
+    
+    def append(self, space: str, user_id: int, email_ids: Sequence[int], vectors: np.ndarray):
+        """Add vectors to a user's records with a single append-mode write"""
+        vectors = _normalize(vectors)
+        dim = vectors.shape[1]
+        with self._lock:
+            if self.dim(space) is None:
+                os.makedirs(self._space_dir(space), exist_ok=True)
+                with open(os.path.join(self._space_dir(space), "meta.json"), "w") as f:
+                    json.dump({"dim": dim}, f)
+                self._dims[space] = dim
+        if dim != self.dim(space):
+            raise ValueError(f"Embedding space {space} holds {self.dim(space)}-d vectors, got {dim}-d")
+        
+        records = np.empty(len(email_ids), dtype=self._record_dtype(dim))
+        records["id"] = email_ids
+        records["vector"] = vectors
+        # O_APPEND keeps concurrent writers (threads or workers) from interleaving records
+        fd = os.open(self._records_path(space, user_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            data = memoryview(records.tobytes())
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+    
+    def records(self, space: str, user_id: int) -> np.ndarray:
+        """A user's records, memory-mapped read-only"""
+        dim = self.dim(space)
+        path = self._records_path(space, user_id)
+        if dim is None or not os.path.exists(path):
+            return np.empty(0, dtype=self._record_dtype(dim or 1))
+        dtype = self._record_dtype(dim)
+        # Ignore a record still being written
+        rows = os.path.getsize(path) // dtype.itemsize
+        if not rows:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+    
+    def vector(self, space: str, user_id: int, email_id: int) -> Optional[np.ndarray]:
+        """The stored vector of an email, if any"""
+        records = self.records(space, user_id)
+        positions = np.flatnonzero(records["id"] == email_id)
+        if not len(positions):
+            return None
+        return records["vector"][positions[-1]].astype(np.float32)
+    
+    def _ivf(self, space: str, user_id: int) -> Optional[IVFIndex]:
+        path = self._ivf_path(space, user_id)
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        cached = self._ivf_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, IVFIndex.load(path))
+            self._ivf_cache.set(path, cached)
+        return cached[1]
+    
+    def search(self, space: str, user_id: int, query: np.ndarray, k: int,
+               exclude_id: Optional[int] = None, probes: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-k (email_id, cosine similarity) among a user's records"""
+        records = self.records(space, user_id)
+        if not len(records):
+            return []
+        query = _normalize(query)
+        vectors = records["vector"]
+        ids = records["id"]
+        ivf = self._ivf(space, user_id)
+        
+        with timed_stage("similar_search"):
+            if ivf is not None and ivf.rows <= len(records):
+                # Sorted rows read the memory map front to back
+                rows = np.sort(np.concatenate([
+                    ivf.candidates(query, probes or settings.embedding_ivf_probes),
+                    np.arange(ivf.rows, len(records))
+                ]))
+                scores = vectors[rows].astype(np.float32) @ query
+            else:
+                rows, scores = [], []
+                for start in range(0, len(records), SCAN_CHUNK):
+                    chunk_scores = vectors[start:start + SCAN_CHUNK].astype(np.float32) @ query
+                    best = _top_k(chunk_scores, k + 1)
+                    rows.append(best + start)
+                    scores.append(chunk_scores[best])
+                rows, scores = np.concatenate(rows), np.concatenate(scores)
+            
+            if exclude_id is not None:
+                keep = ids[rows] != exclude_id
+                rows, scores = rows[keep], scores[keep]
+            best = _top_k(scores, k)
+        return [(int(ids[rows[position]]), float(scores[position])) for position in best]
+    
+    def build_ivf(self, space: str, user_id: int, min_rows: int) -> Optional[IVFIndex]:
+        """(Re)build a user's IVF index; None when they have fewer than min_rows records"""
+        records = self.records(space, user_id)
+        if len(records) < max(min_rows, 1):
+            return None
+        nlist = int(min(4096, max(16, math.sqrt(len(records)))))
+        ivf = IVFIndex.build(records["vector"], nlist)
+        ivf.save(self._ivf_path(space, user_id))
+        return ivf
+    
+    def users(self, space: str) -> List[int]:
+        return sorted(
+            int(name[:-len(".vec")]) for name in os.listdir(self._space_dir(space)) if name.endswith(".vec")
+        )
+
+embedding_store = EmbeddingStore(settings.embedding_dir)
+
+def embedding_space(model_version: Optional[str] = None) -> Optional[str]:
+    """
+    Space of the configured embedding source; transformer spaces are per model
+    version, so there is none for emails stored without one
+    """
+    if settings.embedding_source == "transformer":
+        return f"transformer-{model_version}" if model_version else None
+    return f"hashed-{settings.embedding_hash_dim}"
+
+def embed_emails(emails: Sequence[Tuple[str, str]]) -> Optional[Tuple[str, np.ndarray]]:
+    """(space, vectors) for (subject, message) pairs, or None when the source is unavailable"""
+    if settings.embedding_source == "transformer":
+        # Imported here so the hashed source doesn't need the classifier
+        from app.services.email_classifier import email_classifier
+        texts = [email_preprocessor.extract_features(subject, message) for subject, message in emails]
+        embedded = email_classifier.embed(texts)
+        if embedded is None:
+            return None
+        version, vectors = embedded
+        return embedding_space(version), vectors
+    
+    with timed_stage("embed"):
+        vectors = np.stack([
+            hashed_embedding(subject, message, settings.embedding_hash_dim) for subject, message in emails
+        ])
+    return embedding_space(), vectors
+
+async def embed_emails_async(emails: Sequence[Tuple[str, str]]) -> Optional[Tuple[str, np.ndarray]]:
+    """embed_emails() awaiting the transformer instead of blocking the event loop"""
+    if settings.embedding_source == "transformer":
+        from app.services.email_classifier import email_classifier
+        texts = [email_preprocessor.extract_features(subject, message) for subject, message in emails]
+        embedded = await email_classifier.embed_async(texts)
+        if embedded is None:
+            return None
+        version, vectors = embedded
+        return embedding_space(version), vectors
+    return embed_emails(emails)
+
+def store_email_embeddings(user_id: int, email_ids: Sequence[int], emails: Sequence[Tuple[str, str]]):
+    """Embed and store newly classified emails; failures never fail the upload"""
+    if not settings.embeddings_enabled or not email_ids:
+        return
+    try:
+        embedded = embed_emails(emails)
+        if embedded is not None:
+            embedding_store.append(embedded[0], user_id, email_ids, embedded[1])
+    except Exception as e:
+        print(f"Could not store email embeddings: {e}")
+
+async def store_email_embeddings_async(user_id: int, email_ids: Sequence[int], emails: Sequence[Tuple[str, str]]):
+    """store_email_embeddings() awaiting the transformer instead of blocking the event loop"""
+    if not settings.embeddings_enabled or not email_ids:
+        return
+    try:
+        embedded = await embed_emails_async(emails)
+        if embedded is not None:
+            embedding_store.append(embedded[0], user_id, email_ids, embedded[1])
+    except Exception as e:
+        print(f"Could not store email embeddings: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the similar-email embedding store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build-ivf", help="Build IVF indexes for users with many emails")
+    build.add_argument("--space", help="Only this embedding space")
+    build.add_argument("--min-rows", type=int, default=settings.embedding_ivf_min_rows)
+    subparsers.add_parser("info")
+    args = parser.parse_args()
+    
+    for space in ([args.space] if getattr(args, "space", None) else embedding_store.spaces()):
+        for user_id in embedding_store.users(space):
+            rows = len(embedding_store.records(space, user_id))
+            if args.command == "info":
+                print(f"{space}  user {user_id}  {rows} vectors")
+                continue
+            ivf = embedding_store.build_ivf(space, user_id, args.min_rows)
+            if ivf is not None:
+                print(f"{space}  user {user_id}  {rows} vectors in {len(ivf.centroids)} lists")
+
+if __name__ == "__main__":
+    main()
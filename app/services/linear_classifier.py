@@ -0,0 +1,199 @@
+"""
+Fast linear tier of the classifier: TF-IDF features plus logistic regression,
+trained from the stored categorized_emails (user corrections weigh more).
+
+Retrain:   python -m app.services.linear_classifier train
+Inspect:   python -m app.services.linear_classifier info
+"""
+import argparse
+import math
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+
+# Bumped whenever the artifact layout changes; older artifacts are rejected
+FORMAT_VERSION = 1
+LABELS = ("UNPRODUCTIVE", "PRODUCTIVE")
+
+class LinearModelError(Exception):
+    """Raised when there is not enough data or the artifact can't be used"""
+
+def linear_text(subject: str, message: Optional[str]) -> str:
+    """Text the linear model sees; no NLTK, so it stays sub-millisecond"""
+    return f"{subject} {message or ''}".lower()
+
+class LinearEmailModel:
+    """A fitted vectorizer plus the logistic-regression weights as plain arrays"""
+    def __init__(self, vectorizer, coef: np.ndarray, intercept: float, version: str, metadata: dict):
+        self.vectorizer = vectorizer
+        self.coef = coef
+        self.intercept = intercept
+        self.version = version
+        self.metadata = metadata
+        # Single emails skip sklearn's transform(), whose per-call overhead
+        # dominates; this needs the sublinear TF-IDF + l2 setup used in training
+        self._analyzer = vectorizer.build_analyzer()
+        self._vocabulary = vectorizer.vocabulary_
+        self._idf = vectorizer.idf_.tolist()
+        self._coef = coef.tolist()
+    
+    def productive_probability(self, texts: Sequence[str]) -> np.ndarray:
+        """P(PRODUCTIVE) for a batch, as one sparse matrix-vector product"""
+        features = self.vectorizer.transform(texts)
+        scores = features @ self.coef + self.intercept
+        return 1.0 / (1.0 + np.exp(-scores))
+    
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """(classification, confidence) for every text"""
+        probabilities = self.productive_probability(texts)
+        return [
+            (LABELS[1], float(p)) if p >= 0.5 else (LABELS[0], float(1 - p))
+            for p in probabilities
+        ]
+    
+    def predict(self, subject: str, message: str) -> Tuple[str, float]:
+        """(classification, confidence) for one email"""
+        counts = {}
+        for term in self._analyzer(linear_text(subject, message)):
+            index = self._vocabulary.get(term)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        
+        weights = {index: (1 + math.log(count)) * self._idf[index] for index, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        score = sum(weight * self._coef[index] for index, weight in weights.items()) / norm + self.intercept
+        probability = 1.0 / (1.0 + math.exp(-score))
+        if probability >= 0.5:
+            return LABELS[1], probability
+        return LABELS[0], 1 - probability
+    
+    def save(self, path: str):
+        import joblib
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Unique per call so concurrent saves never write the same temp file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            joblib.dump({
+                "format_version": FORMAT_VERSION,
+                "version": self.version,
+                "vectorizer": self.vectorizer,
+                "coef": self.coef,
+                "intercept": self.intercept,
+                "metadata": self.metadata
+            }, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+    
+    @classmethod
+    def load(cls, path: str) -> "LinearEmailModel":
+        import joblib
+        artifact = joblib.load(path)
+        if artifact.get("format_version") != FORMAT_VERSION:
+            raise LinearModelError(
+                f"Unsupported linear model format {artifact.get('format_version')} in {path}"
+            )
+        return cls(
+            artifact["vectorizer"], artifact["coef"], artifact["intercept"],
+            artifact["version"], artifact["metadata"]
+        )
+
+def train_linear_model(texts: List[str], labels: List[str], weights: Optional[List[float]] = None,
+                       version: Optional[str] = None) -> LinearEmailModel:
+    """Fit TF-IDF + logistic regression on texts labelled PRODUCTIVE/UNPRODUCTIVE"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    
+    targets = np.array([LABELS.index(label) for label in labels])
+    if len(set(targets)) < 2:
+        raise LinearModelError("Training data needs both productive and unproductive emails")
+    
+    start = time.perf_counter()
+    vectorizer = TfidfVectorizer(
+        ngram_range=(1, 2),
+        min_df=2 if len(texts) >= 1000 else 1,
+        max_features=100_000,
+        sublinear_tf=True,
+        strip_accents="unicode",
+        dtype=np.float32
+    )
+    features = vectorizer.fit_transform(texts)
+    model = LogisticRegression(C=4.0, max_iter=1000, solver="liblinear")
+    model.fit(features, targets, sample_weight=weights)
+    
+    return LinearEmailModel(
+        vectorizer,
+        model.coef_[0].astype(np.float32),
+        float(model.intercept_[0]),
+        version or datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+        {
+            "trained_at": datetime.utcnow().isoformat(),
+            "rows": len(texts),
+            "features": features.shape[1],
+            "training_seconds": round(time.perf_counter() - start, 3)
+        }
+    )
+
+def load_training_data(db) -> Tuple[List[str], List[str], List[float]]:
+    """Texts, labels and sample weights from categorized_emails"""
+    from app.models.categorized_email import CategorizedEmail
+    
+    texts, labels, weights = [], [], []
+    rows = db.query(
+        CategorizedEmail.subject,
+        CategorizedEmail.message,
+        CategorizedEmail.classification,
+        CategorizedEmail.classification_corrected
+    ).yield_per(1000)
+    for subject, message, classification, corrected in rows:
+        texts.append(linear_text(subject, message))
+        labels.append(classification.value)
+        weights.append(settings.linear_correction_weight if corrected else 1.0)
+    return texts, labels, weights
+
+def load_linear_model(path: Optional[str] = None) -> Optional[LinearEmailModel]:
+    """The saved model, or None when there is none or it can't be loaded"""
+    path = path or settings.linear_model_path
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return LinearEmailModel.load(path)
+    except Exception as e:
+        print(f"Could not load linear model from {path}: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or inspect the linear classifier tier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train")
+    train.add_argument("--output", default=settings.linear_model_path)
+    train.add_argument("--version")
+    train.add_argument("--min-rows", type=int, default=100)
+    info = subparsers.add_parser("info")
+    info.add_argument("path", nargs="?", default=settings.linear_model_path)
+    args = parser.parse_args()
+    
+    if args.command == "train":
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            texts, labels, weights = load_training_data(db)
+        finally:
+            db.close()
+        if len(texts) < args.min_rows:
+            raise SystemExit(f"Only {len(texts)} categorized emails; need at least {args.min_rows}")
+        model = train_linear_model(texts, labels, weights, version=args.version)
+        model.save(args.output)
+        print(f"Linear model {model.version} trained on {len(texts)} emails, saved to {args.output}")
+    else:
+        model = LinearEmailModel.load(args.path)
+        print(f"Linear model {model.version}: {model.metadata}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Local registry of versioned model artifacts that can be swapped in without a
+restart. The worker that receives an activation or rollback records the new
+version in <MODEL_REGISTRY_DIR>/active.json once it is serving it; every worker
+polls that file and loads the version it names, and workers that start later
+begin on it (before MODEL_VERSION). Each version is an immutable directory:
+
+    <MODEL_REGISTRY_DIR>/active.json
+    <MODEL_REGISTRY_DIR>/<version>/manifest.json
+    <MODEL_REGISTRY_DIR>/<version>/linear.joblib    (optional, linear tier)
+    <MODEL_REGISTRY_DIR>/<version>/transformer/     (optional, save_pretrained format)
+
+Publish:  python -m app.services.model_registry publish 2024.06 --linear models/linear_classifier.joblib
+List:     python -m app.services.model_registry list
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from app.config import settings
+from app.services.email_classifier import BUILTIN_VERSION, ModelHandle, email_classifier, load_pipeline
+from app.services.linear_classifier import LinearEmailModel
+
+MANIFEST_NAME = "manifest.json"
+ACTIVE_FILE = "active.json"
+LINEAR_FILE = "linear.joblib"
+TRANSFORMER_DIR = "transformer"
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+class ModelRegistryError(Exception):
+    """Raised for unknown, invalid or duplicate model versions"""
+
+class ModelRegistry:
+    def __init__(self, root: str):
+        self.root = root
+    
+    def version_path(self, version: str) -> str:
+        if not VERSION_PATTERN.match(version):
+            raise ModelRegistryError(f"Invalid model version: {version}")
+        return os.path.join(self.root, version)
+    
+    def manifest(self, version: str) -> dict:
+        path = os.path.join(self.version_path(version), MANIFEST_NAME)
+        if not os.path.exists(path):
+            raise ModelRegistryError(f"Unknown model version: {version}")
+        with open(path) as f:
+            return json.load(f)
+    
+    def versions(self) -> List[dict]:
+        """Manifests of all published versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        manifests = []
+        for name in os.listdir(self.root):
+            if VERSION_PATTERN.match(name) and os.path.exists(os.path.join(self.root, name, MANIFEST_NAME)):
+                manifests.append(self.manifest(name))
+        return sorted(manifests, key=lambda manifest: manifest["created_at"])
+    
+    def publish(self, version: str, linear_path: Optional[str] = None,
+                transformer_source: Optional[str] = None) -> str:
+        """Copy artifacts into a new version directory, renamed into place at the end"""
+        final_path = self.version_path(version)
+        if os.path.exists(final_path):
+            raise ModelRegistryError(f"Model version {version} already exists")
+        if not linear_path and not transformer_source:
+            raise ModelRegistryError("A version needs a linear model, a transformer or both")
+        
+        temp_path = os.path.join(self.root, f".{version}.{uuid.uuid4().hex}.tmp")
+        os.makedirs(temp_path)
+        try:
+            components = {}
+            if linear_path:
+                linear = LinearEmailModel.load(linear_path)
+                shutil.copyfile(linear_path, os.path.join(temp_path, LINEAR_FILE))
+                components["linear"] = {"version": linear.version, **linear.metadata}
+            if transformer_source:
+                target = os.path.join(temp_path, TRANSFORMER_DIR)
+                if os.path.isdir(transformer_source):
+                    shutil.copytree(transformer_source, target)
+                else:
+                    classifier = load_pipeline(transformer_source, local_only=False)
+                    classifier.model.save_pretrained(target)
+                    classifier.tokenizer.save_pretrained(target)
+                components["transformer"] = {"source": transformer_source}
+            
+            with open(os.path.join(temp_path, MANIFEST_NAME), "w") as f:
+                json.dump({
+                    "version": version,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "components": components
+                }, f, indent=2)
+            os.rename(temp_path, final_path)
+        except Exception:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        return final_path
+    
+    def load(self, version: str, load_transformer: bool = True) -> ModelHandle:
+        """Load a version's models into a new handle (not yet active)"""
+        manifest = self.manifest(version)
+        path = self.version_path(version)
+        linear_model = None
+        classifier = None
+        if "linear" in manifest["components"]:
+            linear_model = LinearEmailModel.load(os.path.join(path, LINEAR_FILE))
+        if load_transformer and "transformer" in manifest["components"]:
+            classifier = load_pipeline(os.path.join(path, TRANSFORMER_DIR), local_only=True)
+        return ModelHandle(version, classifier=classifier, linear_model=linear_model)
+    
+    def active_version(self) -> Optional[str]:
+        """The version recorded as active for all workers, if any"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def record_active(self, version: str):
+        """Record the version every worker should serve"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, ACTIVE_FILE)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"version": version, "recorded_at": datetime.utcnow().isoformat()}, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+model_registry = ModelRegistry(settings.model_registry_dir)
+
+# State of the background activation, reported by the admin endpoint
+activation_status = {"state": "idle", "version": None, "error": None}
+_activation_lock = threading.Lock()
+
+def activate_version(version: str):
+    """Load, warm and swap in a version (blocking)"""
+    if version == BUILTIN_VERSION:
+        handle = email_classifier.builtin_handle()
+    else:
+        handle = model_registry.load(version, load_transformer=email_classifier.use_ml_model)
+    # Components the version doesn't ship are carried over from the active one
+    active = email_classifier.active
+    if handle.classifier is None:
+        handle = handle._replace(classifier=active.classifier)
+    if handle.linear_model is None:
+        handle = handle._replace(linear_model=active.linear_model)
+    email_classifier.activate(handle)
+
+def start_activation(version: str, record: bool = True) -> bool:
+    """
+    Activate a version on a background thread; serving continues on the
+    current version meanwhile. With record, the version is recorded for the
+    other workers once it is serving here. False if another activation is running.
+    """
+    # Fail fast on unknown versions
+    if version != BUILTIN_VERSION:
+        model_registry.manifest(version)
+    if not _activation_lock.acquire(blocking=False):
+        return False
+    activation_status.update(state="loading", version=version, error=None)
+    
+    def run():
+        try:
+            activate_version(version)
+            if record:
+                model_registry.record_active(version)
+            activation_status.update(state="active")
+        except Exception as e:
+            print(f"Activation of model version {version} failed: {e}")
+            activation_status.update(state="failed", error=str(e))
+        finally:
+            _activation_lock.release()
+    
+    threading.Thread(target=run, name=f"activate-{version}", daemon=True).start()
+    return True
+
+def rollback_version() -> str:
+    """Swap the previous version back in here and record it for the other workers"""
+    if not _activation_lock.acquire(blocking=False):
+        raise ModelRegistryError(f"Model version {activation_status['version']} is still loading")
+    try:
+        version = email_classifier.rollback()
+        model_registry.record_active(version)
+    finally:
+        _activation_lock.release()
+    activation_status.update(state="active", version=version, error=None)
+    return version
+
+def sync_active_version():
+    """Bring this worker onto the recorded version if it serves another one"""
+    version = model_registry.active_version()
+    if version is None or not email_classifier.is_ready or version == email_classifier.active.version:
+        return
+    # Don't retry a version that already failed to load here
+    if activation_status["state"] == "failed" and activation_status["version"] == version:
+        return
+    
+    previous = email_classifier.previous
+    if previous is not None and previous.version == version:
+        # A busy lock means an activation is running; the next poll retries
+        if not _activation_lock.acquire(blocking=False):
+            return
+        try:
+            email_classifier.rollback()
+        finally:
+            _activation_lock.release()
+        activation_status.update(state="active", version=version, error=None)
+    else:
+        start_activation(version, record=False)
+
+def start_active_version_watcher() -> Optional[threading.Thread]:
+    """Poll the recorded version on a background thread (per worker, after fork)"""
+    interval = settings.model_registry_poll_seconds
+    if interval <= 0:
+        return None
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                sync_active_version()
+            except Exception as e:
+                print(f"Could not sync the active model version: {e}")
+    
+    thread = threading.Thread(target=run, name="model-version-watcher", daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish or list model registry versions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish = subparsers.add_parser("publish")
+    publish.add_argument("version")
+    publish.add_argument("--linear", help="Linear model artifact (.joblib)")
+    publish.add_argument("--transformer", help="Model name or save_pretrained directory")
+    subparsers.add_parser("list")
+    args = parser.parse_args()
+    
+    if args.command == "publish":
+        path = model_registry.publish(args.version, args.linear, args.transformer)
+        print(f"Model version {args.version} published to {path}")
+    else:
+        for manifest in model_registry.versions():
+            print(f"{manifest['version']}  {manifest['created_at']}  {', '.join(manifest['components'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Near-duplicate detection for templated bulk mail (newsletters, promotions,
+notifications). Emails are fingerprinted with a 64-bit SimHash over word
+bigrams of the cleaned text; an incoming email within
+NEAR_DUPLICATE_MAX_DISTANCE bits of an already classified one reuses its
+classification instead of running the classifier again.
+
+Copies of a template mostly differ in the recipient's name, which moves a
+short text's SimHash by 10+ bits, so names are masked before hashing (links
+and digits are already dropped by clean_text).
+"""
+import hashlib
+import os
+import re
+import threading
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.metrics import NEAR_DUPLICATE_LOOKUPS
+from app.utils.preprocessing import email_preprocessor
+
+FORMAT_VERSION = 2
+LABELS = ("UNPRODUCTIVE", "PRODUCTIVE")
+# Shorter texts say too little to call two emails the same template
+MIN_TOKENS = 5
+GLOBAL_SCOPE = 0
+NAME_PLACEHOLDER = "zznome"
+
+# Runs of capitalized words ("João", "Ana Paula", "Black Friday")
+_CAPITALIZED_RUN = re.compile(r"\b[A-ZÀ-ÖØ-Þ][\w'-]*(?:\s+[A-ZÀ-ÖØ-Þ][\w'-]*)*")
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+
+def mask_names(text: str) -> str:
+    """
+    Replace likely names with a placeholder: capitalized words inside a
+    sentence, capitalized words after the first at a sentence start
+    ("Oi João!") and vocatives ("Maria, ..."). Proper nouns that are part of
+    the template are masked the same way in every copy.
+    """
+    def replace(match):
+        before = text[:match.start()].rstrip()
+        sentence_start = not before or before[-1] in ".!?"
+        vocative = text[match.end():match.end() + 1] == ","
+        if vocative or not sentence_start:
+            return NAME_PLACEHOLDER
+        first, _, rest = match.group().partition(" ")
+        return f"{first} {NAME_PLACEHOLDER}" if rest else first
+    return _CAPITALIZED_RUN.sub(replace, text)
+
+def fingerprint(subject: str, message: str) -> Optional[np.uint64]:
+    """SimHash of the email, or None when it is too short to compare"""
+    tokens = email_preprocessor.clean_text(f"{mask_names(subject)} {mask_names(message)}").split()
+    if len(tokens) < MIN_TOKENS:
+        return None
+    shingles = [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    hashes = np.fromiter((_hash64(shingle) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, 64)
+    # Each bit takes the majority vote of the shingle hashes
+    votes = bits.sum(axis=0, dtype=np.int32) * 2 > len(shingles)
+    return np.packbits(votes).view(np.uint64)[0]
+
+def hamming_distances(fingerprints: np.ndarray, value: np.uint64) -> np.ndarray:
+    differences = np.bitwise_xor(fingerprints, value)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(differences)
+    return _POPCOUNT[differences.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def group_near_duplicates(fingerprints: Sequence[Tuple[Optional[int], Optional[np.uint64]]],
+                          max_distance: int) -> List[int]:
+    """
+    For each (index key, fingerprint), the position of the first earlier
+    entry with the same key within max_distance bits, else its own position;
+    a batch then classifies one copy of each template it contains.
+    """
+    groups: Dict[int, Tuple[List[int], List[np.uint64]]] = {}
+    representatives = []
+    for position, (key, value) in enumerate(fingerprints):
+        representative = position
+        if value is not None:
+            positions, values = groups.setdefault(key, ([], []))
+            if values:
+                distances = hamming_distances(np.array(values, dtype=np.uint64), value)
+                nearest = int(np.argmin(distances))
+                if distances[nearest] <= max_distance:
+                    representative = positions[nearest]
+            if representative == position:
+                positions.append(position)
+                values.append(value)
+        representatives.append(representative)
+    return representatives
+
+class FingerprintIndex:
+    """Fingerprints with their label and model version in growable arrays; oldest rows are overwritten once full"""
+    def __init__(self, max_entries: int, initial_capacity: int = 64):
+        if max_entries <= 0:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.max_entries = max_entries
+        capacity = min(initial_capacity, max_entries)
+        self.fingerprints = np.zeros(capacity, dtype=np.uint64)
+        self.labels = np.zeros(capacity, dtype=np.int8)
+        self.versions = np.zeros(capacity, dtype=np.int16)
+        self.size = 0
+        self._next = 0
+    
+    def add(self, value: np.uint64, label: int, version: int):
+        if self.size == len(self.fingerprints) and self.size < self.max_entries:
+            capacity = min(self.size * 2, self.max_entries)
+            self.fingerprints = np.resize(self.fingerprints, capacity)
+            self.labels = np.resize(self.labels, capacity)
+            self.versions = np.resize(self.versions, capacity)
+        position = self._next
+        self.fingerprints[position] = value
+        self.labels[position] = label
+        self.versions[position] = version
+        self._next = (position + 1) % self.max_entries
+        self.size = min(self.size + 1, self.max_entries)
+    
+    def extend(self, fingerprints: np.ndarray, labels: np.ndarray, versions: np.ndarray):
+        """Bulk-load rows into an empty index, keeping the newest max_entries"""
+        self.fingerprints = fingerprints[-self.max_entries:].astype(np.uint64)
+        self.labels = labels[-self.max_entries:].astype(np.int8)
+        self.versions = versions[-self.max_entries:].astype(np.int16)
+        self.size = len(self.fingerprints)
+        self._next = self.size % self.max_entries
+    
+    def nearest(self, value: np.uint64, max_distance: int, version: int) -> Optional[int]:
+        """Position of the closest fingerprint of a model version within max_distance bits"""
+        if not self.size:
+            return None
+        distances = hamming_distances(self.fingerprints[:self.size], value)
+        distances[self.versions[:self.size] != version] = max_distance + 1
+        position = int(np.argmin(distances))
+        return position if distances[position] <= max_distance else None
+
+class NearDuplicateIndex:
+    """Fingerprint indexes per user (or one global index), persisted as .npz"""
+    def __init__(self, scope: str, max_distance: int, max_entries: int):
+        if scope != "off" and max_entries <= 0:
+            raise ValueError(f"NEAR_DUPLICATE_MAX_ENTRIES must be positive, got {max_entries}")
+        self.scope = scope
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._indexes: Dict[int, FingerprintIndex] = {}
+        self._versions: List[str] = []
+        self._version_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def scope_key(self, user_id: Optional[int]) -> Optional[int]:
+        """Index key for a user, or None when detection doesn't apply"""
+        if self.scope == "global":
+            return GLOBAL_SCOPE
+        if self.scope == "user" and user_id is not None:
+            return user_id
+        return None
+    
+    def lookup(self, key: int, value: np.uint64, model_version: str) -> Optional[str]:
+        """
+        Classification of a near-duplicate, if any. Only classifications made
+        by model_version count, so a new model never reuses its predecessor's.
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+            version = self._version_ids.get(model_version)
+            position = None
+            if index is not None and version is not None:
+                position = index.nearest(value, self.max_distance, version)
+            if position is None:
+                NEAR_DUPLICATE_LOOKUPS.labels(result="miss").inc()
+                return None
+            NEAR_DUPLICATE_LOOKUPS.labels(result="hit").inc()
+            return LABELS[index.labels[position]]
+    
+    def add(self, key: int, value: np.uint64, classification: str, model_version: str):
+        with self._lock:
+            if model_version not in self._version_ids:
+                self._version_ids[model_version] = len(self._versions)
+                self._versions.append(model_version)
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = FingerprintIndex(self.max_entries)
+            index.add(value, LABELS.index(classification), self._version_ids[model_version])
+    
+    def __len__(self) -> int:
+        return sum(index.size for index in self._indexes.values())
+    
+    def save(self, path: str):
+        """Write all indexes to one .npz file, replaced atomically"""
+        def concatenate(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+        
+        with self._lock:
+            indexes = list(self._indexes.items())
+            arrays = {
+                "format_version": np.array(FORMAT_VERSION),
+                "keys": concatenate([np.full(index.size, key) for key, index in indexes], np.int64),
+                "fingerprints": concatenate([index.fingerprints[:index.size] for _, index in indexes], np.uint64),
+                "labels": concatenate([index.labels[:index.size] for _, index in indexes], np.int8),
+                "versions": concatenate([index.versions[:index.size] for _, index in indexes], np.int16),
+                "version_names": np.array(self._versions, dtype=str)
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+    
+    def load(self, path: str) -> int:
+        """Load a saved index, replacing the current one; returns the row count"""
+        with np.load(path) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported near-duplicate index format in {path}")
+            keys, fingerprints = data["keys"], data["fingerprints"]
+            labels, versions = data["labels"], data["versions"]
+            version_names = [str(name) for name in data["version_names"]]
+        
+        indexes = {}
+        for key in np.unique(keys).tolist():
+            rows = keys == key
+            indexes[key] = FingerprintIndex(self.max_entries)
+            indexes[key].extend(fingerprints[rows], labels[rows], versions[rows])
+        with self._lock:
+            self._indexes = indexes
+            self._versions = version_names
+            self._version_ids = {name: position for position, name in enumerate(version_names)}
+        return len(keys)
+
+near_duplicate_index = NearDuplicateIndex(
+    settings.near_duplicate_scope,
+    settings.near_duplicate_max_distance,
+    settings.near_duplicate_max_entries
+)
+
+def load_near_duplicate_index():
+    """Load the persisted index at startup, if there is one"""
+    path = settings.near_duplicate_index_path
+    if settings.near_duplicate_scope == "off" or not path or not os.path.exists(path):
+        return
+    try:
+        print(f"Loaded {near_duplicate_index.load(path)} near-duplicate fingerprints")
+    except Exception as e:
+        print(f"Could not load near-duplicate index from {path}: {e}")
+
+def save_near_duplicate_index():
+    """Persist the index on shutdown"""
+    path = settings.near_duplicate_index_path
+    if settings.near_duplicate_scope == "off" or not path or not len(near_duplicate_index):
+        return
+    try:
+        near_duplicate_index.save(path)
+    except Exception as e:
+        print(f"Could not save near-duplicate index to {path}: {e}")
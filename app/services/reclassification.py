@@ -0,0 +1,272 @@
+"""
+Bulk reclassification of stored emails after a model or keyword change.
+Emails are read in id order, classified in chunks on a process pool and the
+changed labels written back in bulk; progress is checkpointed after every
+window, so an interrupted run resumes where it stopped.
+
+    python -m app.services.reclassification                    # every user
+    python -m app.services.reclassification --user 42 --workers 4
+    python -m app.services.reclassification --dry-run          # only count changes
+    python -m app.services.reclassification --restart          # ignore the checkpoint
+
+Emails are classified as on upload, with their user's near-duplicate scope
+and sender priors. Classifications corrected by users are never changed, and
+emails stored before messages were kept (migration 0001, message NULL) are
+skipped rather than reclassified from their subject alone. Labels that only
+a fallback produced (transformer failed or overloaded) are not written
+either. A changed label also gets the suggested response for the new label,
+and moves its weight between the sender's reputation counts in the same
+transaction.
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.categorized_email import CategorizedEmail, EmailClassification
+from app.services.email_classifier import email_classifier, available_cores
+from app.services.email_service import EmailService
+from app.services.sender_reputation import record_classifications, recorded_weight, sender_prior_labels
+from app.utils.preprocessing import email_preprocessor
+
+DEFAULT_CHECKPOINT = "reclassification.checkpoint.json"
+# Paths that mean the transformer didn't get to classify the email
+FALLBACK_PATHS = ("ml_fallback", "degraded_linear", "degraded_rules")
+
+class ReclassificationReport(NamedTuple):
+    processed: int
+    changed: int
+    seconds: float
+    # Emails without a stored message, left as they were (including the
+    # windows of an interrupted run this one resumed)
+    skipped: int = 0
+    # Emails whose new label came from a fallback, left as they were
+    fallback: int = 0
+    
+    @property
+    def rows_per_second(self) -> float:
+        return self.processed / self.seconds if self.seconds else 0.0
+
+def _init_worker(torch_threads: int = 0):
+    """Load NLP resources and the models once per worker process"""
+    if torch_threads:
+        # The processes split the cores, one inference thread each
+        email_classifier.configure_inference(workers=1, threads=torch_threads)
+    try:
+        email_preprocessor.load_resources(download=not settings.nlp_bundle_path)
+    except Exception as e:
+        print(f"Error loading NLP resources: {e}")
+    email_classifier.warm_up()
+
+def classify_chunk(rows: List[Tuple[int, int, str, str, Optional[str]]]) -> List[Tuple[int, str, str, str, str]]:
+    """
+    (id, user_id, subject, message, sender prior) rows to
+    (id, classification, response, model_version, path)
+    """
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row[1]].append(row)
+    
+    classified = []
+    for user_id, user_rows in by_user.items():
+        results = email_classifier.classify_batch(
+            [(subject, message) for _, _, subject, message, _ in user_rows],
+            user_id,
+            [prior for *_, prior in user_rows]
+        )
+        classified.extend(
+            (email_id, result.classification, result.response, result.model_version, result.path)
+            for (email_id, *_), result in zip(user_rows, results)
+        )
+    return classified
+
+def _read_window(db: Session, after_id: int, user_id: Optional[int], size: int, chunk_size: int) -> Iterator[list]:
+    """
+    The next size uncorrected emails after after_id, streamed in chunks of
+    (id, user_id, email, subject, message, classification, classification_path) rows.
+    """
+    query = db.query(
+        CategorizedEmail.id,
+        CategorizedEmail.user_id,
+        CategorizedEmail.email,
+        CategorizedEmail.subject,
+        CategorizedEmail.message,
+        CategorizedEmail.classification,
+        CategorizedEmail.classification_path
+    ).filter(
+        CategorizedEmail.id > after_id,
+        CategorizedEmail.classification_corrected.is_(False)
+    )
+    if user_id is not None:
+        query = query.filter(CategorizedEmail.user_id == user_id)
+    
+    chunk = []
+    for row in query.order_by(CategorizedEmail.id).limit(size).yield_per(chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _new_checkpoint(user_id: Optional[int]) -> dict:
+    return {"user_id": user_id, "last_id": 0, "processed": 0, "changed": 0, "skipped": 0, "fallback": 0}
+
+def _load_checkpoint(path: str, user_id: Optional[int]) -> dict:
+    if not os.path.exists(path):
+        return _new_checkpoint(user_id)
+    with open(path) as f:
+        checkpoint = {**_new_checkpoint(user_id), **json.load(f)}
+    if checkpoint["user_id"] != user_id:
+        raise Exception(
+            f"Checkpoint {path} belongs to a run for user {checkpoint['user_id']}; "
+            f"finish that run or start over with --restart"
+        )
+    print(f"Resuming after email {checkpoint['last_id']} ({checkpoint['processed']} already processed)")
+    return checkpoint
+
+def _window_priors(db: Session, rows) -> dict:
+    """Sender prior label by email id, looked up once per user"""
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row.user_id].append(row)
+    priors = {}
+    for user_id, user_rows in by_user.items():
+        labels = sender_prior_labels(db, user_id, [row.email for row in user_rows])
+        priors.update((row.id, label) for row, label in zip(user_rows, labels))
+    return priors
+
+def _reputation_updates(row, classification: str, path: str) -> List[Tuple[str, str, float]]:
+    """Move a relabeled email's weight from its old label to its new one"""
+    return [
+        (row.email, row.classification.value, -recorded_weight(row.classification_path, False)),
+        (row.email, classification, recorded_weight(path, False))
+    ]
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+def reclassify(user_id: Optional[int] = None, chunk_size: int = 256, workers: int = 0,
+               checkpoint_path: str = DEFAULT_CHECKPOINT, restart: bool = False,
+               dry_run: bool = False) -> ReclassificationReport:
+    """
+    Reclassify one user's emails (or everyone's). workers=0 classifies in
+    this process; otherwise chunks run on a pool of that many processes.
+    """
+    checkpoint = _load_checkpoint(checkpoint_path, user_id) if not restart else _new_checkpoint(user_id)
+    # Enough chunks per window to keep every worker busy
+    window = chunk_size * max(workers, 1) * 4
+    
+    executor = None
+    if workers:
+        torch_threads = max(1, available_cores() // workers)
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(torch_threads,))
+    else:
+        _init_worker()
+    
+    db = SessionLocal()
+    processed = changed = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            # The window is read completely before anything is written
+            chunks = list(_read_window(db, checkpoint["last_id"], user_id, window, chunk_size))
+            if not chunks:
+                break
+            current = {row.id: row for chunk in chunks for row in chunk}
+            priors = _window_priors(db, current.values())
+            # Only the subject is stored for these; classifying it alone would overwrite the label with a guess
+            tasks = [
+                [
+                    (row.id, row.user_id, row.subject, row.message, priors[row.id])
+                    for row in chunk if row.message is not None
+                ]
+                for chunk in chunks
+            ]
+            tasks = [task for task in tasks if task]
+            window_skipped = sum(1 for row in current.values() if row.message is None)
+            
+            updates = []
+            reputation = defaultdict(list)
+            window_fallback = 0
+            for results in (executor.map(classify_chunk, tasks) if executor else map(classify_chunk, tasks)):
+                for email_id, classification, response, model_version, path in results:
+                    row = current[email_id]
+                    if path in FALLBACK_PATHS:
+                        window_fallback += 1
+                    elif classification != row.classification.value:
+                        updates.append({
+                            "id": email_id,
+                            "classification": EmailClassification(classification),
+                            "response": response,
+                            "model_version": model_version,
+                            "classification_path": path
+                        })
+                        reputation[row.user_id].extend(_reputation_updates(row, classification, path))
+            
+            if updates and not dry_run:
+                db.bulk_update_mappings(CategorizedEmail, updates)
+                for changed_user_id, user_updates in sorted(reputation.items()):
+                    record_classifications(db, changed_user_id, user_updates)
+                db.commit()
+                email_service = EmailService(db)
+                for changed_user_id in sorted(reputation):
+                    email_service._update_statistics(changed_user_id)
+            
+            processed += len(current) - window_skipped
+            changed += len(updates)
+            checkpoint.update(
+                last_id=max(current),
+                processed=checkpoint["processed"] + len(current) - window_skipped,
+                changed=checkpoint["changed"] + len(updates),
+                skipped=checkpoint["skipped"] + window_skipped,
+                fallback=checkpoint["fallback"] + window_fallback
+            )
+            if not dry_run:
+                _save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = time.perf_counter() - start
+            print(
+                f"Processed {checkpoint['processed']} emails (last id {checkpoint['last_id']}), "
+                f"{checkpoint['changed']} changed, {checkpoint['skipped']} skipped without a message, "
+                f"{checkpoint['fallback']} kept after a fallback, {processed / elapsed:.0f} rows/s"
+            )
+    finally:
+        db.close()
+        if executor:
+            executor.shutdown()
+    
+    # Finished: the next run starts from the beginning
+    if os.path.exists(checkpoint_path) and not dry_run:
+        os.remove(checkpoint_path)
+    return ReclassificationReport(
+        processed, changed, time.perf_counter() - start, checkpoint["skipped"], checkpoint["fallback"]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassify stored emails with the current model and keywords")
+    parser.add_argument("--user", type=int, help="Only this user's emails")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=0, help="Classifier processes (0: classify in this process)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Count changed labels without writing them")
+    args = parser.parse_args()
+    
+    report = reclassify(args.user, args.chunk_size, args.workers, args.checkpoint, args.restart, args.dry_run)
+    print(
+        f"Reclassified {report.processed} emails in {report.seconds:.1f}s "
+        f"({report.rows_per_second:.0f} rows/s); {report.changed} labels "
+        f"{'would change' if args.dry_run else 'changed'}; {report.skipped} skipped without a stored message; "
+        f"{report.fallback} kept because the transformer was unavailable"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Per-user sender reputation. Every classification and correction adds to a
+(user, sender) row of weighted productive/unproductive counts; once one label
+clearly dominates a sender's history, new emails from that sender take it
+without running the classifier (SENDER_PRIOR_ENABLED).
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import event, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.sender_reputation import SenderReputation
+from app.utils.cache import TTLCache
+
+# Keeps IN (...) lists and multi-row inserts under SQLite's bound parameter limit
+_QUERY_CHUNK = 500
+_UPSERT_CHUNK = 200
+# Session.info key of the increments waiting for the caller's commit
+_PENDING_KEY = "sender_prior_pending"
+# Prior-decided emails would only reinforce the prior; empty ones say nothing
+UNRECORDED_PATHS = ("sender_prior", "empty")
+
+class SenderPrior(NamedTuple):
+    productive: float = 0.0
+    unproductive: float = 0.0
+    
+    @property
+    def label(self) -> Optional[str]:
+        """The sender's label when its history is long and one-sided enough"""
+        total = self.productive + self.unproductive
+        if total < settings.sender_prior_min_count:
+            return None
+        if self.productive >= total * settings.sender_prior_min_share:
+            return "PRODUCTIVE"
+        if self.unproductive >= total * settings.sender_prior_min_share:
+            return "UNPRODUCTIVE"
+        return None
+
+# Per-worker cache keyed by (user_id, sender). Senders without history are
+# cached too, so an unknown sender costs one query per TTL
+_prior_cache = TTLCache(
+    maxsize=settings.sender_prior_cache_size,
+    ttl=settings.sender_prior_cache_ttl_seconds
+)
+
+def normalize_sender(sender: str) -> str:
+    return sender.strip().lower()[:255]
+
+def recorded_weight(path: Optional[str], corrected: bool) -> float:
+    """
+    Weight a stored email's current label carries in its sender's counts.
+    Emails stored before paths were recorded never counted.
+    """
+    if corrected:
+        return settings.sender_prior_correction_weight
+    return 0.0 if path is None or path in UNRECORDED_PATHS else 1.0
+
+def get_sender_priors(db: Session, user_id: int, senders: Iterable[str]) -> Dict[str, SenderPrior]:
+    """Priors by normalized sender, querying only the ones not cached"""
+    priors = {}
+    missing = []
+    for sender in {normalize_sender(sender) for sender in senders}:
+        prior = _prior_cache.get((user_id, sender))
+        if prior is None:
+            missing.append(sender)
+        else:
+            priors[sender] = prior
+    
+    for start in range(0, len(missing), _QUERY_CHUNK):
+        chunk = missing[start:start + _QUERY_CHUNK]
+        rows = db.query(
+            SenderReputation.sender, SenderReputation.productive, SenderReputation.unproductive
+        ).filter(
+            SenderReputation.user_id == user_id,
+            SenderReputation.sender.in_(chunk)
+        ).all()
+        found = {row.sender: SenderPrior(row.productive, row.unproductive) for row in rows}
+        for sender in chunk:
+            priors[sender] = found.get(sender, SenderPrior())
+            _prior_cache.set((user_id, sender), priors[sender])
+    return priors
+
+def sender_prior_labels(db: Session, user_id: int, senders: Sequence[str]) -> List[Optional[str]]:
+    """The prior label for each sender (None when weak), or all None when disabled"""
+    if not settings.sender_prior_enabled:
+        return [None] * len(senders)
+    priors = get_sender_priors(db, user_id, senders)
+    return [priors[normalize_sender(sender)].label for sender in senders]
+
+def _upsert(db: Session, rows: List[dict]):
+    """
+    Insert rows or add their counts to existing ones in one statement, so
+    two requests seeing a new sender at once can't both insert it
+    """
+    table = SenderReputation.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = (sqlite if dialect == "sqlite" else postgresql).insert(table).values(rows)
+        statement = insert.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.sender],
+            set_={
+                "productive": table.c.productive + insert.excluded.productive,
+                "unproductive": table.c.unproductive + insert.excluded.unproductive,
+                "updated_at": func.now()
+            }
+        )
+    elif dialect in ("mysql", "mariadb"):
+        insert = mysql.insert(table).values(rows)
+        statement = insert.on_duplicate_key_update(
+            productive=table.c.productive + insert.inserted.productive,
+            unproductive=table.c.unproductive + insert.inserted.unproductive,
+            updated_at=func.now()
+        )
+    else:
+        for row in rows:
+            _upsert_row(db, row)
+        return
+    db.execute(statement)
+
+def _upsert_row(db: Session, row: dict):
+    """Portable fallback: update, else insert inside a savepoint and retry the update if another insert won"""
+    for _ in range(2):
+        updated = db.query(SenderReputation).filter(
+            SenderReputation.user_id == row["user_id"],
+            SenderReputation.sender == row["sender"]
+        ).update({
+            SenderReputation.productive: SenderReputation.productive + row["productive"],
+            SenderReputation.unproductive: SenderReputation.unproductive + row["unproductive"]
+        }, synchronize_session=False)
+        if updated:
+            return
+        try:
+            with db.begin_nested():
+                db.execute(SenderReputation.__table__.insert().values(**row))
+            return
+        except IntegrityError:
+            continue
+    raise Exception(f"Could not record sender reputation for {row['sender']}")
+
+def record_classifications(db: Session, user_id: int, updates: Iterable[Tuple[str, str, float]]):
+    """
+    Add (sender, classification, weight) updates to the reputation table; a
+    negative weight takes back an earlier contribution. Updates to one sender
+    are merged into a single row change. Counts are incremented in SQL so
+    concurrent workers don't lose updates; the caller commits, and this
+    worker's cached priors are only updated once it does.
+    """
+    deltas = defaultdict(lambda: [0.0, 0.0])
+    for sender, classification, weight in updates:
+        deltas[normalize_sender(sender)][0 if classification == "PRODUCTIVE" else 1] += weight
+    if not deltas:
+        return
+    
+    # Sorted so concurrent transactions lock rows in the same order
+    rows = [
+        {"user_id": user_id, "sender": sender, "productive": productive, "unproductive": unproductive}
+        for sender, (productive, unproductive) in sorted(deltas.items())
+    ]
+    for start in range(0, len(rows), _UPSERT_CHUNK):
+        _upsert(db, rows[start:start + _UPSERT_CHUNK])
+    db.info.setdefault(_PENDING_KEY, []).extend(rows)
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_priors(session: Session):
+    """Keep this worker's cached priors current; other workers catch up on expiry"""
+    for row in session.info.pop(_PENDING_KEY, ()):
+        key = (row["user_id"], row["sender"])
+        cached = _prior_cache.get(key)
+        if cached is not None:
+            _prior_cache.set(key, SenderPrior(
+                cached.productive + row["productive"], cached.unproductive + row["unproductive"]
+            ))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_priors(session: Session, previous_transaction):
+    # Only the outermost transaction; a savepoint rollback keeps the rest
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
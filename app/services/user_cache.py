@@ -0,0 +1,52 @@
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.user import User, UserStatus
+from app.utils.cache import TTLCache
+
+class CachedUser(NamedTuple):
+    """Detached snapshot of the user fields read on hot paths"""
+    id: int
+    name: str
+    email: str
+    status: UserStatus
+    avatar_url: Optional[str]
+    avatar_thumbnail_url: Optional[str]
+
+# Per-worker cache of user snapshots keyed by user id
+_user_cache = TTLCache(
+    maxsize=settings.user_cache_size,
+    ttl=settings.user_cache_ttl_seconds
+)
+
+def cache_user(user: User) -> CachedUser:
+    """Store a fresh snapshot of a user row"""
+    cached = CachedUser(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        status=user.status,
+        avatar_url=user.avatar_url,
+        avatar_thumbnail_url=user.avatar_thumbnail_url
+    )
+    _user_cache.set(user.id, cached)
+    return cached
+
+def get_cached_user(db: Session, user_id: int) -> Optional[CachedUser]:
+    """Get a user snapshot, only querying the database on a cache miss"""
+    user_id = int(user_id)
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    return cache_user(user) if user else None
+
+def invalidate_user(user_id: int):
+    """Drop a user from the cache"""
+    _user_cache.pop(int(user_id))
+
+def is_user_active(db: Session, user_id: int) -> bool:
+    """Cheap status check backed by the user cache"""
+    user = get_cached_user(db, user_id)
+    return user is not None and user.status == UserStatus.ACTIVE
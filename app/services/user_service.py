@@ -1,12 +1,15 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from app.models.user import User, UserStatus
-from app.auth import verify_password, get_password_hash
+from app.auth import verify_password, get_password_hash, verify_password_async
 from app.schemas.user import UserType
+from app.services.user_cache import CachedUser, cache_user, get_cached_user, invalidate_user
+from app.services.avatar_processing import process_avatar_variants
+from app.services.avatar_storage import content_hash, stored_variants, write_atomic
+from app.utils.executors import ExecutorBusy
+from app.config import settings
 from typing import Optional
 import os
-from PIL import Image
-import uuid
 
 class UserService:
     def __init__(self, db: Session):
@@ -16,6 +19,10 @@ class UserService:
         """Get user by ID"""
         return self.db.query(User).filter(User.id == user_id).first()
     
+    def get_cached_user(self, user_id: int) -> Optional[CachedUser]:
+        """Get a read-only user snapshot from the per-worker cache"""
+        return get_cached_user(self.db, user_id)
+    
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email"""
         return self.db.query(User).filter(User.email == email).first()
@@ -27,9 +34,29 @@ class UserService:
             return user
         return None
     
-    def create_user(self, name: str, email: str, password: str) -> User:
-        """Create a new user"""
-        hashed_password = get_password_hash(password)
+    async def authenticate_user_async(self, email: str, password: str) -> Optional[User]:
+        """
+        Authenticate user with the password check run on the password pool.
+        Hashes made with an outdated bcrypt cost are transparently replaced.
+        """
+        user = self.get_user_by_email(email)
+        if not user:
+            return None
+        
+        valid, new_hash = await verify_password_async(password, user.password)
+        if not valid:
+            return None
+        
+        if new_hash:
+            user.password = new_hash
+            self.db.commit()
+            self.db.refresh(user)
+        return user
+    
+    def create_user(self, name: str, email: str, password: Optional[str] = None,
+                    password_hash: Optional[str] = None) -> User:
+        """Create a new user from a plain password or an already computed hash"""
+        hashed_password = password_hash or get_password_hash(password)
         user = User(
             name=name,
             email=email,
@@ -39,24 +66,34 @@ class UserService:
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
+        cache_user(user)
         return user
     
     def update_user(self, user_id: int, name: Optional[str] = None, 
-                   email: Optional[str] = None, password: Optional[str] = None) -> Optional[User]:
+                   email: Optional[str] = None, password: Optional[str] = None,
+                   password_hash: Optional[str] = None) -> Optional[User]:
         """Update user information"""
         user = self.get_user_by_id(user_id)
         if not user:
+            # The row is gone, so a cached snapshot would keep it authenticating
+            invalidate_user(user_id)
             return None
         
         if name:
             user.name = name
         if email:
             user.email = email
-        if password:
+        if password_hash:
+            user.password = password_hash
+        elif password:
             user.password = get_password_hash(password)
         
+        # Drop the old snapshot before committing: if the commit raises, the
+        # outcome is unknown and the next read reloads the row
+        invalidate_user(user_id)
         self.db.commit()
         self.db.refresh(user)
+        cache_user(user)
         return user
     
     def process_avatar(self, file_content: bytes, filename: str) -> tuple[str, str]:
@@ -65,35 +102,37 @@ class UserService:
         upload_dir = "uploads/avatars"
         os.makedirs(upload_dir, exist_ok=True)
         
-        # Generate unique filename
+        # Store under the content hash so identical uploads share files
         file_extension = os.path.splitext(filename)[1].lower()
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # Save original image
-        original_path = os.path.join(upload_dir, unique_filename)
-        with open(original_path, "wb") as f:
-            f.write(file_content)
+        base_name = content_hash(file_content)
+        original_path = os.path.join(upload_dir, f"{base_name}{file_extension}")
         
-        # Create thumbnail
-        thumbnail_filename = f"thumb_{unique_filename}"
-        thumbnail_path = os.path.join(upload_dir, thumbnail_filename)
+        variants = stored_variants(upload_dir, base_name)
+        if variants and os.path.exists(original_path):
+            return original_path, variants[settings.avatar_thumbnail_size]["jpeg"]
         
+        # Create thumbnail and the other sizes (JPEG + WebP) off the request
         try:
-            with Image.open(original_path) as img:
-                # Resize to thumbnail (150x150)
-                img.thumbnail((150, 150), Image.Resampling.LANCZOS)
-                img.save(thumbnail_path, "JPEG", quality=85)
+            variants = process_avatar_variants(file_content, upload_dir, base_name)
+            thumbnail_path = variants[settings.avatar_thumbnail_size]["jpeg"]
+        except (ValueError, ExecutorBusy):
+            # Rejected by the size/pixel limits or a full processing queue
+            raise
         except Exception as e:
             print(f"Error creating thumbnail: {e}")
             # If thumbnail creation fails, use original as thumbnail
             thumbnail_path = original_path
         
+        # Save original image
+        write_atomic(original_path, file_content)
+        
         return original_path, thumbnail_path
     
     def update_user_avatar(self, user_id: int, file_content: bytes, filename: str) -> Optional[User]:
         """Update user avatar"""
         user = self.get_user_by_id(user_id)
         if not user:
+            invalidate_user(user_id)
             return None
         
         # Process avatar
@@ -105,10 +144,11 @@ class UserService:
         
         self.db.commit()
         self.db.refresh(user)
+        cache_user(user)
         return user
     
-    def to_user_type(self, user: User) -> UserType:
-        """Convert User model to UserType schema"""
+    def to_user_type(self, user) -> UserType:
+        """Convert User model (or cached snapshot) to UserType schema"""
         return UserType(
             id=user.id,
             name=user.name,
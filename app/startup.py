@@ -0,0 +1,110 @@
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from app.config import settings
+from app.database import engine, Base
+# Import models to register them with SQLAlchemy
+from app.models import User, CategorizedEmail, EmailStatistics
+from app.services.email_classifier import email_classifier
+from app.services.model_registry import start_active_version_watcher
+from app.services.near_duplicates import load_near_duplicate_index
+from app.utils.preprocessing import email_preprocessor
+from app.utils.nlp_bundle import BundleError, verify_bundle, activate_bundle
+from app.utils.memory import process_memory
+
+# Duration in seconds of each startup phase, in the order they ran
+startup_phases = {}
+# Outcome of the NLP bundle check: the verified manifest or why it was rejected
+bundle_status = {"manifest": None, "error": None}
+_nlp_ready = threading.Event()
+
+@contextmanager
+def timed_phase(name: str):
+    """Record and log how long a startup phase takes"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = round(time.perf_counter() - start, 3)
+        print(f"Startup phase '{name}' took {startup_phases[name]:.3f}s")
+
+def prepare_storage():
+    """Create database tables and upload directories"""
+    with timed_phase("database"):
+        Base.metadata.create_all(bind=engine)
+    
+    with timed_phase("upload_dirs"):
+        os.makedirs("uploads", exist_ok=True)
+        os.makedirs("uploads/avatars", exist_ok=True)
+
+def prepare_nlp_bundle() -> bool:
+    """
+    Verify and activate the offline NLP bundle once per process tree: under
+    gunicorn preload the master checks it and the forked workers inherit the
+    result. A bad bundle leaves the server unready with the reason on /ready.
+    Returns whether the models can be loaded.
+    """
+    if not settings.nlp_bundle_path:
+        return True
+    
+    if bundle_status["manifest"] is None and bundle_status["error"] is None:
+        with timed_phase("nlp_bundle"):
+            try:
+                bundle_status["manifest"] = verify_bundle(settings.nlp_bundle_path)
+            except BundleError as e:
+                bundle_status["error"] = str(e)
+                print(f"Rejected offline NLP bundle: {e}")
+                return False
+            activate_bundle(settings.nlp_bundle_path)
+        print(f"Using offline NLP bundle {bundle_status['manifest']['version']}")
+    
+    return bundle_status["error"] is None
+
+def warm_up_models():
+    """Load NLP resources and the classifier model"""
+    try:
+        with timed_phase("nlp_resources"):
+            email_preprocessor.load_resources(download=not settings.nlp_bundle_path)
+        _nlp_ready.set()
+    except Exception as e:
+        print(f"Error loading NLP resources: {e}")
+    
+    with timed_phase("classifier"):
+        email_classifier.warm_up()
+    
+    with timed_phase("near_duplicates"):
+        load_near_duplicate_index()
+    
+    start_active_version_watcher()
+    print(f"Startup finished: {startup_phases}")
+    print(f"Worker memory: {process_memory()}")
+
+def preload_models():
+    """
+    Load NLP resources and the model once in a pre-fork master process, so
+    forked workers share the weights copy-on-write instead of loading their own.
+    """
+    if not prepare_nlp_bundle():
+        return
+    
+    with timed_phase("preload_nlp_resources"):
+        email_preprocessor.load_resources(download=not settings.nlp_bundle_path)
+    
+    with timed_phase("preload_classifier"):
+        email_classifier.preload()
+    
+    # Keep the garbage collector from touching (and copying) preloaded objects
+    gc.freeze()
+    print(f"Master memory after preload: {process_memory()}")
+
+def start_background_warm_up() -> threading.Thread:
+    """Warm up the models without blocking the server from accepting requests"""
+    thread = threading.Thread(target=warm_up_models, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready() -> bool:
+    """True when NLP resources are loaded and the classifier is warm"""
+    return _nlp_ready.is_set() and email_classifier.is_ready
@@ -0,0 +1,28 @@
+import threading
+from concurrent.futures import Executor, Future
+
+class ExecutorBusy(Exception):
+    """Raised when a bounded executor has no free slot"""
+
+class BoundedExecutor:
+    """
+    Wraps an executor and caps running plus queued tasks, rejecting new work
+    immediately instead of letting the queue grow without bound.
+    """
+    def __init__(self, executor: Executor, max_pending: int):
+        self.executor = executor
+        self._slots = threading.BoundedSemaphore(max_pending)
+    
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy("Executor queue is full")
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
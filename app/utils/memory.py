@@ -0,0 +1,31 @@
+import os
+import resource
+
+# /proc/self/smaps_rollup fields reported by process_memory (kB -> MB)
+_SMAPS_FIELDS = {
+    "Rss:": "rss_mb",
+    "Pss:": "pss_mb",
+    "Shared_Clean:": "shared_clean_mb",
+    "Shared_Dirty:": "shared_dirty_mb",
+    "Private_Clean:": "private_clean_mb",
+    "Private_Dirty:": "private_dirty_mb",
+}
+
+def process_memory() -> dict:
+    """
+    Memory of the current worker process in MB. PSS splits shared pages
+    between the processes mapping them, so it shows what a worker really
+    costs when the model is shared copy-on-write.
+    """
+    memory = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in _SMAPS_FIELDS:
+                    memory[_SMAPS_FIELDS[parts[0]]] = round(int(parts[1]) / 1024, 1)
+    except OSError:
+        # Not Linux: only the peak RSS is available
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["max_rss_mb"] = round(peak / 1024, 1)
+    return memory
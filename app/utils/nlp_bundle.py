@@ -0,0 +1,167 @@
+"""
+Versioned offline bundle of the NLP resources used at runtime: NLTK data and
+the tokenizer/model weights named in PORTUGUESE_MODEL_CONFIG.
+
+Build (needs network):  python -m app.utils.nlp_bundle build bundles/nlp 2024.1
+Verify:                 python -m app.utils.nlp_bundle verify bundles/nlp/2024.1
+
+Hashing the bundle is slow for large models, so a successful check leaves a
+stamp file recording each file's size and mtime; later boots skip the hashing
+while the stamp still matches. The verify command always hashes everything.
+"""
+import argparse
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+from app.config import settings
+from app.utils.portuguese_config import PORTUGUESE_MODEL_CONFIG
+
+MANIFEST_NAME = "manifest.json"
+NLTK_DIR = "nltk_data"
+MODELS_DIR = "models"
+STAMP_NAME = ".verified.json"
+
+class BundleError(Exception):
+    """Raised when the bundle is missing files or fails its checksum check"""
+
+def model_dir_name(model_name: str) -> str:
+    return model_name.replace("/", "__")
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _bundle_files(bundle_path: str):
+    for root, _, files in os.walk(bundle_path):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, bundle_path)
+            if relative not in (MANIFEST_NAME, STAMP_NAME):
+                yield relative, path
+
+def build_bundle(output_dir: str, version: str) -> str:
+    """Download every resource into output_dir/version and write its manifest"""
+    import nltk
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    from app.utils.preprocessing import NLTK_RESOURCES
+    
+    bundle_path = os.path.join(output_dir, version)
+    nltk_dir = os.path.join(bundle_path, NLTK_DIR)
+    os.makedirs(nltk_dir, exist_ok=True)
+    
+    for _, package in NLTK_RESOURCES:
+        if not nltk.download(package, download_dir=nltk_dir, raise_on_error=True):
+            raise BundleError(f"Could not download NLTK package {package}")
+    
+    models = [PORTUGUESE_MODEL_CONFIG["primary_model"], PORTUGUESE_MODEL_CONFIG["fallback_model"]]
+    for model_name in models:
+        model_path = os.path.join(bundle_path, MODELS_DIR, model_dir_name(model_name))
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_path)
+        # safetensors weights can be memory-mapped when loaded
+        model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
+        model.save_pretrained(model_path, safe_serialization=True)
+    
+    manifest = {
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "models": models,
+        "files": {relative: _sha256(path) for relative, path in sorted(_bundle_files(bundle_path))}
+    }
+    with open(os.path.join(bundle_path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    
+    return bundle_path
+
+def _stamp(bundle_path: str, manifest_path: str, manifest: dict) -> dict:
+    """Size and mtime of the manifest and every file it lists"""
+    files = {}
+    for relative in [MANIFEST_NAME] + sorted(manifest["files"]):
+        path = manifest_path if relative == MANIFEST_NAME else os.path.join(bundle_path, relative)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise BundleError(f"Bundle file missing: {relative}")
+        files[relative] = [stat.st_size, stat.st_mtime_ns]
+    return {"version": manifest["version"], "files": files}
+
+def _read_stamp(bundle_path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(bundle_path, STAMP_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_stamp(bundle_path: str, stamp: dict):
+    """Best effort: a read-only bundle is simply hashed again on the next boot"""
+    path = os.path.join(bundle_path, STAMP_NAME)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(stamp, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not write bundle stamp {path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def verify_bundle(bundle_path: str, use_stamp: bool = True) -> dict:
+    """
+    Check every file in the manifest against its checksum. With use_stamp,
+    files whose size and mtime match the last successful check are trusted.
+    """
+    manifest_path = os.path.join(bundle_path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise BundleError(f"No manifest found in {bundle_path}")
+    
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    
+    stamp = _stamp(bundle_path, manifest_path, manifest)
+    if use_stamp and _read_stamp(bundle_path) == stamp:
+        return manifest
+    
+    for relative, expected in manifest["files"].items():
+        if _sha256(os.path.join(bundle_path, relative)) != expected:
+            raise BundleError(f"Checksum mismatch for bundle file: {relative}")
+    
+    _write_stamp(bundle_path, stamp)
+    return manifest
+
+def activate_bundle(bundle_path: str):
+    """Point NLTK and transformers at the bundle and disable network access"""
+    import nltk
+    
+    nltk.data.path.insert(0, os.path.join(bundle_path, NLTK_DIR))
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+def bundle_model_path(model_name: str) -> Optional[str]:
+    """Local path of a model inside the configured bundle, if any"""
+    if not settings.nlp_bundle_path:
+        return None
+    return os.path.join(settings.nlp_bundle_path, MODELS_DIR, model_dir_name(model_name))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify the offline NLP bundle")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build")
+    build.add_argument("output_dir")
+    build.add_argument("version")
+    verify = subparsers.add_parser("verify")
+    verify.add_argument("bundle_path")
+    args = parser.parse_args()
+    
+    if args.command == "build":
+        print(f"Bundle written to {build_bundle(args.output_dir, args.version)}")
+    else:
+        manifest = verify_bundle(args.bundle_path, use_stamp=False)
+        print(f"Bundle {manifest['version']} OK ({len(manifest['files'])} files)")
+
+if __name__ == "__main__":
+    main()
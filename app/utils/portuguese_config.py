@@ -157,6 +157,9 @@ PORTUGUESE_MODEL_CONFIG = {
     "fallback_model": "distilbert-base-multilingual-cased",
     "confidence_threshold": 0.7,
     "max_length": 512,
+    # Tokens kept from the start of an over-long email; the rest of the
+    # budget goes to its end
+    "truncation_head_tokens": 128,
     "batch_size": 16
 }
 
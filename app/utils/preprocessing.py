@@ -11,37 +11,51 @@ from .portuguese_config import (
     PORTUGUESE_PREPROCESSING_CONFIG
 )
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# Keyword lists contain duplicates; scores count each keyword once
+_PRODUCTIVE_SET = tuple(dict.fromkeys(PRODUCTIVE_KEYWORDS))
+_UNPRODUCTIVE_SET = tuple(dict.fromkeys(UNPRODUCTIVE_KEYWORDS))
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+# NLTK data required by the preprocessor (resource path, package name)
+NLTK_RESOURCES = [
+    ('tokenizers/punkt', 'punkt'),
+    ('corpora/stopwords', 'stopwords'),
+    # Portuguese data
+    ('tokenizers/punkt_tab', 'punkt_tab'),
+    ('corpora/floresta', 'floresta'),
+]
 
-# Download Portuguese data
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('punkt_tab')
-
-try:
-    nltk.data.find('corpora/floresta')
-except LookupError:
-    nltk.download('floresta')
+def ensure_nltk_resources(download: bool = True):
+    """Download any missing NLTK data (called at startup, not import time)"""
+    for resource_path, package in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource_path)
+        except LookupError:
+            if not download:
+                raise
+            nltk.download(package)
 
 class EmailPreprocessor:
     def __init__(self):
         self.stemmer = PorterStemmer()
-        # Use Portuguese stopwords
-        try:
-            self.stop_words = set(stopwords.words('portuguese'))
-        except LookupError:
-            # Fallback to English if Portuguese not available
-            self.stop_words = set(stopwords.words('english'))
+        self._stop_words = None
+    
+    @property
+    def stop_words(self) -> set:
+        """Stopwords, loaded on first use"""
+        if self._stop_words is None:
+            # Use Portuguese stopwords
+            try:
+                self._stop_words = set(stopwords.words('portuguese'))
+            except LookupError:
+                # Fallback to English if Portuguese not available
+                self._stop_words = set(stopwords.words('english'))
+        return self._stop_words
+    
+    def load_resources(self, download: bool = True):
+        """Make sure NLTK data is available and warm the stopwords"""
+        ensure_nltk_resources(download=download)
+        self._stop_words = None
+        return self.stop_words
         
     def clean_text(self, text: str) -> str:
         """Clean and normalize text"""
@@ -105,6 +119,13 @@ class EmailPreprocessor:
         """Check for keywords that indicate unproductive emails"""
         text_lower = text.lower()
         return any(keyword in text_lower for keyword in UNPRODUCTIVE_KEYWORDS)
+    
+    def keyword_scores(self, text: str) -> Tuple[int, int]:
+        """Count distinct productive and unproductive keywords in the text"""
+        text_lower = text.lower()
+        productive = sum(1 for keyword in _PRODUCTIVE_SET if keyword in text_lower)
+        unproductive = sum(1 for keyword in _UNPRODUCTIVE_SET if keyword in text_lower)
+        return productive, unproductive
 
 # Global instance
 email_preprocessor = EmailPreprocessor()
@@ -0,0 +1,187 @@
+import cProfile
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Optional
+from app.config import settings
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SKIPPED_HEADER = "X-Profile-Skipped"
+
+# The event loop interleaves every request of the worker on one thread. The
+# sampler keeps only the samples taken while the profiled request's own
+# coroutine is on the stack, so other requests never land in its profile and
+# nothing has to wait. cProfile hooks the whole thread instead, so a cProfile
+# profile is only started when no other request is in flight; otherwise the
+# request runs unprofiled and the response says so in X-Profile-Skipped.
+# Work offloaded to threadpools (sync handlers, the inference pool) is not
+# captured in either mode, and the sampler only runs when the loop thread
+# releases the GIL, so CPU bursts shorter than the switch interval (5 ms) are
+# under-represented.
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval (speedscope output).
+    Given an anchor frame, only samples with the anchor on the stack are kept,
+    trimmed to the frames above it, which confines the profile to one task.
+    """
+    def __init__(self, thread_id: int, interval: float, anchor=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.anchor = anchor
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+    
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+    
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = self._stack(frame) if frame is not None else None
+            if stack is not None:
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+    
+    def _stack(self, frame) -> Optional[list]:
+        """Frame indexes root first, or None when the anchor is not on the stack"""
+        frames = []
+        while frame is not None and frame is not self.anchor:
+            frames.append(frame)
+            frame = frame.f_back
+        if self.anchor is not None and frame is None:
+            return None
+        
+        stack = []
+        for frame in frames:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            if key not in self.frame_index:
+                self.frame_index[key] = len(self.frames)
+                self.frames.append({"name": key[0], "file": key[1], "line": key[2]})
+            stack.append(self.frame_index[key])
+        # speedscope expects root first
+        stack.reverse()
+        return stack
+    
+    def dump(self, path: str, name: str):
+        profile = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": self.samples,
+                "weights": self.weights
+            }],
+            "name": name,
+            "exporter": "seleciona-ai"
+        }
+        with open(path, "w") as f:
+            json.dump(profile, f)
+
+def _with_header(send, name: str, value: str):
+    """Wrap an ASGI send callable to add one response header"""
+    async def send_wrapper(message):
+        if message["type"] == "http.response.start":
+            headers = list(message.get("headers", []))
+            headers.append((name.lower().encode(), value.encode()))
+            message = {**message, "headers": headers}
+        await send(message)
+    return send_wrapper
+
+def should_profile(scope) -> bool:
+    """Profile when the request carries the profiling token or is sampled"""
+    if settings.profiling_token:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return hmac.compare_digest(value, settings.profiling_token.encode())
+    return settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles single requests on demand. The profile is
+    saved under settings.profiling_dir and its id is returned in X-Profile-Id.
+    In cprofile mode a request that asks for a profile while others are in
+    flight runs unprofiled and gets X-Profile-Skipped: busy instead.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._in_flight = 0
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        profile = should_profile(scope)
+        self._in_flight += 1
+        try:
+            if not profile:
+                await self.app(scope, receive, send)
+            elif settings.profiling_mode == "sampling" or self._in_flight == 1:
+                await self._profile(scope, receive, send)
+            else:
+                print(f"Skipped cProfile profile of {scope['method']} {scope['path']}: "
+                      f"{self._in_flight - 1} other requests in flight")
+                await self.app(scope, receive, _with_header(send, PROFILE_SKIPPED_HEADER, "busy"))
+        finally:
+            self._in_flight -= 1
+    
+    async def _profile(self, scope, receive, send):
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        send_wrapper = _with_header(send, PROFILE_ID_HEADER, profile_id)
+        
+        label = f"{scope['method']} {scope['path']}"
+        if settings.profiling_mode == "sampling":
+            # This coroutine's frame sits below everything the request runs
+            profiler = SamplingProfiler(
+                threading.get_ident(), settings.profiling_interval_ms / 1000, anchor=sys._getframe()
+            )
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.stop()
+                self._save(profile_id, label, lambda path: profiler.dump(path, label), ".speedscope.json")
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+                self._save(profile_id, label, profiler.dump_stats, ".prof")
+    
+    def _save(self, profile_id: str, label: str, dump, extension: str) -> Optional[str]:
+        try:
+            os.makedirs(settings.profiling_dir, exist_ok=True)
+            path = os.path.join(settings.profiling_dir, profile_id + extension)
+            dump(path)
+            print(f"Saved profile {profile_id} for {label}: {path}")
+            return path
+        except OSError as e:
+            print(f"Could not save profile {profile_id}: {e}")
+            return None
@@ -0,0 +1,16 @@
+"""
+Pytest plugin with a query budget fixture. Enable it in a conftest.py with
+pytest_plugins = ["app.utils.pytest_query_budget"] (tests/conftest.py does),
+then:
+
+    def test_get_emails_list(query_budget):
+        with query_budget(2):
+            schema.execute_sync("{ getEmailsList { emails { id } } }", ...)
+"""
+import pytest
+from app.utils.query_tracking import assert_max_queries
+
+@pytest.fixture
+def query_budget():
+    """Context manager factory: query_budget(max_queries, max_repeats=None)"""
+    return assert_max_queries
@@ -0,0 +1,114 @@
+"""
+Per-request SQL statement tracking.
+
+Statements executed while a tracker is active are counted and grouped by
+shape (the SQL with whitespace and IN-lists normalized), so repeated shapes
+such as N+1 query patterns can be reported.
+"""
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|\[POSTCOMPILE_\w+\])"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so repeats with different parameters match"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(?)", shape)
+
+class QueryStats:
+    """SQL statements issued while a tracker is active"""
+    def __init__(self, repeat_threshold: Optional[int] = None, label: str = "request"):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Dict[str, List] = {}  # shape -> [count, duration]
+        self.repeat_threshold = repeat_threshold
+        self.label = label
+        self._warned = set()
+    
+    def record(self, statement: str, duration: float):
+        shape = statement_shape(statement)
+        entry = self.shapes.setdefault(shape, [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+        self.count += 1
+        self.duration += duration
+        
+        if (self.repeat_threshold and entry[0] > self.repeat_threshold
+                and shape not in self._warned):
+            self._warned.add(shape)
+            print(f"Warning: possible N+1 query in {self.label}, statement repeated "
+                  f"more than {self.repeat_threshold} times: {shape[:200]}")
+    
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Shapes executed more than threshold times"""
+        return {shape: entry[0] for shape, entry in self.shapes.items() if entry[0] > threshold}
+    
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "duration_ms": round(self.duration * 1000, 3),
+            "statements": [
+                {"sql": shape, "count": entry[0], "duration_ms": round(entry[1] * 1000, 3)}
+                for shape, entry in sorted(self.shapes.items(), key=lambda item: -item[1][1])
+            ]
+        }
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Process-wide trackers, used by tests where the app runs in another thread
+_global_trackers: List[QueryStats] = []
+_global_lock = threading.Lock()
+
+def record_query(statement: str, duration: float):
+    """Called by the engine hook for every executed statement"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if _global_trackers:
+        with _global_lock:
+            for tracker in _global_trackers:
+                if tracker is not stats:
+                    tracker.record(statement, duration)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+@contextmanager
+def track_queries(repeat_threshold: Optional[int] = None, label: str = "request",
+                  process_wide: bool = False):
+    """Track statements executed in this context (or anywhere, if process_wide)"""
+    stats = QueryStats(repeat_threshold=repeat_threshold, label=label)
+    token = _current_stats.set(stats)
+    if process_wide:
+        with _global_lock:
+            _global_trackers.append(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        if process_wide:
+            with _global_lock:
+                _global_trackers.remove(stats)
+
+@contextmanager
+def assert_max_queries(max_queries: int, max_repeats: Optional[int] = None):
+    """Fail if the block runs more statements (or repeats of one shape) than budgeted"""
+    with track_queries(label="query budget", process_wide=True) as stats:
+        yield stats
+    
+    details = "\n".join(
+        f"  {item['count']}x {item['sql']}" for item in stats.summary()["statements"]
+    )
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"{stats.count} SQL statements executed, budget is {max_queries}:\n{details}"
+        )
+    if max_repeats is not None and stats.repeated(max_repeats):
+        raise AssertionError(
+            f"Statement repeated more than {max_repeats} times (N+1?):\n{details}"
+        )
@@ -0,0 +1,36 @@
+from typing import Iterable, List, Optional, Set
+from strawberry.types import Info
+from strawberry.types.nodes import SelectedField
+from strawberry.utils.str_converters import to_snake_case
+
+def _flatten(selections: Iterable) -> List[SelectedField]:
+    """Expand fragment spreads and inline fragments into plain fields"""
+    fields = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            fields.append(selection)
+        else:
+            fields.extend(_flatten(selection.selections))
+    return fields
+
+def get_selected_fields(info: Info, *path: str) -> Optional[Set[str]]:
+    """
+    Return the snake_case field names requested under the given path of the
+    current resolver's selection set, e.g. get_selected_fields(info, "emails").
+    Returns None when the path is not part of the selection.
+    """
+    fields = _flatten(info.selected_fields)
+    # The first level is the resolver field itself
+    fields = _flatten(sub for field in fields for sub in field.selections)
+
+    for name in path:
+        matches = [field for field in fields if to_snake_case(field.name) == name]
+        if not matches:
+            return None
+        fields = _flatten(sub for field in matches for sub in field.selections)
+
+    return {
+        to_snake_case(field.name)
+        for field in fields
+        if not field.name.startswith("__")
+    }
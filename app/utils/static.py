@@ -0,0 +1,38 @@
+import os
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from app.services.avatar_storage import CONTENT_ADDRESSED_NAME
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves content-addressed files with a strong ETag derived
+    from the file name and a long-lived immutable Cache-Control header.
+    Other files keep the default StaticFiles behaviour.
+    """
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        name = os.path.basename(full_path)
+        if not CONTENT_ADDRESSED_NAME.match(name):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            method=scope["method"],
+            headers={"etag": f'"{name}"', "cache-control": IMMUTABLE_CACHE_CONTROL}
+        )
+        if self._etag_matches(response.headers["etag"], Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+    
+    def _etag_matches(self, etag: str, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
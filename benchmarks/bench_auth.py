@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of authentication overhead per GraphQL request.
+
+Compares decoding the JWT in every resolver (previous behaviour) with the
+per-request context cache plus the verified-token cache.
+Usage: python benchmarks/bench_auth.py [requests] [resolvers_per_request]
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from app.auth import create_access_token, get_current_user, _token_cache
+from app.config import settings
+from app.models.user import UserStatus
+from app.services.user_cache import CachedUser, _user_cache
+
+class FakeRequest:
+    def __init__(self, token):
+        self.headers = {"authorization": f"Bearer {token}"}
+
+class FakeInfo:
+    def __init__(self, context):
+        self.context = context
+
+def bench_uncached(token, requests, resolvers):
+    start = time.perf_counter()
+    for _ in range(requests):
+        for _ in range(resolvers):
+            jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    return time.perf_counter() - start
+
+def bench_cached(token, requests, resolvers):
+    _token_cache.clear()
+    # Warm user cache so the status check never needs a database
+    _user_cache.set(1, CachedUser(1, "Bench", "bench@example.com", UserStatus.ACTIVE, None, None))
+    start = time.perf_counter()
+    for _ in range(requests):
+        info = FakeInfo({"request": FakeRequest(token)})
+        for _ in range(resolvers):
+            get_current_user(info)
+    return time.perf_counter() - start
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    resolvers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    token = create_access_token(data={"sub": "1"})
+    
+    print(f"Auth overhead: {requests} requests x {resolvers} resolvers")
+    print("=" * 50)
+    for name, bench in [("verify per resolver", bench_uncached), ("cached", bench_cached)]:
+        elapsed = bench(token, requests, resolvers)
+        print(f"{name:<22} {elapsed / requests * 1e6:10.1f} us/request")
+
+if __name__ == "__main__":
+    main()
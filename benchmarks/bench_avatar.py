@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark of avatar processing: peak RSS and latency per avatar.
+
+Compares the previous in-request thumbnail (one 150x150 JPEG), the previous
+approach extended to every configured size and format (one decode per
+variant), and render_avatar_variants (all variants from one decode).
+Each run happens in a fresh process so peak RSS is measured in isolation.
+Usage: python benchmarks/bench_avatar.py [width] [height]
+"""
+
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+def make_photo(width, height) -> bytes:
+    """Generate a noisy JPEG roughly like a phone photo"""
+    img = Image.effect_noise((width, height), 64).convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+def previous_pipeline(file_content, upload_dir):
+    original_path = os.path.join(upload_dir, "original.jpg")
+    with open(original_path, "wb") as f:
+        f.write(file_content)
+    with Image.open(original_path) as img:
+        img.thumbnail((150, 150), Image.Resampling.LANCZOS)
+        img.save(os.path.join(upload_dir, "thumb.jpg"), "JPEG", quality=85)
+
+def previous_pipeline_all_sizes(file_content, upload_dir):
+    from app.config import settings
+    original_path = os.path.join(upload_dir, "original.jpg")
+    with open(original_path, "wb") as f:
+        f.write(file_content)
+    for size in settings.avatar_sizes:
+        for fmt, ext in [("JPEG", "jpg"), ("WEBP", "webp")]:
+            with Image.open(original_path) as img:
+                img.thumbnail((size, size), Image.Resampling.LANCZOS)
+                img.convert("RGB").save(os.path.join(upload_dir, f"{size}.{ext}"), fmt)
+
+def new_pipeline(file_content, upload_dir):
+    from app.config import settings
+    from app.services.avatar_processing import render_avatar_variants
+    render_avatar_variants(file_content, upload_dir, "avatar", settings.avatar_sizes, settings.avatar_max_pixels)
+
+def run(name, file_content, queue):
+    pipeline = {
+        "previous": previous_pipeline,
+        "previous (all sizes)": previous_pipeline_all_sizes,
+        "new": new_pipeline
+    }[name]
+    with tempfile.TemporaryDirectory() as upload_dir:
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        pipeline(file_content, upload_dir)
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - baseline) / 1024))
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 4032
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 3024
+    file_content = make_photo(width, height)
+    
+    print(f"Avatar processing: {width}x{height} JPEG, {len(file_content) / 1024:.0f} KB")
+    print("=" * 50)
+    for name in ["previous", "previous (all sizes)", "new"]:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run, args=(name, file_content, queue))
+        process.start()
+        elapsed, rss_mb = queue.get()
+        process.join()
+        print(f"{name:<22} {elapsed * 1000:8.1f} ms   peak RSS +{rss_mb:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
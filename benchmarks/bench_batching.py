@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Transformer throughput on a realistic (long-tailed) email length distribution:
+one email at a time, batches in arrival order, and length-bucketed batches.
+
+    python benchmarks/bench_batching.py --emails 512
+    python benchmarks/bench_batching.py --model /path/to/save_pretrained_dir
+
+Also reports token lengths before truncation and how much of each batch is
+padding. Needs transformers and torch.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from app.services.email_classifier import EmailClassifier, ModelHandle, load_pipeline, length_buckets
+from app.utils.preprocessing import email_preprocessor
+from app.utils.portuguese_config import PORTUGUESE_MODEL_CONFIG
+
+def features(emails: list) -> list:
+    """The text the transformer sees; raw text when NLTK data is missing"""
+    try:
+        return [email_preprocessor.extract_features(e["subject"], e["message"]) for e in emails]
+    except LookupError:
+        print("NLTK data missing; using raw lowercase text")
+        return [f"{e['subject']} {e['message']}".lower() for e in emails]
+
+def padding_fraction(batches: list) -> float:
+    """Share of the batch tensors that is padding"""
+    padded = sum(len(batch) * max(len(ids) for ids in batch) for batch in batches)
+    real = sum(len(ids) for batch in batches for ids in batch)
+    return 1 - real / padded
+
+def run(name: str, fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {count / elapsed:10.1f} emails/s  ({elapsed:.2f}s)")
+    return count / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=256)
+    parser.add_argument("--median-sentences", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--model", default=PORTUGUESE_MODEL_CONFIG["primary_model"])
+    parser.add_argument("--batch-size", type=int, default=PORTUGUESE_MODEL_CONFIG["batch_size"])
+    args = parser.parse_args()
+    
+    PORTUGUESE_MODEL_CONFIG["batch_size"] = args.batch_size
+    classifier = EmailClassifier()
+    handle = ModelHandle("bench", classifier=load_pipeline(args.model, local_only=os.path.isdir(args.model)))
+    
+    texts = features(generate_corpus(args.emails, seed=args.seed, median_sentences=args.median_sentences))
+    tokenizer = handle.classifier.tokenizer
+    raw_lengths = sorted(len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"])
+    input_ids = classifier._encode(handle.classifier, texts)
+    truncated = sum(length > PORTUGUESE_MODEL_CONFIG["max_length"] - 2 for length in raw_lengths)
+    print(
+        f"{len(texts)} emails, tokens p50 {statistics.median(raw_lengths):.0f} "
+        f"p90 {raw_lengths[int(len(raw_lengths) * 0.9)]} max {raw_lengths[-1]}, "
+        f"{truncated} truncated to {PORTUGUESE_MODEL_CONFIG['max_length']}"
+    )
+    
+    arrival = [input_ids[i:i + args.batch_size] for i in range(0, len(input_ids), args.batch_size)]
+    bucketed = [[input_ids[i] for i in bucket] for bucket in length_buckets([len(ids) for ids in input_ids], args.batch_size)]
+    print(f"Padding: arrival order {padding_fraction(arrival):.1%}, bucketed {padding_fraction(bucketed):.1%}\n")
+    
+    # Warm up
+    classifier._forward(handle.classifier, arrival[0])
+    
+    run("single", lambda: [classifier._predict(text, handle) for text in texts], len(texts))
+    run("arrival", lambda: [classifier._forward(handle.classifier, batch) for batch in arrival], len(texts))
+    run("bucketed", lambda: classifier._run(classifier._predict_batch(texts, handle)), len(texts))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Transformer throughput by inference pool shape: workers x torch threads per
+worker, from one worker using every core to one single-threaded worker per
+core, plus an oversubscribed pool (every worker using every core).
+
+    python benchmarks/bench_inference_pool.py --model /path/to/save_pretrained_dir
+    python benchmarks/bench_inference_pool.py --cores 8 --seconds 20
+
+Concurrent clients send single emails with shedding disabled, so every
+request reaches the transformer. Needs transformers and torch.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from app.config import settings
+from app.services.email_classifier import EmailClassifier, ModelHandle, load_pipeline, available_cores
+from app.utils.preprocessing import email_preprocessor
+from app.utils.portuguese_config import PORTUGUESE_MODEL_CONFIG
+
+def throughput(classifier: EmailClassifier, emails: list, clients: int, seconds: float) -> float:
+    counts = [0] * clients
+    stop = time.perf_counter() + seconds
+    
+    def client(index: int):
+        while time.perf_counter() < stop:
+            classifier.classify(*emails[(counts[index] * clients + index) % len(emails)])
+            counts[index] += 1
+    
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=PORTUGUESE_MODEL_CONFIG["primary_model"])
+    parser.add_argument("--cores", type=int, default=available_cores())
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    
+    # Raw text so the benchmark doesn't depend on NLTK data; never shed
+    email_preprocessor.extract_features = lambda subject, message: f"{subject} {message}".lower()
+    settings.inference_queue_limit = 10000
+    emails = [(e["subject"], e["message"]) for e in generate_corpus(512, seed=11)]
+    
+    classifier = EmailClassifier()
+    classifier.use_ml_model = True
+    classifier.inference_deadline = 3600
+    classifier.activate(ModelHandle("bench", classifier=load_pipeline(args.model, local_only=os.path.isdir(args.model))))
+    
+    shapes = []
+    workers = 1
+    while workers <= args.cores:
+        shapes.append((workers, args.cores // workers))
+        workers *= 2
+    if args.cores > 1:
+        shapes.append((args.cores, args.cores))
+    
+    print(f"{args.cores} cores")
+    for workers, threads in shapes:
+        classifier.configure_inference(workers=workers, threads=threads)
+        # Let every worker thread start and copy its tokenizer
+        throughput(classifier, emails, workers * 2, 1)
+        rate = throughput(classifier, emails, workers * 2, args.seconds)
+        label = " (oversubscribed)" if workers * threads > args.cores else ""
+        print(f"{workers:>3} workers x {threads:>2} threads  {rate:8.1f} emails/s{label}")
+
+if __name__ == "__main__":
+    main()
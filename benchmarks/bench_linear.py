@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Latency and accuracy of the linear tier against the transformer and the
+keyword rules, on a held-out split.
+
+    python benchmarks/bench_linear.py                      # synthetic corpus
+    python benchmarks/bench_linear.py --input corpus.jsonl --test-size 500
+
+The linear model is trained on the rest of the data. The transformer runs only
+when it can be loaded (USE_ML_MODEL stack installed).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.eval_cascade import load_emails
+from app.services.email_classifier import EmailClassifier
+from app.services.linear_classifier import linear_text, train_linear_model
+from app.utils.preprocessing import email_preprocessor
+
+def latency_stats(name: str, predict, emails: list) -> list:
+    """Classify one email at a time and print latency percentiles"""
+    labels, timings = [], []
+    for email in emails:
+        start = time.perf_counter()
+        labels.append(predict(email))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    accuracy = sum(label == e["label"] for label, e in zip(labels, emails)) / len(emails)
+    print(
+        f"{name:<12} p50 {statistics.median(timings) * 1000:8.3f} ms  "
+        f"p99 {p99 * 1000:8.3f} ms  accuracy {accuracy:.1%}"
+    )
+    return labels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help=".jsonl corpus with labels")
+    parser.add_argument("--size", type=int, default=5000, help="Synthetic corpus size without --input")
+    parser.add_argument("--test-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+    
+    emails = load_emails(args.input) if args.input else generate_corpus(args.size, seed=args.seed, ambiguous_rate=0.2)
+    random.Random(args.seed).shuffle(emails)
+    test, train = emails[:args.test_size], emails[args.test_size:]
+    
+    start = time.perf_counter()
+    model = train_linear_model(
+        [linear_text(e["subject"], e["message"]) for e in train],
+        [e["label"] for e in train]
+    )
+    print(f"Trained on {len(train)} emails in {time.perf_counter() - start:.2f}s ({model.metadata['features']} features)")
+    print(f"Evaluating on {len(test)} held-out emails\n")
+    
+    classifier = EmailClassifier()
+    latency_stats("rules", lambda e: classifier._rule_based_classification(e["subject"], e["message"])[0], test)
+    linear = latency_stats("linear", lambda e: model.predict(e["subject"], e["message"])[0], test)
+    
+    texts = [linear_text(e["subject"], e["message"]) for e in test]
+    start = time.perf_counter()
+    for i in range(0, len(texts), args.batch_size):
+        model.predict_batch(texts[i:i + args.batch_size])
+    elapsed = time.perf_counter() - start
+    print(f"{'linear batch':<12} {len(texts) / elapsed:10.0f} emails/s (batch size {args.batch_size})")
+    
+    try:
+        classifier.toggle_ml_model(True)
+    except ImportError as e:
+        print(f"\nTransformer skipped: {e}")
+        return
+    if not classifier.classifier:
+        print("\nTransformer skipped: model could not be loaded")
+        return
+    
+    transformer = latency_stats(
+        "transformer",
+        lambda e: classifier._ml_classification(email_preprocessor.extract_features(e["subject"], e["message"])),
+        test
+    )
+    agreement = sum(a == b for a, b in zip(linear, transformer)) / len(test)
+    print(f"\nLinear/transformer agreement: {agreement:.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Single-email classification latency under overload. Requests arrive at a
+fixed rate (--overload times the measured transformer capacity), once with
+admission control effectively off (huge queue and deadline) and once with
+the configured queue limit and deadline.
+
+    python benchmarks/bench_overload.py --model /path/to/save_pretrained_dir --overload 2
+    python benchmarks/bench_overload.py --deadline-ms 200 --queue-limit 4
+
+Latency counts from each request's scheduled arrival. Reports percentiles and
+which path answered. Needs transformers and torch.
+"""
+import argparse
+import collections
+import os
+import statistics
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from app.services.email_classifier import EmailClassifier, ModelHandle, load_pipeline
+from app.config import settings
+from app.utils.preprocessing import email_preprocessor
+from app.utils.portuguese_config import PORTUGUESE_MODEL_CONFIG
+from concurrent.futures import ThreadPoolExecutor
+
+def percentile(values: list, fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+def capacity(classifier: EmailClassifier, emails: list, seconds: float = 2.0) -> float:
+    """Sequential transformer requests per second"""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        classifier.classify(*emails[count % len(emails)])
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def run(classifier: EmailClassifier, emails: list, rate: float, seconds: float, clients: int):
+    latencies, paths = [], collections.Counter()
+    lock = threading.Lock()
+    
+    def request(email: tuple, scheduled: float):
+        result = classifier.classify(*email)
+        with lock:
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            paths[result.path] += 1
+    
+    pool = ThreadPoolExecutor(max_workers=clients, thread_name_prefix="client")
+    start = time.perf_counter()
+    for position in range(int(rate * seconds)):
+        scheduled = start + position / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pool.submit(request, emails[position % len(emails)], scheduled)
+    pool.shutdown(wait=True)
+    return latencies, paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=PORTUGUESE_MODEL_CONFIG["primary_model"])
+    parser.add_argument("--overload", type=float, default=2.0, help="Arrival rate as a multiple of capacity")
+    parser.add_argument("--clients", type=int, default=64, help="Request threads, like a server threadpool")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, help="Inference workers (default: sized to the cores)")
+    parser.add_argument("--queue-limit", type=int, default=8)
+    parser.add_argument("--deadline-ms", type=int, default=500)
+    args = parser.parse_args()
+    
+    # Raw text so the benchmark doesn't depend on NLTK data
+    email_preprocessor.extract_features = lambda subject, message: f"{subject} {message}".lower()
+    emails = [(e["subject"], e["message"]) for e in generate_corpus(512, seed=7)]
+    handle = ModelHandle("bench", classifier=load_pipeline(args.model, local_only=os.path.isdir(args.model)))
+    
+    rate = None
+    for name, queue_limit, deadline_ms in (
+        ("ungated", 100000, 10 ** 9),
+        ("gated", args.queue_limit, args.deadline_ms)
+    ):
+        classifier = EmailClassifier()
+        classifier.use_ml_model = True
+        classifier.activate(handle)
+        classifier.inference_deadline = deadline_ms / 1000
+        settings.inference_queue_limit = queue_limit
+        classifier.configure_inference(workers=args.workers)
+        if rate is None:
+            rate = capacity(classifier, emails) * args.overload
+            print(f"Arrival rate {rate:.0f} req/s ({args.overload}x capacity)")
+        latencies, paths = run(classifier, emails, rate, args.seconds, args.clients)
+        classifier._inference.shutdown()
+        print(
+            f"{name:<8} p50 {statistics.median(latencies):8.1f} ms  p99 {percentile(latencies, 0.99):8.1f} ms  "
+            f"max {max(latencies):8.1f} ms  {dict(paths)}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Similar-email search latency on a synthetic store: exact memory-mapped scan
+versus the IVF index, with IVF recall against the exact top-k.
+
+    python benchmarks/bench_similar.py --rows 1000000 --dim 256
+    python benchmarks/bench_similar.py --rows 200000 --probes 8 16 32
+
+Vectors are drawn around random topic centers so the IVF lists mean something.
+Needs only numpy; the store is written to a temporary directory.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.embedding_store import EmbeddingStore, IVFIndex
+
+SPACE = "bench"
+USER_ID = 1
+
+def fill(store: EmbeddingStore, rows: int, dim: int, topics: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    for start in range(0, rows, 100000):
+        count = min(100000, rows - start)
+        vectors = centers[rng.integers(topics, size=count)] + 0.8 * rng.standard_normal((count, dim)).astype(np.float32)
+        store.append(SPACE, USER_ID, np.arange(start, start + count), vectors)
+
+def timed(fn, repeats: int):
+    """Median milliseconds per call and the last result"""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--probes", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root)
+        start = time.perf_counter()
+        fill(store, args.rows, args.dim, args.topics, args.seed)
+        size = os.path.getsize(store._records_path(SPACE, USER_ID)) / 1e6
+        print(f"{args.rows} x {args.dim} float16 vectors ({size:.0f} MB) written in {time.perf_counter() - start:.1f}s")
+        
+        records = store.records(SPACE, USER_ID)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = [records["vector"][row].astype(np.float32) for row in rng.integers(args.rows, size=args.queries)]
+        
+        exact_ms, exact = [], []
+        for query in queries:
+            ms, result = timed(lambda: store.search(SPACE, USER_ID, query, args.k), 3)
+            exact_ms.append(ms)
+            exact.append({email_id for email_id, _ in result})
+        print(f"exact       p50 {statistics.median(exact_ms):8.2f} ms")
+        
+        start = time.perf_counter()
+        ivf = store.build_ivf(SPACE, USER_ID, min_rows=0)
+        print(f"IVF build   {time.perf_counter() - start:.1f}s, {len(ivf.centroids)} lists")
+        
+        for probes in args.probes:
+            ivf_ms, recall = [], []
+            for query, expected in zip(queries, exact):
+                ms, result = timed(lambda: store.search(SPACE, USER_ID, query, args.k, probes=probes), 3)
+                ivf_ms.append(ms)
+                recall.append(len(expected & {email_id for email_id, _ in result}) / len(expected))
+            print(f"ivf {probes:>3}     p50 {statistics.median(ivf_ms):8.2f} ms  recall@{args.k} {statistics.mean(recall):.3f}")
+
+if __name__ == "__main__":
+    main()
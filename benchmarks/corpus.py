@@ -0,0 +1,150 @@
+"""
+Synthetic Portuguese email corpus built from the PRODUCTIVE_KEYWORDS and
+UNPRODUCTIVE_KEYWORDS vocabularies, for load tests and benchmarks.
+
+    python benchmarks/corpus.py 1000 corpus.txt --seed 42
+
+Writes the upload format (email|subject|message, one per line); a .jsonl
+path also keeps the expected label of every email.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.portuguese_config import PRODUCTIVE_KEYWORDS, UNPRODUCTIVE_KEYWORDS
+
+# Keywords that appear in both lists say nothing about the label
+_SHARED = set(PRODUCTIVE_KEYWORDS) & set(UNPRODUCTIVE_KEYWORDS)
+PRODUCTIVE_ONLY = sorted(set(PRODUCTIVE_KEYWORDS) - _SHARED)
+UNPRODUCTIVE_ONLY = sorted(set(UNPRODUCTIVE_KEYWORDS) - _SHARED)
+
+FIRST_NAMES = [
+    "ana", "bruno", "carla", "daniel", "eduarda", "felipe", "gabriela", "henrique",
+    "isabela", "joao", "larissa", "marcos", "natalia", "otavio", "paula", "rafael",
+    "sofia", "thiago", "vanessa", "wagner"
+]
+DOMAINS = [
+    "empresa.com.br", "consultoria.com", "gmail.com", "hotmail.com", "loja.com.br",
+    "newsletter.com.br", "parceiro.com", "universidade.edu.br"
+]
+
+PRODUCTIVE_SUBJECTS = [
+    "{kw} - {topic}", "Re: {kw} sobre {topic}", "{topic}: {kw}", "[{kw}] {topic}",
+    "Preciso de retorno: {topic}"
+]
+UNPRODUCTIVE_SUBJECTS = [
+    "{kw}!", "Re: {kw}", "{kw} para você", "Fwd: {kw}", "Só passando para dizer: {kw}"
+]
+TOPICS = [
+    "relatório mensal", "contrato de serviço", "sistema de vendas", "projeto Alfa",
+    "servidor de produção", "planejamento do trimestre", "equipe de suporte",
+    "orçamento de marketing", "integração com o ERP", "entrega do módulo"
+]
+
+PRODUCTIVE_SENTENCES = [
+    "Preciso de uma resposta sobre {kw} até amanhã.",
+    "Podemos conversar sobre {kw} do {topic}?",
+    "Estamos com {kw} no {topic} e precisamos resolver logo.",
+    "Segue em anexo o material de {kw} para análise.",
+    "Você consegue confirmar o {kw} do {topic} hoje?",
+    "O cliente pediu {kw} no {topic} com prioridade."
+]
+UNPRODUCTIVE_SENTENCES = [
+    "Muito {kw} pela mensagem, foi ótimo receber notícias suas.",
+    "Não perca: {kw} imperdível só neste fim de semana.",
+    "Queria compartilhar um {kw} que recebi hoje.",
+    "Lembrei de você por causa do {kw} de ontem.",
+    "Confira nosso {kw} com condições especiais.",
+    "Um abraço e {kw} para toda a família."
+]
+FILLER_SENTENCES = [
+    "Fico à disposição para qualquer coisa.",
+    "Espero que esteja tudo bem por aí.",
+    "Desculpe a demora em responder.",
+    "Copiei o restante do time nesta mensagem.",
+    "Qualquer novidade eu aviso.",
+    "Obrigado pela atenção de sempre.",
+    "Seguimos acompanhando por aqui.",
+    "Abraços."
+]
+
+def _sender(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)}.{rng.choice(FIRST_NAMES)}@{rng.choice(DOMAINS)}"
+
+def _message_length(rng: random.Random, median_sentences: int) -> int:
+    """Sentence count with a long tail, like real mail (mostly short, some very long)"""
+    return max(1, min(200, int(rng.lognormvariate(0, 0.9) * median_sentences)))
+
+def generate_email(rng: random.Random, label: str, median_sentences: int = 4,
+                   ambiguous_rate: float = 0.1) -> dict:
+    """Generate one email with its expected label"""
+    if label == "PRODUCTIVE":
+        keywords, subjects, sentences = PRODUCTIVE_ONLY, PRODUCTIVE_SUBJECTS, PRODUCTIVE_SENTENCES
+    else:
+        keywords, subjects, sentences = UNPRODUCTIVE_ONLY, UNPRODUCTIVE_SUBJECTS, UNPRODUCTIVE_SENTENCES
+    
+    topic = rng.choice(TOPICS)
+    subject = rng.choice(subjects).format(kw=rng.choice(keywords).capitalize(), topic=topic)
+    
+    body = []
+    for _ in range(_message_length(rng, median_sentences)):
+        if rng.random() < 0.4:
+            body.append(rng.choice(sentences).format(kw=rng.choice(keywords), topic=topic))
+        else:
+            body.append(rng.choice(FILLER_SENTENCES))
+    
+    # Some emails carry signals from the other class too
+    if rng.random() < ambiguous_rate:
+        other = UNPRODUCTIVE_SENTENCES if label == "PRODUCTIVE" else PRODUCTIVE_SENTENCES
+        other_keywords = UNPRODUCTIVE_ONLY if label == "PRODUCTIVE" else PRODUCTIVE_ONLY
+        body.insert(rng.randrange(len(body) + 1), rng.choice(other).format(kw=rng.choice(other_keywords), topic=topic))
+    
+    return {"email": _sender(rng), "subject": subject, "message": " ".join(body), "label": label}
+
+def generate_corpus(size: int, seed: int = 42, productive_ratio: float = 0.6,
+                    median_sentences: int = 4, ambiguous_rate: float = 0.1) -> list:
+    """Generate a reproducible list of labelled emails"""
+    rng = random.Random(seed)
+    return [
+        generate_email(
+            rng,
+            "PRODUCTIVE" if rng.random() < productive_ratio else "UNPRODUCTIVE",
+            median_sentences=median_sentences,
+            ambiguous_rate=ambiguous_rate
+        )
+        for _ in range(size)
+    ]
+
+def to_upload_text(emails: list) -> str:
+    """Format emails the way the upload endpoints expect them"""
+    return "\n".join(f"{e['email']}|{e['subject']}|{e['message']}" for e in emails) + "\n"
+
+def write_corpus(emails: list, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for email in emails:
+                f.write(json.dumps(email, ensure_ascii=False) + "\n")
+        else:
+            f.write(to_upload_text(emails))
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Portuguese email corpus")
+    parser.add_argument("size", type=int)
+    parser.add_argument("output", help=".txt (upload format) or .jsonl (with labels)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--productive-ratio", type=float, default=0.6)
+    parser.add_argument("--median-sentences", type=int, default=4)
+    parser.add_argument("--ambiguous-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    
+    emails = generate_corpus(
+        args.size, args.seed, args.productive_ratio, args.median_sentences, args.ambiguous_rate
+    )
+    write_corpus(emails, args.output)
+    print(f"Wrote {len(emails)} emails to {args.output}")
+
+if __name__ == "__main__":
+    main()
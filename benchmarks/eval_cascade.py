@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the rule/ML cascade thresholds.
+
+    python benchmarks/eval_cascade.py                              # synthetic corpus
+    python benchmarks/eval_cascade.py --input corpus.jsonl --min-hits 1 2 3 --min-margin 0.3 0.5 1
+
+For every (min_hits, min_margin) pair it reports the fraction of emails routed
+to the ML model, agreement with ML-only mode and, when the input carries
+labels, the accuracy of the cascade. The model runs once per email; with
+--no-ml (or when it can't be loaded) only routing and rule accuracy are shown.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import generate_corpus
+from app.services.email_classifier import EmailClassifier
+from app.utils.preprocessing import email_preprocessor
+
+def load_emails(path: str) -> list:
+    """Emails from a .jsonl corpus (with labels) or an upload-format .txt file"""
+    emails = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if path.endswith(".jsonl"):
+                emails.append(json.loads(line))
+            else:
+                parts = line.split("|", 2)
+                if len(parts) == 3:
+                    emails.append({"email": parts[0].strip(), "subject": parts[1].strip(), "message": parts[2].strip()})
+    return emails
+
+def ml_labels(classifier: EmailClassifier, emails: list) -> list:
+    """ML-only classification of every email"""
+    labels = []
+    start = time.perf_counter()
+    for email in emails:
+        processed_text = email_preprocessor.extract_features(email["subject"], email["message"])
+        labels.append(classifier._ml_classification(processed_text) if processed_text.strip() else "UNPRODUCTIVE")
+    elapsed = time.perf_counter() - start
+    print(f"ML-only: {len(emails)} emails in {elapsed:.1f}s ({elapsed / max(len(emails), 1) * 1000:.1f} ms/email)")
+    return labels
+
+def evaluate(classifier: EmailClassifier, emails: list, signals: list, ml: list, min_hits: int, min_margin: float) -> dict:
+    classifier.cascade_min_hits = min_hits
+    classifier.cascade_min_margin = min_margin
+    
+    routed = agree = correct = rule_decided = rule_correct = 0
+    for index, email in enumerate(emails):
+        rule_label = classifier.cascade_label(signals[index])
+        if rule_label is None:
+            routed += 1
+            label = ml[index] if ml else None
+        else:
+            label = rule_label
+            rule_decided += 1
+            if email.get("label"):
+                rule_correct += rule_label == email["label"]
+        if ml:
+            agree += label == ml[index]
+        if email.get("label") and label is not None:
+            correct += label == email["label"]
+    
+    total = len(emails)
+    return {
+        "min_hits": min_hits,
+        "min_margin": min_margin,
+        "routed_to_ml": routed / total,
+        "agreement_with_ml": agree / total if ml else None,
+        "cascade_accuracy": correct / total if ml and emails[0].get("label") else None,
+        "rule_accuracy": rule_correct / rule_decided if rule_decided and emails[0].get("label") else None
+    }
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help=".jsonl corpus with labels or .txt upload file")
+    parser.add_argument("--size", type=int, default=1000, help="Synthetic corpus size without --input")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-hits", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--min-margin", type=float, nargs="+", default=[0.3, 0.5, 0.75, 1.0])
+    parser.add_argument("--no-ml", action="store_true", help="Skip the model; report routing only")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+    
+    emails = load_emails(args.input) if args.input else generate_corpus(args.size, seed=args.seed)
+    if not emails:
+        print("No emails to evaluate")
+        return 1
+    
+    classifier = EmailClassifier()
+    signals = [classifier.rule_signals(e["subject"], e["message"]) for e in emails]
+    
+    ml = None
+    if not args.no_ml:
+        try:
+            classifier.toggle_ml_model(True)
+        except ImportError as e:
+            print(f"Could not import the ML stack: {e}")
+        if classifier.classifier:
+            ml = ml_labels(classifier, emails)
+            if emails[0].get("label"):
+                accuracy = sum(label == e["label"] for label, e in zip(ml, emails)) / len(emails)
+                print(f"ML-only accuracy: {accuracy:.1%}")
+        else:
+            print("ML model unavailable; reporting routing and rule accuracy only")
+    
+    results = [
+        evaluate(classifier, emails, signals, ml, min_hits, min_margin)
+        for min_hits in args.min_hits
+        for min_margin in args.min_margin
+    ]
+    
+    print(f"\n{len(emails)} emails")
+    print(f"{'min_hits':>8} {'min_margin':>10} {'to ML':>8} {'agree ML':>9} {'accuracy':>9} {'rule acc':>9}")
+    for result in results:
+        print(
+            f"{result['min_hits']:>8} {result['min_margin']:>10.2f} {_fmt(result['routed_to_ml']):>8} "
+            f"{_fmt(result['agreement_with_ml']):>9} {_fmt(result['cascade_accuracy']):>9} "
+            f"{_fmt(result['rule_accuracy']):>9}"
+        )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"emails": len(emails), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
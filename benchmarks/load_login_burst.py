@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Load test: analyseEmail latency with and without a concurrent login burst.
+
+Run against a live server (python main.py), e.g.:
+    python benchmarks/load_login_burst.py --logins 200 --concurrency 32
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+LOGIN = """
+mutation Login($email: String!, $password: String!) {
+    login(input: {email: $email, password: $password}) { token }
+}
+"""
+
+SIGNUP = """
+mutation Signup($name: String!, $email: String!, $password: String!) {
+    createUserAccount(input: {name: $name, email: $email, password: $password}) { id }
+}
+"""
+
+ANALYSE = """
+mutation {
+    analyseEmail(input: {email: "cliente@empresa.com", subject: "Reunião urgente",
+                         message: "Preciso de ajuda com o projeto hoje"}) { id classification }
+}
+"""
+
+def graphql(url, query, variables=None, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return requests.post(url, json={"query": query, "variables": variables or {}}, headers=headers)
+
+def measure_analyse(url, token, samples):
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        graphql(url, ANALYSE, token=token)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<20} p50={statistics.median(latencies):8.1f}ms  p95={p95:8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000/graphql")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    
+    credentials = {"name": "Load Test", "email": "loadtest@example.com", "password": "loadtest123"}
+    graphql(args.url, SIGNUP, credentials)
+    login_vars = {"email": credentials["email"], "password": credentials["password"]}
+    token = graphql(args.url, LOGIN, login_vars).json()["data"]["login"]["token"]
+    
+    print("analyseEmail latency")
+    print("=" * 50)
+    report("idle", measure_analyse(args.url, token, args.samples))
+    
+    rejected = 0
+    lock = threading.Lock()
+    
+    def login_once(_):
+        nonlocal rejected
+        body = graphql(args.url, LOGIN, login_vars).json()
+        if body.get("errors"):
+            with lock:
+                rejected += 1
+    
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        burst = pool.map(login_once, range(args.logins))
+        report("during login burst", measure_analyse(args.url, token, args.samples))
+        list(burst)
+    
+    print(f"logins: {args.logins}, rejected (pool full): {rejected}")
+
+if __name__ == "__main__":
+    main()
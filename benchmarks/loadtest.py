@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness.
+
+Starts the app against a fresh local SQLite database (or targets --url),
+drives analyseEmail, batch uploads and list/statistics queries with a
+synthetic Portuguese corpus at a fixed concurrency, and records throughput
+and p50/p95/p99 per scenario. /health is polled while analyseEmail runs, so
+a blocked event loop shows up as health latency. Results can be saved as a
+baseline and later runs compared against it:
+
+    python benchmarks/loadtest.py --save-baseline
+    python benchmarks/loadtest.py            # exits 1 on regression
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.corpus import generate_corpus, to_upload_text
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "loadtest.json")
+
+ANALYSE = """
+mutation Analyse($email: String!, $subject: String!, $message: String!) {
+    analyseEmail(input: {email: $email, subject: $subject, message: $message}) { id classification }
+}
+"""
+LIST = "query { getEmailsList(page: 1, perPage: 20) { emails { id subject classification createdAt } pagination { total } } }"
+STATS = "query { getStatistics { total productive unproductive percentageProductive } }"
+SIGNUP = """
+mutation Signup($name: String!, $email: String!, $password: String!) {
+    createUserAccount(input: {name: $name, email: $email, password: $password}) { id }
+}
+"""
+LOGIN = "mutation Login($email: String!, $password: String!) { login(input: {email: $email, password: $password}) { token } }"
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class LoadTest:
+    def __init__(self, url: str, concurrency: int):
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.session = requests.Session()
+        self.token = None
+    
+    def graphql(self, query: str, variables: dict = None) -> dict:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        response = self.session.post(
+            f"{self.url}/graphql", json={"query": query, "variables": variables or {}}, headers=headers
+        )
+        body = response.json()
+        if body.get("errors"):
+            raise RuntimeError(body["errors"][0]["message"])
+        return body["data"]
+    
+    def login(self):
+        credentials = {"name": "Load Test", "email": "loadtest@example.com", "password": "loadtest123"}
+        try:
+            self.graphql(SIGNUP, credentials)
+        except RuntimeError:
+            pass  # Already registered
+        data = self.graphql(LOGIN, {"email": credentials["email"], "password": credentials["password"]})
+        self.token = data["login"]["token"]
+    
+    def upload(self, emails: list):
+        response = self.session.post(
+            f"{self.url}/api/upload/emails",
+            files={"file": ("batch.txt", to_upload_text(emails).encode("utf-8"), "text/plain")},
+            headers={"Authorization": f"Bearer {self.token}"}
+        )
+        response.raise_for_status()
+    
+    def probe_health(self, stop: threading.Event, latencies: list):
+        """Time /health on its own connection until stopped"""
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(f"{self.url}/health", timeout=30)
+            latencies.append((time.perf_counter() - start) * 1000)
+            stop.wait(0.05)
+    
+    def run_scenario(self, name: str, tasks: list, items_per_task: int = 1, probe_health: bool = False) -> dict:
+        """Run callables at the configured concurrency and summarize latencies"""
+        latencies, errors = [], 0
+        health_latencies, stop = [], threading.Event()
+        prober = threading.Thread(target=self.probe_health, args=(stop, health_latencies), daemon=True)
+        
+        def timed(task):
+            start = time.perf_counter()
+            try:
+                task()
+                return time.perf_counter() - start, None
+            except Exception as e:
+                return time.perf_counter() - start, e
+        
+        if probe_health:
+            prober.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for latency, error in pool.map(timed, tasks):
+                latencies.append(latency * 1000)
+                errors += error is not None
+        elapsed = time.perf_counter() - start
+        stop.set()
+        if probe_health:
+            prober.join()
+        
+        result = {
+            "requests": len(tasks),
+            "errors": errors,
+            "throughput_per_sec": round(len(tasks) * items_per_task / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2)
+        }
+        if health_latencies:
+            result["health_p95_ms"] = round(percentile(health_latencies, 95), 2)
+            result["health_max_ms"] = round(max(health_latencies), 2)
+        return result
+    
+    def run(self, corpus: list, batch_size: int, reads: int) -> dict:
+        self.login()
+        half = len(corpus) // 2
+        single, batched = corpus[:half], corpus[half:]
+        batches = [batched[i:i + batch_size] for i in range(0, len(batched), batch_size)]
+        
+        return {
+            "analyse_email": self.run_scenario(
+                "analyse_email",
+                [lambda e=e: self.graphql(ANALYSE, {k: e[k] for k in ("email", "subject", "message")}) for e in single],
+                probe_health=True
+            ),
+            "batch_upload": self.run_scenario(
+                "batch_upload", [lambda b=b: self.upload(b) for b in batches], items_per_task=batch_size
+            ),
+            "list_emails": self.run_scenario("list_emails", [lambda: self.graphql(LIST)] * reads),
+            "statistics": self.run_scenario("statistics", [lambda: self.graphql(STATS)] * reads)
+        }
+
+def start_server(port: int, db_path: str) -> subprocess.Popen:
+    """Start the app on a fresh SQLite database and wait until /ready"""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            if requests.get(f"{url}/ready", timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not become ready")
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return regressions beyond the tolerance (fraction) against the baseline"""
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{scenario}: errors {previous['errors']} -> {current['errors']}")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if "health_p95_ms" in previous and current.get("health_p95_ms", 0) > previous["health_p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: /health p95 {previous['health_p95_ms']}ms -> {current['health_p95_ms']}ms"
+            )
+        if current["throughput_per_sec"] < previous["throughput_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario}: throughput {previous['throughput_per_sec']}/s -> {current['throughput_per_sec']}/s"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--emails", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    
+    corpus = generate_corpus(args.emails, seed=args.seed)
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = args.url
+        else:
+            server = start_server(args.port, os.path.join(tmp, "loadtest.db"))
+            url = f"http://127.0.0.1:{args.port}"
+        try:
+            results = LoadTest(url, args.concurrency).run(corpus, args.batch_size, args.reads)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+    
+    print(f"{'scenario':<16}{'reqs':>7}{'errors':>8}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for scenario, r in results.items():
+        print(f"{scenario:<16}{r['requests']:>7}{r['errors']:>8}{r['throughput_per_sec']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    for scenario, r in results.items():
+        if "health_p95_ms" in r:
+            print(f"/health during {scenario}: p95 {r['health_p95_ms']}ms, max {r['health_max_ms']}ms")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark suite for the hot paths: preprocessing, keyword matching, file
+parsing, persistence/listing and classification.
+
+    python benchmarks/microbench.py                    # run all, save JSON
+    python benchmarks/microbench.py -k preprocess      # only matching names
+    python benchmarks/microbench.py --compare benchmarks/results/<commit>.json
+
+Results are written to benchmarks/results/<commit>.json so runs on different
+commits can be compared. Benchmarks whose dependencies (NLTK data, PyPDF2,
+transformers) are missing are reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from benchmarks.corpus import generate_corpus, to_upload_text
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SIZES = [10, 100, 1000]
+
+class Skip(Exception):
+    """Raised by a benchmark setup when a dependency is unavailable"""
+
+def measure(fn, min_time: float = 0.2, rounds: int = 5) -> dict:
+    """Time fn over several rounds, calibrating iterations per round"""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start >= min_time / rounds or iterations >= 1 << 20:
+            break
+        iterations *= 2
+    
+    per_op = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        per_op.append((time.perf_counter() - start) / iterations)
+    
+    return {
+        "min_us": round(min(per_op) * 1e6, 3),
+        "median_us": round(statistics.median(per_op) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(per_op) * 1e6, 3) if rounds > 1 else 0.0,
+        "ops_per_sec": round(1 / statistics.median(per_op), 1),
+        "iterations": iterations,
+        "rounds": rounds
+    }
+
+def _require_nltk():
+    from app.utils.preprocessing import email_preprocessor
+    try:
+        email_preprocessor.tokenize_and_stem("teste de tokenização")
+    except LookupError:
+        raise Skip("NLTK data not installed")
+    return email_preprocessor
+
+def _write_pdf(path: str, lines: list):
+    """Write a minimal text PDF, one line per text row, 50 rows per page"""
+    def escape(text):
+        return text.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    
+    pages = [lines[i:i + 50] for i in range(0, len(lines), 50)] or [[]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        stream = "BT /F1 8 Tf 10 TL 20 780 Td " + " ".join(f"({escape(line)}) Tj T*" for line in page) + " ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+def _database():
+    """In-memory SQLite session with the schema and one user"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+    from app.models import User
+    
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    user = User(name="Bench", email="bench@example.com", password="x")
+    db.add(user)
+    db.commit()
+    return db, user.id
+
+def benchmarks(tmp_dir: str) -> dict:
+    """Name -> setup function returning the callable to time"""
+    corpus = generate_corpus(200, seed=7)
+    sample = corpus[0]
+    long_message = " ".join(e["message"] for e in corpus[:40])
+    cases = {}
+    
+    def preprocessing(method, text):
+        def setup():
+            preprocessor = _require_nltk()
+            return lambda: getattr(preprocessor, method)(text)
+        return setup
+    
+    cases["preprocess.clean_text.short"] = preprocessing("clean_text", sample["message"])
+    cases["preprocess.clean_text.long"] = preprocessing("clean_text", long_message)
+    cases["preprocess.tokenize_and_stem.short"] = preprocessing("tokenize_and_stem", sample["message"].lower())
+    cases["preprocess.tokenize_and_stem.long"] = preprocessing("tokenize_and_stem", long_message.lower())
+    
+    def extract_features(message):
+        def setup():
+            preprocessor = _require_nltk()
+            return lambda: preprocessor.extract_features(sample["subject"], message)
+        return setup
+    
+    cases["preprocess.extract_features.short"] = extract_features(sample["message"])
+    cases["preprocess.extract_features.long"] = extract_features(long_message)
+    
+    def keywords(method):
+        def setup():
+            from app.utils.preprocessing import email_preprocessor
+            texts = [f"{e['subject']} {e['message']}".lower() for e in corpus[:50]]
+            return lambda: [getattr(email_preprocessor, method)(text) for text in texts]
+        return setup
+    
+    cases["keywords.productive.x50"] = keywords("is_productive_keywords")
+    cases["keywords.unproductive.x50"] = keywords("is_unproductive_keywords")
+    
+    for size in SIZES:
+        emails = generate_corpus(size, seed=size)
+        
+        def parse_txt(emails=emails, size=size):
+            from app.routers.upload import _process_file
+            path = os.path.join(tmp_dir, f"emails_{size}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(to_upload_text(emails))
+            return lambda: _process_file(path)
+        
+        def parse_pdf(emails=emails, size=size):
+            try:
+                import PyPDF2  # noqa: F401
+            except ImportError:
+                raise Skip("PyPDF2 not installed")
+            from app.routers.upload import _process_file
+            path = os.path.join(tmp_dir, f"emails_{size}.pdf")
+            _write_pdf(path, to_upload_text(emails).splitlines())
+            return lambda: _process_file(path)
+        
+        cases[f"parse.txt.{size}"] = parse_txt
+        cases[f"parse.pdf.{size}"] = parse_pdf
+    
+    def create_email():
+        _require_nltk()
+        from app.services.email_service import EmailService
+        db, user_id = _database()
+        service = EmailService(db)
+        emails = iter(corpus * 10000)
+        
+        def run():
+            email = next(emails)
+            service.create_email(user_id, email["email"], email["subject"], email["message"])
+        return run
+    
+    def list_emails(projected):
+        def setup():
+            from app.models import CategorizedEmail
+            from app.models.categorized_email import EmailClassification
+            from app.services.email_service import EmailService
+            db, user_id = _database()
+            db.add_all([
+                CategorizedEmail(
+                    user_id=user_id, email=e["email"], subject=e["subject"][:500],
+                    response="Resposta automática " * 20, classification=EmailClassification(e["label"])
+                )
+                for e in generate_corpus(2000, seed=3)
+            ])
+            db.commit()
+            service = EmailService(db)
+            fields = {"id", "subject", "classification", "created_at"} if projected else None
+            return lambda: service.get_emails_list(user_id, page=5, per_page=50, fields=fields)
+        return setup
+    
+    cases["db.create_email"] = create_email
+    cases["db.list_emails.full"] = list_emails(False)
+    cases["db.list_emails.projected"] = list_emails(True)
+    
+    def classify(use_ml):
+        def setup():
+            _require_nltk()
+            from app.services.email_classifier import EmailClassifier
+            classifier = EmailClassifier()
+            if use_ml:
+                try:
+                    import transformers  # noqa: F401
+                except ImportError:
+                    raise Skip("transformers not installed")
+                classifier.toggle_ml_model(True)
+                if not classifier.classifier:
+                    raise Skip("model could not be loaded")
+            else:
+                classifier.toggle_ml_model(False)
+            emails = iter(corpus * 10000)
+            
+            def run():
+                email = next(emails)
+                classifier.classify_email(email["subject"], email["message"])
+            return run
+        return setup
+    
+    cases["classify.rule_based"] = classify(False)
+    cases["classify.ml"] = classify(True)
+    return cases
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: dict, previous: dict, threshold: float):
+    print(f"\nComparison with {previous.get('commit', '?')} (median):")
+    for name, current in results.items():
+        before = previous["results"].get(name)
+        if not before or "median_us" not in before or "median_us" not in current:
+            continue
+        ratio = current["median_us"] / before["median_us"]
+        flag = "  SLOWER" if ratio > 1 + threshold else ("  faster" if ratio < 1 - threshold else "")
+        print(f"  {name:<40} {before['median_us']:>12.1f} -> {current['median_us']:>12.1f} us  x{ratio:.2f}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="Result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Previous result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, setup in benchmarks(tmp_dir).items():
+            if args.keyword and args.keyword not in name:
+                continue
+            try:
+                results[name] = measure(setup(), args.min_time, args.rounds)
+                print(f"{name:<40} {results[name]['median_us']:>12.1f} us  {results[name]['ops_per_sec']:>12.1f} ops/s")
+            except Skip as e:
+                results[name] = {"skipped": str(e)}
+                print(f"{name:<40} skipped ({e})")
+    
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results
+        }, f, indent=2)
+    print(f"\nResults saved to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f), args.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for the shared-model serving mode (make prod-shared).
+
+The master process loads the classifier once before forking, so every uvicorn
+worker shares the same weights copy-on-write instead of loading its own copy.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+def on_starting(server):
+    # Start every run with an empty Prometheus multiprocess directory
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            os.unlink(os.path.join(metrics_dir, name))
+    
+    from app.startup import preload_models
+    preload_models()
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    from app.utils.memory import process_memory
+    server.log.info(f"Worker {worker.pid} memory: {process_memory()}")
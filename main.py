@@ -1,30 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, status, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from strawberry.fastapi import GraphQLRouter
-from app.database import get_db, engine, Base
+from app.database import get_db, get_lazy_db, get_session_stats
 from app.resolvers import Query, Mutation
-from app.routers import upload
+from app.routers import upload, models
 from app.config import settings
 from app.auth import verify_token
+from app.services.user_cache import is_user_active
+from app.utils.static import ImmutableStaticFiles
+from app.startup import (
+    prepare_storage, prepare_nlp_bundle, start_background_warm_up, is_ready, startup_phases, bundle_status
+)
+from app.utils.memory import process_memory
+from app.utils.profiling import ProfilingMiddleware, PROFILE_ID_HEADER, PROFILE_SKIPPED_HEADER
+from app.metrics import (
+    MetricsMiddleware, GraphQLMetricsExtension, SQLDebugExtension, metrics_payload, record_upload
+)
 from app.services.email_service import EmailService
+from app.services.near_duplicates import save_near_duplicate_index
+from app.utils.executors import ExecutorBusy
 # Import models to register them with SQLAlchemy
 from app.models import User, CategorizedEmail, EmailStatistics
 import strawberry
 import os
 import tempfile
 import shutil
+import time
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Create uploads directory
-os.makedirs("uploads", exist_ok=True)
-os.makedirs("uploads/avatars", exist_ok=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables and uploads directory, then load the models in
+    # the background; /ready reports when they are warm
+    prepare_storage()
+    if prepare_nlp_bundle():
+        start_background_warm_up()
+    yield
+    save_near_duplicate_index()
 
 # Create FastAPI app
-app = FastAPI(title="Seleciona AI Backend", version="1.0.0")
+app = FastAPI(title="Seleciona AI Backend", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -33,16 +49,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PROFILE_ID_HEADER, PROFILE_SKIPPED_HEADER],
 )
 
-# Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Record request latency and SQL statements per request
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in per-request profiling; not installed at all when disabled
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# A full worker pool (e.g. password hashing) means the server is overloaded,
+# not that the request failed
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+# Mount static files (content-addressed avatars are served as immutable)
+# The directory is created on startup, so don't check it at import time
+app.mount("/uploads", ImmutableStaticFiles(directory="uploads", check_dir=False), name="uploads")
 
 # Create GraphQL schema
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+# In debug mode, SQL statements per request are returned in "extensions"
+schema_extensions = [GraphQLMetricsExtension]
+if settings.debug:
+    schema_extensions.append(SQLDebugExtension)
+
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=schema_extensions
+)
 
 # Create GraphQL router with dependency injection
-async def get_context(request: Request, db=Depends(get_db)):
+# The session is created lazily so requests that never reach the database
+# (e.g. failed authentication) don't open one
+async def get_context(request: Request, db=Depends(get_lazy_db)):
     return {
         "db": db,
         "request": request
@@ -56,6 +102,9 @@ app.include_router(graphql_app, prefix="/graphql")
 # Add upload endpoints
 app.include_router(upload.router)
 
+# Model registry admin endpoints
+app.include_router(models.router)
+
 # GraphQL File Upload endpoint (works with Altair)
 @app.post("/graphql/upload")
 async def graphql_file_upload(
@@ -77,6 +126,11 @@ async def graphql_file_upload(
         token = authorization.split(" ")[1]
         token_data = verify_token(token)
         user_id = token_data["user_id"]
+        if not is_user_active(db, user_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User account is deactivated"
+            )
         
         # Validate file type
         if not file.filename:
@@ -100,18 +154,12 @@ async def graphql_file_upload(
         try:
             # Process the temporary file
             email_service = EmailService(db)
+            upload_start = time.perf_counter()
             emails_data = _process_file(temp_file_path)
             
-            # Process each email
-            processed_count = 0
-            for email_data in emails_data:
-                email_service.create_email(
-                    user_id=user_id,
-                    email=email_data['email'],
-                    subject=email_data['subject'],
-                    message=email_data['message']
-                )
-                processed_count += 1
+            # Classify and store the emails as one batch
+            processed_count = len(await email_service.create_emails_async(user_id, emails_data))
+            record_upload("graphql_upload", processed_count, time.perf_counter() - upload_start)
             
             return {
                 "data": {
@@ -196,7 +244,30 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "db_sessions": get_session_stats(),
+        "memory": process_memory()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (aggregated across workers in multiprocess mode)"""
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/ready")
+async def readiness_check():
+    """Ready only once NLP resources are loaded and the classifier is warm"""
+    ready = is_ready()
+    content = {"status": "ready" if ready else "starting", "startup_phases": startup_phases}
+    if bundle_status["error"]:
+        content["status"] = "failed"
+        content["nlp_bundle_error"] = bundle_status["error"]
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=content
+    )
 
 if __name__ == "__main__":
     import uvicorn
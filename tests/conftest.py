@@ -0,0 +1,74 @@
+"""
+Shared fixtures: a seeded SQLite database and a helper that runs GraphQL
+operations the way the GraphQL router does.
+"""
+import os
+import tempfile
+
+# The engine is created at import time, so point it at a scratch database
+# before anything from app is imported
+_db_dir = tempfile.mkdtemp(prefix="seleciona-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+from types import SimpleNamespace
+import pytest
+from app.auth import create_access_token
+from app.database import Base, SessionLocal, engine
+from app.models import User, CategorizedEmail, EmailStatistics
+from app.models.categorized_email import EmailClassification
+from app.models.user import UserStatus
+from app.services import user_cache
+
+pytest_plugins = ["app.utils.pytest_query_budget"]
+
+SEEDED_EMAILS = 30
+
+@pytest.fixture(scope="session")
+def seeded_user():
+    """A user with SEEDED_EMAILS classified emails and their statistics"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(name="Ana", email="ana@example.com", password="x", status=UserStatus.ACTIVE)
+        db.add(user)
+        db.flush()
+        for i in range(SEEDED_EMAILS):
+            productive = i % 3 != 0
+            db.add(CategorizedEmail(
+                user_id=user.id,
+                email=f"sender{i % 5}@example.com",
+                subject=f"Assunto {i}",
+                message=f"Mensagem {i}",
+                response="Obrigado pelo contato.",
+                classification=EmailClassification.PRODUCTIVE if productive else EmailClassification.UNPRODUCTIVE,
+                model_version="builtin"
+            ))
+        db.add(EmailStatistics(user_id=user.id, total=SEEDED_EMAILS, productive=20, unproductive=10))
+        db.commit()
+        first_email_id = db.query(CategorizedEmail.id).filter(CategorizedEmail.user_id == user.id).order_by(CategorizedEmail.id).first()[0]
+        return SimpleNamespace(id=user.id, first_email_id=first_email_id)
+    finally:
+        db.close()
+
+@pytest.fixture
+def run_graphql(seeded_user):
+    """
+    Execute an operation as the seeded user with a fresh session and a cold
+    user cache, so query counts cover the worst case of a request.
+    """
+    from main import schema
+    
+    token = create_access_token(data={"sub": str(seeded_user.id)})
+    request = SimpleNamespace(headers={"authorization": f"Bearer {token}"})
+    
+    def run(query: str, variables: dict = None):
+        user_cache._user_cache.clear()
+        db = SessionLocal()
+        try:
+            result = schema.execute_sync(query, variable_values=variables, context_value={"db": db, "request": request})
+        finally:
+            db.close()
+        assert result.errors is None, result.errors
+        return result.data
+    
+    return run
@@ -0,0 +1,73 @@
+"""Near-duplicate fingerprints at the default distance"""
+import pytest
+from app.config import settings
+from app.services import email_classifier as classifier_module
+from app.services.email_classifier import EmailClassifier, ModelHandle
+from app.services.near_duplicates import FingerprintIndex, NearDuplicateIndex, fingerprint
+
+NEWSLETTER = (
+    "Newsletter Seleciona",
+    "Olá {name}, esta é a newsletter mensal da Seleciona. Neste mês lançamos o novo painel "
+    "de estatísticas e melhoramos a velocidade da classificação. Leia o blog para saber mais."
+)
+PROMOTION = (
+    "Promoção relâmpago",
+    "Oi {name}! Só hoje: frete grátis em todo o site e até 50% de desconto em eletrônicos. "
+    "Corra, a promoção termina à meia-noite."
+)
+UNRELATED = (
+    "Reunião de planejamento",
+    "Bom dia, precisamos revisar o cronograma do projeto antes da reunião de quinta-feira. "
+    "Você consegue enviar o relatório atualizado até amanhã?"
+)
+
+def _index_with(subject: str, message: str) -> NearDuplicateIndex:
+    index = NearDuplicateIndex("user", settings.near_duplicate_max_distance, 100)
+    index.add(1, fingerprint(subject, message), "UNPRODUCTIVE", "v1")
+    return index
+
+def test_name_only_variant_hits():
+    for subject, template in (NEWSLETTER, PROMOTION):
+        index = _index_with(subject, template.format(name="João"))
+        for name in ("Maria", "Ana Paula"):
+            variant = fingerprint(subject, template.format(name=name))
+            assert index.lookup(1, variant, "v1") == "UNPRODUCTIVE", (subject, name)
+
+def test_unrelated_email_misses():
+    index = _index_with(NEWSLETTER[0], NEWSLETTER[1].format(name="João"))
+    assert index.lookup(1, fingerprint(*UNRELATED), "v1") is None
+    assert index.lookup(1, fingerprint(PROMOTION[0], PROMOTION[1].format(name="João")), "v1") is None
+
+def test_other_model_version_misses():
+    index = _index_with(NEWSLETTER[0], NEWSLETTER[1].format(name="João"))
+    variant = fingerprint(NEWSLETTER[0], NEWSLETTER[1].format(name="Maria"))
+    assert index.lookup(1, variant, "v2") is None
+
+def test_batch_of_copies_runs_the_model_once(monkeypatch):
+    monkeypatch.setattr(
+        classifier_module, "near_duplicate_index",
+        NearDuplicateIndex("user", settings.near_duplicate_max_distance, 100)
+    )
+    monkeypatch.setattr(classifier_module.email_preprocessor, "extract_features", lambda subject, message: message)
+    classifier = EmailClassifier()
+    classifier.use_ml_model, classifier.cascade = True, False
+    classifier._active = ModelHandle("v1", classifier=object())
+    forwarded = []
+    
+    def forward(model, input_ids):
+        forwarded.extend(input_ids)
+        return [("LABEL_1", 0.9)] * len(input_ids)
+    monkeypatch.setattr(classifier, "_tokenize", lambda model, texts: [[len(text)] for text in texts])
+    monkeypatch.setattr(classifier, "_forward_timed", forward)
+    
+    names = ("João", "Maria", "Ana Paula", "Pedro", "Carla")
+    emails = [(NEWSLETTER[0], NEWSLETTER[1].format(name=name)) for name in names] + [UNRELATED]
+    results = classifier.classify_batch(emails, user_id=1)
+    
+    assert len(forwarded) == 2
+    assert [result.path for result in results] == ["ml"] + ["near_duplicate"] * 4 + ["ml"]
+    assert {result.classification for result in results[:5]} == {"PRODUCTIVE"}
+
+def test_empty_index_is_rejected():
+    with pytest.raises(ValueError):
+        FingerprintIndex(0)
@@ -0,0 +1,36 @@
+"""SQL statement budgets for the GraphQL read resolvers"""
+from tests.conftest import SEEDED_EMAILS
+
+EMAIL_FIELDS = "id email subject response classification createdAt"
+
+def test_get_user_query_budget(run_graphql, query_budget):
+    with query_budget(1):
+        data = run_graphql("{ getUser { id name email avatarUrl } }")
+    assert data["getUser"]["email"] == "ana@example.com"
+
+def test_get_emails_list_query_budget(run_graphql, query_budget):
+    query = f"{{ getEmailsList(page: 1, perPage: 20) {{ pagination {{ total }} emails {{ {EMAIL_FIELDS} }} }} }}"
+    with query_budget(3, max_repeats=1):
+        data = run_graphql(query)
+    assert data["getEmailsList"]["pagination"]["total"] == SEEDED_EMAILS
+    assert len(data["getEmailsList"]["emails"]) == 20
+
+def test_get_emails_list_budget_does_not_grow_with_page_size(run_graphql, query_budget):
+    """N+1 guard: a page of every email costs as much as a page of one"""
+    with query_budget(3, max_repeats=1) as small:
+        run_graphql(f"{{ getEmailsList(perPage: 1) {{ emails {{ {EMAIL_FIELDS} }} }} }}")
+    with query_budget(small.count, max_repeats=1):
+        run_graphql(f"{{ getEmailsList(perPage: {SEEDED_EMAILS}) {{ emails {{ {EMAIL_FIELDS} }} }} }}")
+
+def test_get_email_query_budget(run_graphql, seeded_user, query_budget):
+    with query_budget(2):
+        data = run_graphql(
+            f"query($id: Int!) {{ getEmail(emailId: $id) {{ {EMAIL_FIELDS} }} }}",
+            {"id": seeded_user.first_email_id}
+        )
+    assert data["getEmail"]["id"] == seeded_user.first_email_id
+
+def test_get_statistics_query_budget(run_graphql, query_budget):
+    with query_budget(2):
+        data = run_graphql("{ getStatistics { total productive unproductive percentageProductive } }")
+    assert data["getStatistics"]["total"] == SEEDED_EMAILS
@@ -0,0 +1,47 @@
+"""Sender reputation counts under corrections"""
+from app.config import settings
+from app.database import Base, SessionLocal, engine
+from app.models import User, CategorizedEmail
+from app.models.categorized_email import EmailClassification
+from app.models.user import UserStatus
+from app.services import sender_reputation
+from app.services.email_classifier import ClassificationResult
+from app.services.email_service import EmailService
+
+SENDER = "news@example.com"
+
+def _prior(db, user_id: int):
+    sender_reputation._prior_cache.clear()
+    return sender_reputation.get_sender_priors(db, user_id, [SENDER])[SENDER]
+
+def test_correction_replaces_the_original_label(monkeypatch):
+    monkeypatch.setattr(settings, "sender_prior_min_count", 5.0)
+    monkeypatch.setattr(settings, "sender_prior_min_share", 0.9)
+    monkeypatch.setattr(settings, "sender_prior_correction_weight", 5.0)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(name="Bia", email="bia@example.com", password="x", status=UserStatus.ACTIVE)
+        db.add(user)
+        db.flush()
+        email = CategorizedEmail(
+            user_id=user.id, email=SENDER, subject="Novidades", message="Confira as novidades",
+            response="", classification=EmailClassification.UNPRODUCTIVE, model_version="v1",
+            classification_path="ml"
+        )
+        db.add(email)
+        service = EmailService(db)
+        service._record_senders(user.id, [(SENDER, ClassificationResult("UNPRODUCTIVE", "", "v1", "ml"))])
+        db.commit()
+        
+        # The classifier's 1.0 is taken back, so the correction alone decides
+        service.correct_classification(user.id, email.id, "PRODUCTIVE")
+        assert _prior(db, user.id) == sender_reputation.SenderPrior(5.0, 0.0)
+        assert _prior(db, user.id).label == "PRODUCTIVE"
+        
+        # Correcting again replaces the first correction
+        service.correct_classification(user.id, email.id, "UNPRODUCTIVE")
+        assert _prior(db, user.id) == sender_reputation.SenderPrior(0.0, 5.0)
+        assert _prior(db, user.id).label == "UNPRODUCTIVE"
+    finally:
+        db.close()